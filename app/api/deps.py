@@ -1,39 +1,58 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from app.db.session import get_db
 from app.core.security import SECRET_KEY, ALGORITHM
 from app.db.base import Usuario
+from app.services.eventos import definir_ator
 
 # Define a rota onde o frontend deve pegar o token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-async def get_usuario_atual(
-    token: str = Depends(oauth2_scheme), 
-    db: Session = Depends(get_db)
-) -> Usuario:
-    """
-    Decodifica o Token JWT e busca o usuário no banco.
-    """
-    credentials_exception = HTTPException(
+def _credenciais_invalidas() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Não foi possível validar as credenciais",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _buscar_usuario(token: str, db: Session, *opcoes) -> Usuario:
+    """Decodifica o Token JWT e busca o usuário (sub = CPF) com as opções de carga pedidas."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         cpf: str = payload.get("sub")
         if cpf is None:
-            raise credentials_exception
+            raise _credenciais_invalidas()
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(Usuario).filter(Usuario.cpf == cpf).first()
+        raise _credenciais_invalidas()
+
+    user = db.query(Usuario).options(*opcoes).filter(Usuario.cpf == cpf).first()
     if user is None:
-        raise credentials_exception
+        raise _credenciais_invalidas()
+    # A sessão é a mesma da rota (get_db é resolvido uma vez por requisição): os eventos de status saem com o autor
+    definir_ator(db, user)
     return user
 
+async def get_usuario_atual(
+    token: str = Depends(oauth2_scheme), 
+    db: Session = Depends(get_db)
+) -> Usuario:
+    """
+    Decodifica o Token JWT e busca o usuário no banco.
+    """
+    return _buscar_usuario(token, db)
+
+async def get_usuario_atual_com_unidades(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Usuario:
+    """
+    Igual a get_usuario_atual, mas já traz as UBS do usuário junto
+    na mesma consulta (para rotas que leem `usuario.unidades`).
+    """
+    return _buscar_usuario(token, db, joinedload(Usuario.unidades))
+
 class ChecarPermissao:
     """
     Valida se o usuário tem o perfil necessário para acessar a rota.
@@ -1,10 +1,12 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Body
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.core.security import criar_token_acesso, verificar_senha, criar_hash_senha, ACCESS_TOKEN_EXPIRE_MINUTES
 from app.db.base import Usuario
-from app.api.deps import get_usuario_atual # Dependência de usuário logado
+from app.api.deps import get_usuario_atual, get_usuario_atual_com_unidades # Dependência de usuário logado
+from app.core.respostas import resposta_confiavel
+from app.core.cache_http import etag_fraco, nao_modificado, cabecalhos_cache
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -93,12 +95,18 @@ async def definir_primeiras_credenciais(
 
 # --- 3. Rota de Perfil (Opcional) ---
 @router.get("/me")
-async def ler_usuario_atual(usuario_atual: Usuario = Depends(get_usuario_atual)):
-    return {
+async def ler_usuario_atual(request: Request, usuario_atual: Usuario = Depends(get_usuario_atual_com_unidades)):
+    # O app chama a cada abertura: sem mudança no usuário/UBS, 304 sem corpo
+    etag = etag_fraco(("usuarios", "unidades_saude"), usuario_atual.id)
+    resposta = nao_modificado(request, etag, "privado")
+    if resposta:
+        return resposta
+
+    return resposta_confiavel({
         "id": str(usuario_atual.id),
         "cpf": usuario_atual.cpf,
         "login": usuario_atual.login,
         "nome": usuario_atual.nome,
         "perfil": usuario_atual.perfil,
         "unidades": [{"id": str(u.id), "nome": u.nome} for u in usuario_atual.unidades]
-    }
\ No newline at end of file
+    }, headers=cabecalhos_cache(etag, "privado"))
\ No newline at end of file
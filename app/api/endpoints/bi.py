@@ -0,0 +1,81 @@
+import uuid
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.api.deps import ChecarPermissao
+from app.services.bi import (
+    atualizado_ate, encaminhamentos_por_unidade, distribuicao_prioridade, ocupacao_por_destino, taxa_ausencia
+)
+from app.utils.datas import hoje, mes_atual
+
+router = APIRouter()
+
+permissao_bi = ChecarPermissao(["GESTOR", "SECRETARIO", "SUPER_ADMIN"])
+
+
+def periodo_bi(
+    inicio: Optional[date] = Query(None, description="AAAA-MM-DD (padrão: dia 1 de 11 meses atrás)"),
+    fim: Optional[date] = Query(None, description="AAAA-MM-DD, inclusive (padrão: hoje)"),
+) -> tuple:
+    """Período do painel: padrão são os últimos 12 meses (o atual incluso)."""
+    if not inicio:
+        mes = mes_atual()
+        inicio = date(mes.year - (mes.month <= 11), (mes.month - 12) % 12 + 1, 1)
+    fim = fim or hoje()
+    if fim < inicio:
+        raise HTTPException(400, "Período inválido: fim antes do início.")
+    return inicio, fim
+
+
+def _resposta(db, periodo: tuple, itens: list) -> dict:
+    # O painel mostra até quando os números estão consolidados (última atualização do resumo)
+    return {"inicio": periodo[0], "fim": periodo[1], "atualizado_ate": atualizado_ate(db), "itens": itens}
+
+
+@router.get("/encaminhamentos", dependencies=[Depends(permissao_bi)])
+async def encaminhamentos(
+    agrupar: str = Query("mes", description="mes ou dia"),
+    unidade_id: Optional[uuid.UUID] = None,
+    periodo: tuple = Depends(periodo_bi),
+    db: Session = Depends(get_db),
+):
+    """Encaminhamentos por UBS e período: total, aguardando análise e aprovados (ônibus / ajuda de custo)."""
+    if agrupar not in ("mes", "dia"):
+        raise HTTPException(400, "Agrupamento inválido. Opções: mes, dia.")
+    return _resposta(db, periodo, encaminhamentos_por_unidade(db, *periodo, agrupar=agrupar, unidade_id=unidade_id))
+
+
+@router.get("/prioridades", dependencies=[Depends(permissao_bi)])
+async def prioridades(
+    unidade_id: Optional[uuid.UUID] = None,
+    periodo: tuple = Depends(periodo_bi),
+    db: Session = Depends(get_db),
+):
+    """Distribuição dos encaminhamentos por nível de prioridade."""
+    return _resposta(db, periodo, distribuicao_prioridade(db, *periodo, unidade_id=unidade_id))
+
+
+@router.get("/ocupacao", dependencies=[Depends(permissao_bi)])
+async def ocupacao(
+    destino: Optional[str] = None,
+    periodo: tuple = Depends(periodo_bi),
+    db: Session = Depends(get_db),
+):
+    """Viagens, capacidade e ocupação por cidade de destino."""
+    return _resposta(db, periodo, ocupacao_por_destino(db, *periodo, destino=destino))
+
+
+@router.get("/ausencias", dependencies=[Depends(permissao_bi)])
+async def ausencias(
+    agrupar: str = Query("unidade", description="unidade ou destino"),
+    periodo: tuple = Depends(periodo_bi),
+    db: Session = Depends(get_db),
+):
+    """Taxa de ausência no embarque (aprovados que não compareceram), da maior para a menor."""
+    if agrupar not in ("unidade", "destino"):
+        raise HTTPException(400, "Agrupamento inválido. Opções: unidade, destino.")
+    return _resposta(db, periodo, taxa_ausencia(db, *periodo, agrupar=agrupar))
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.db.base import CronogramaViagem, SolicitacaoTFD, Paciente, Usuario
 from app.api.deps import ChecarPermissao, get_usuario_atual
+from app.services.cache_unidades import nome_unidade, unidades
+from app.services.rotas import rota_da_viagem
+from app.services.ocupacao import ocupacao_das_viagens, MAX_DIAS
+from app.core.respostas import resposta_confiavel
+from app.core.cache_http import etag_fraco, nao_modificado, cabecalhos_cache
 from pydantic import BaseModel
-from datetime import datetime
-from typing import List
+from datetime import date, datetime
+from typing import List, Optional
 
 router = APIRouter()
 
@@ -45,6 +50,35 @@ async def criar_viagem(dados: ViagemCreate, db: Session = Depends(get_db)):
 async def listar_todas_viagens(db: Session = Depends(get_db)):
     return db.query(CronogramaViagem).order_by(CronogramaViagem.data_partida.desc()).all()
 
+@router.get("/viagens/ocupacao", dependencies=[Depends(ChecarPermissao(["GESTOR", "SUPER_ADMIN", "SECRETARIO"]))])
+async def ocupacao_viagens(
+    request: Request,
+    inicio: Optional[date] = Query(None, description="AAAA-MM-DD (padrão: hoje)"),
+    fim: Optional[date] = Query(None, description="AAAA-MM-DD, inclusive (padrão: igual ao início)"),
+    destino: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Situação das viagens do período numa chamada só: capacidade, vagas ocupadas, candidatos aguardando
+    por prioridade (com acompanhantes) e aprovados que embarcaram / faltaram / ainda não passaram.
+    Substitui abrir /tfd/gestao/candidatos de cada ônibus para contar a fila.
+    """
+    inicio = inicio or date.today()
+    fim = fim or inicio
+    if fim < inicio:
+        raise HTTPException(400, "Período inválido: fim antes do início.")
+    if (fim - inicio).days >= MAX_DIAS:
+        raise HTTPException(400, f"Período máximo: {MAX_DIAS} dias.")
+
+    etag = etag_fraco(("cronograma_viagens", "solicitacoes_tfd"), "ocupacao", inicio, fim, destino)
+    resposta = nao_modificado(request, etag, "privado")
+    if resposta:
+        return resposta
+    viagens = ocupacao_das_viagens(db, inicio, fim, destino)
+    return resposta_confiavel(
+        {"inicio": inicio, "fim": fim, "viagens": viagens}, headers=cabecalhos_cache(etag, "privado")
+    )
+
 # ==========================================
 # 2. Área do MOTORISTA (App Mobile)
 # ==========================================
@@ -75,36 +109,106 @@ async def minhas_viagens_hoje(
         for v in viagens
     ]
 
-@router.get("/motorista/embarque/{viagem_id}", response_model=List[PassageiroEmbarque], dependencies=[Depends(ChecarPermissao(["MOTORISTA", "SUPER_ADMIN"]))])
-async def lista_passageiros(viagem_id: str, db: Session = Depends(get_db)):
+def _passageiros_em_ordem(db: Session, viagem_id: str) -> tuple:
     """
-    Retorna a 'Prancheta Digital': Lista de passageiros APROVADOS para aquela viagem.
+    Passageiros APROVADOS da viagem na ordem das paradas (UBS), e a rota usada para ordenar.
+    Devolve ([(unidade_id, passageiro), ...], rota); passageiro com exatamente os campos do PassageiroEmbarque.
     """
-    solicitacoes = db.query(SolicitacaoTFD).filter(
+    # Paciente e destino vêm no mesmo SELECT (uma consulta para o ônibus inteiro), só com as colunas usadas
+    solicitacoes = db.query(
+        SolicitacaoTFD.id, Paciente.nome, Paciente.cpf, SolicitacaoTFD.com_acompanhante,
+        SolicitacaoTFD.status_embarque, SolicitacaoTFD.unidade_solicitante_id, CronogramaViagem.destino
+    ).join(Paciente, SolicitacaoTFD.paciente_id == Paciente.id).join(
+        CronogramaViagem, SolicitacaoTFD.viagem_id == CronogramaViagem.id
+    ).filter(
         SolicitacaoTFD.viagem_id == viagem_id,
         SolicitacaoTFD.status_pedido == "Aprovado_Onibus" # Só mostra quem foi aprovado pelo Gestor
     ).all()
-    
-    resultado = []
-    for sol in solicitacoes:
-        paciente = db.query(Paciente).filter(Paciente.id == sol.paciente_id).first()
-        
-        # Busca nome da UBS de origem para o motorista saber onde pegar (opcional)
-        origem = "Não informada"
-        if sol.unidade_solicitante_id:
-            # Aqui poderia fazer uma query para pegar o nome da UBS
-            origem = "UBS Vinculada" 
-
-        resultado.append({
-            "id_solicitacao": str(sol.id),
-            "nome_paciente": paciente.nome,
-            "rg_cpf": paciente.cpf,
-            "acompanhante": sol.com_acompanhante,
-            "status_embarque": sol.status_embarque, # O motorista vê se já marcou
-            "local_origem": origem
+    if not solicitacoes:
+        return [], None
+
+    # Ordem das UBS (cache por viagem no Redis: só recalcula se o conjunto de UBS mudou)
+    rota = rota_da_viagem(viagem_id, {s.unidade_solicitante_id for s in solicitacoes}, solicitacoes[0].destino)
+    ordem = {parada["unidade_id"]: posicao for posicao, parada in enumerate(rota["paradas"])}
+
+    passageiros = []
+    for id_solicitacao, nome, cpf, com_acompanhante, status_embarque, unidade_id, _ in solicitacoes:
+        passageiros.append((unidade_id, {
+            "id_solicitacao": str(id_solicitacao),
+            "nome_paciente": nome,
+            "rg_cpf": cpf,
+            "acompanhante": bool(com_acompanhante),
+            "status_embarque": status_embarque or "PENDENTE", # O motorista vê se já marcou
+            # Nome da UBS de origem para o motorista saber onde pegar (cache em memória, sem query)
+            "local_origem": nome_unidade(unidade_id)
+        }))
+    # Sem UBS vai por último; dentro da parada, ordem alfabética
+    passageiros.sort(key=lambda p: (ordem.get(str(p[0]), len(ordem)), p[1]["nome_paciente"]))
+    return passageiros, rota
+
+@router.get("/motorista/embarque/{viagem_id}", response_model=List[PassageiroEmbarque], dependencies=[Depends(ChecarPermissao(["MOTORISTA", "SUPER_ADMIN"]))])
+async def lista_passageiros(request: Request, viagem_id: str, db: Session = Depends(get_db)):
+    """
+    Retorna a 'Prancheta Digital': Lista de passageiros APROVADOS para aquela viagem, na ordem das paradas.
+    O app do motorista atualiza a lista com If-None-Match: sem mudança, 304 sem consultar o banco.
+    """
+    # cronograma_viagens: o destino da viagem decide a última parada (e a ordem das anteriores)
+    etag = etag_fraco(("solicitacoes_tfd", "pacientes", "unidades_saude", "cronograma_viagens"), viagem_id)
+    resposta = nao_modificado(request, etag, "privado")
+    if resposta:
+        return resposta
+
+    # Campos exatamente do PassageiroEmbarque (a resposta não passa pela validação do schema)
+    passageiros, _ = _passageiros_em_ordem(db, viagem_id)
+    return resposta_confiavel([p for _, p in passageiros], headers=cabecalhos_cache(etag, "privado"))
+
+@router.get("/motorista/embarque/{viagem_id}/paradas", dependencies=[Depends(ChecarPermissao(["MOTORISTA", "SUPER_ADMIN"]))])
+async def roteiro_de_embarque(request: Request, viagem_id: str, db: Session = Depends(get_db)):
+    """
+    Roteiro do motorista: as UBS na ordem de recolhimento (menor percurso até seguir para o destino),
+    cada uma com seus passageiros. km/minutos são estimativas locais (sem serviço de mapas).
+    """
+    etag = etag_fraco(("solicitacoes_tfd", "pacientes", "unidades_saude", "cronograma_viagens"), "paradas", viagem_id)
+    resposta = nao_modificado(request, etag, "privado")
+    if resposta:
+        return resposta
+
+    passageiros, rota = _passageiros_em_ordem(db, viagem_id)
+    if rota is None:
+        return resposta_confiavel(
+            {"km_total": 0, "minutos_estimados": 0, "metodo": None, "paradas": []},
+            headers=cabecalhos_cache(etag, "privado")
+        )
+
+    todas = unidades()
+    por_unidade = {}
+    for unidade_id, passageiro in passageiros:
+        por_unidade.setdefault(str(unidade_id) if unidade_id else None, []).append(passageiro)
+    paradas = []
+    for parada in rota["paradas"]:
+        unidade = todas.get(parada["unidade_id"], {})
+        paradas.append({
+            "ordem": len(paradas) + 1,
+            "unidade_id": parada["unidade_id"],
+            "nome": unidade.get("nome", "Não informada"),
+            "bairro": unidade.get("bairro"),
+            "latitude": unidade.get("latitude"),
+            "longitude": unidade.get("longitude"),
+            "km_trecho": parada["km_trecho"],
+            "passageiros": por_unidade.get(parada["unidade_id"], []),
         })
-    
-    return resultado
+    if None in por_unidade: # Solicitação sem UBS: o motorista confere na saída
+        paradas.append({
+            "ordem": len(paradas) + 1, "unidade_id": None, "nome": "Não informada", "bairro": None,
+            "latitude": None, "longitude": None, "km_trecho": None, "passageiros": por_unidade[None],
+        })
+
+    return resposta_confiavel({
+        "km_total": rota["km_total"],
+        "minutos_estimados": rota["minutos_estimados"],
+        "metodo": rota["metodo"],
+        "paradas": paradas,
+    }, headers=cabecalhos_cache(etag, "privado"))
 
 @router.put("/motorista/confirmar-presenca/{solicitacao_id}", dependencies=[Depends(ChecarPermissao(["MOTORISTA", "SUPER_ADMIN"]))])
 async def realizar_checkin(
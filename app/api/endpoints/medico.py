@@ -1,5 +1,5 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from pydantic import BaseModel
@@ -8,6 +8,9 @@ from datetime import datetime
 from app.db.session import get_db
 from app.db.base import Usuario, SolicitacaoTFD, Paciente, UnidadeSaude
 from app.api.deps import get_usuario_atual, ChecarPermissao
+from app.services.cache_unidades import nome_unidade
+from app.core.respostas import resposta_confiavel
+from app.core.cache_http import etag_fraco, nao_modificado, cabecalhos_cache
 
 router = APIRouter()
 
@@ -26,6 +29,7 @@ class EncaminhamentoDetalhe(BaseModel):
     prioridade: int
     status: str
     data_solicitacao: datetime
+    unidade_solicitante: Optional[str] = None # Nome da UBS que encaminhou
     unidade_destino: Optional[str] = "Regulação Central"
 
 class PerfilUpdate(BaseModel):
@@ -62,28 +66,43 @@ async def get_dashboard_stats(
 
 @router.get("/encaminhamentos", response_model=List[EncaminhamentoDetalhe])
 async def listar_encaminhamentos_ubs(
+    request: Request,
     unidade_id: str,
     db: Session = Depends(get_db),
     usuario: Usuario = Depends(get_usuario_atual)
 ):
     """Lista todos os encaminhamentos feitos por esta UBS"""
-    solicitacoes = db.query(SolicitacaoTFD).filter(
+    # Lista sem mudança desde a última vez que o app buscou: 304 sem consultar o banco
+    etag = etag_fraco(("solicitacoes_tfd", "pacientes", "unidades_saude"), unidade_id)
+    resposta = nao_modificado(request, etag, "privado")
+    if resposta:
+        return resposta
+
+    # Paciente vem no mesmo SELECT (uma consulta, qualquer que seja o tamanho da lista),
+    # só com as colunas usadas: tuplas direto do cursor, sem montar objetos ORM
+    solicitacoes = db.query(
+        SolicitacaoTFD.id, Paciente.nome, Paciente.cpf, SolicitacaoTFD.procedimento,
+        SolicitacaoTFD.nivel_prioridade, SolicitacaoTFD.status_pedido, SolicitacaoTFD.criado_em,
+        SolicitacaoTFD.unidade_solicitante_id
+    ).outerjoin(Paciente, SolicitacaoTFD.paciente_id == Paciente.id).filter(
         SolicitacaoTFD.unidade_solicitante_id == unidade_id
     ).order_by(SolicitacaoTFD.criado_em.desc()).all()
 
     resultado = []
-    for sol in solicitacoes:
-        paciente = db.query(Paciente).filter(Paciente.id == sol.paciente_id).first()
+    for id_solicitacao, nome, cpf, procedimento, prioridade, status, criado_em, unidade_id_sol in solicitacoes:
+        # Campos exatamente do EncaminhamentoDetalhe (a resposta não passa pela validação do schema)
         resultado.append({
-            "id": str(sol.id),
-            "paciente_nome": paciente.nome if paciente else "Desconhecido",
-            "cpf": paciente.cpf if paciente else "---",
-            "procedimento": sol.procedimento,
-            "prioridade": sol.nivel_prioridade,
-            "status": sol.status_pedido,
-            "data_solicitacao": sol.criado_em
+            "id": str(id_solicitacao),
+            "paciente_nome": nome if nome is not None else "Desconhecido",
+            "cpf": cpf if cpf is not None else "---",
+            "procedimento": procedimento,
+            "prioridade": prioridade,
+            "status": status,
+            "data_solicitacao": criado_em,
+            "unidade_solicitante": nome_unidade(unidade_id_sol),
+            "unidade_destino": "Regulação Central"
         })
-    return resultado
+    return resposta_confiavel(resultado, headers=cabecalhos_cache(etag, "privado"))
 
 @router.put("/perfil/me")
 async def atualizar_perfil(
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy import func
 from app.db.session import get_db
-from app.db.base import SolicitacaoTFD, Paciente
-from app.worker import processar_documento_task
-import shutil
-import os
+from app.db.base import SolicitacaoTFD, Paciente, ReferenciaUpload
+from app.services.ocr_lote import enfileirar_documento
+from app.services.armazenamento import get_armazenamento
+from app.services.ocr_admissao import admitir_documento, cancelar_admissao
+from app.services.cotas import consumir_cota
+from app.core.config import UPLOAD_RETENCAO_HORAS
+from datetime import datetime, timedelta, timezone
 import uuid
 
 router = APIRouter()
@@ -16,24 +20,45 @@ async def processar_documento_background(
     unidade_id: str = Form(...),
     db: Session = Depends(get_db)
 ):
-    # 1. Salvar arquivo temporariamente no disco
-    os.makedirs("uploads", exist_ok=True)
-    file_path = f"uploads/{uuid.uuid4()}_{file.filename}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # 2. Criar Paciente Provisório
+    # 0. Controle de Admissão: com o OCR atrasado, recusa ANTES de criar Paciente/Solicitação
+    try:
+        unidade_id = str(uuid.UUID(unidade_id))
+    except ValueError:
+        raise HTTPException(400, "unidade_id inválido.")
+
+    admissao = admitir_documento(unidade_id)
+    if not admissao["admitido"]:
+        raise HTTPException(
+            status_code=429,
+            detail=admissao["motivo"],
+            headers={"Retry-After": str(admissao["retry_after"])}
+        )
+
+    try:
+        return _registrar_documento(file, medico_id, unidade_id, admissao, db)
+    except Exception:
+        cancelar_admissao(unidade_id) # Não entrou na fila: devolve a vaga
+        raise
+
+def _registrar_documento(file: UploadFile, medico_id: str, unidade_id: str, admissao: dict, db: Session):
+    # 1. Cota mensal da UBS (contador atômico; só vale se a solicitação for gravada)
+    cota = consumir_cota(db, unidade_id)
+    if not cota["permitido"]:
+        raise HTTPException(403, f"Cota mensal de encaminhamentos da UBS esgotada ({cota['usados']}/{cota['cota']}).")
+
+    # 2. Salvar arquivo no armazenamento (endereçado por SHA-256: uploads repetidos não duplicam)
+    blob_sha256 = get_armazenamento().salvar(file.file)
+
+    # 3. Criar Paciente Provisório
     novo_paciente = Paciente(
         nome="Em Análise...", # Será atualizado pelo Worker
         cpf=f"TEMP-{uuid.uuid4().hex[:8]}",
         telefone=""
     )
     db.add(novo_paciente)
-    db.commit()
-    db.refresh(novo_paciente)
+    db.flush()
 
-    # 3. Criar Solicitação "Pendente"
+    # 4. Criar Solicitação "Pendente"
     nova_solicitacao = SolicitacaoTFD(
         paciente_id=novo_paciente.id,
         medico_solicitante_id=medico_id,
@@ -44,14 +69,32 @@ async def processar_documento_background(
         nivel_prioridade=0
     )
     db.add(nova_solicitacao)
+    db.flush()
+
+    # Referência do arquivo: o worker solta ao terminar; se falhar, expira e o coletor limpa
+    db.add(ReferenciaUpload(
+        blob_sha256=blob_sha256,
+        solicitacao_id=nova_solicitacao.id,
+        nome_arquivo=file.filename,
+        expira_em=datetime.now(timezone.utc) + timedelta(hours=UPLOAD_RETENCAO_HORAS)
+    ))
+    solicitacao_id = str(nova_solicitacao.id)
+    # Cota + Paciente + Solicitação + Referência em um único commit
     db.commit()
-    db.refresh(nova_solicitacao)
 
-    # 4. ENVIAR PARA A FILA (Isso libera o usuário imediatamente)
-    processar_documento_task.delay(str(nova_solicitacao.id), file_path)
+    # 5. ENVIAR PARA A FILA (Isso libera o usuário imediatamente)
+    # Uploads em rajada são agrupados em lotes para o worker (ver app/services/ocr_lote.py)
+    try:
+        enfileirar_documento(solicitacao_id, blob_sha256, file.filename)
+    except Exception as e:
+        # O documento já foi gravado: um 500 aqui faria o cliente reenviar e duplicar a solicitação.
+        # A reconciliação do backlog (Beat) reenfileira o que ficou parado na fila
+        print(f"OCR: documento {solicitacao_id} gravado, mas não enfileirado ({e})")
 
     return {
         "message": "Documento enviado para análise.",
         "status": "PROCESSANDO",
-        "id_solicitacao": str(nova_solicitacao.id)
+        "id_solicitacao": solicitacao_id,
+        "posicao_fila": admissao["posicao_fila"],
+        "previsao_conclusao": admissao["previsao_conclusao"]
     }
\ No newline at end of file
@@ -1,11 +1,87 @@
-from fastapi import APIRouter, Depends
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.db.base import Paciente
+from app.utils.texto import normalizar_busca
+from app.utils.paginacao import codificar_cursor, decodificar_cursor
 
 router = APIRouter()
 
+# Campos que a recepção precisa no autocomplete (+ nome_busca para montar o cursor)
+CAMPOS_BUSCA = (Paciente.id, Paciente.nome, Paciente.cpf, Paciente.telefone, Paciente.nome_busca)
+
 @router.get("/")
 async def listar_pacientes(db: Session = Depends(get_db)):
     pacientes = db.query(Paciente).all()
-    return pacientes
\ No newline at end of file
+    return pacientes
+
+def _decodificar_cursor(cursor: str, busca_cpf: bool) -> list:
+    """[cpf] na busca por CPF, [nome_busca, id] na busca por nome."""
+    try:
+        if busca_cpf:
+            return [str(v) for v in decodificar_cursor(cursor, 1)]
+        nome_busca, ultimo_id = decodificar_cursor(cursor, 2)
+        return [str(nome_busca), uuid.UUID(ultimo_id)]
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido.")
+
+# `def` (e não `async def`): a consulta roda no threadpool sem travar as outras requisições a cada tecla
+@router.get("/busca")
+def buscar_pacientes(
+    q: str = Query(..., min_length=3, description="Início do CPF ou trecho do nome (sem diferenciar acento/maiúscula)"),
+    limite: int = Query(20, ge=1, le=50),
+    cursor: Optional[str] = Query(None, description="Valor de 'proximo_cursor' da página anterior"),
+    db: Session = Depends(get_db)
+):
+    """
+    Busca da recepção (autocomplete).
+    - Só dígitos (com ou sem pontuação): prefixo de CPF, em ordem de CPF.
+    - Texto: todos os trechos precisam aparecer no nome, em ordem alfabética.
+    Paginação por cursor: a página N custa o mesmo que a primeira.
+    """
+    query = db.query(*CAMPOS_BUSCA).filter(~Paciente.cpf.like("TEMP-%")) # Provisórios do OCR não aparecem
+    digitos = "".join(c for c in q if c.isdigit())
+    busca_cpf = bool(digitos) and not q.strip(" .-0123456789")
+
+    # 1. Filtro + ordem (a mesma coluna de ordem vira o cursor)
+    if busca_cpf:
+        query = query.filter(Paciente.cpf.like(f"{digitos}%"))
+        ordem = (Paciente.cpf,)
+    else:
+        termos = normalizar_busca(q).split(" ")
+        if not any(len(t) >= 3 for t in termos):
+            raise HTTPException(status_code=400, detail="Digite pelo menos 3 letras do nome.")
+        for termo in termos:
+            termo = termo.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            query = query.filter(Paciente.nome_busca.like(f"%{termo}%", escape="\\"))
+        ordem = (Paciente.nome_busca, Paciente.id)
+
+    # 2. Continua de onde a página anterior parou
+    if cursor:
+        valores = _decodificar_cursor(cursor, busca_cpf)
+        query = query.filter(tuple_(*ordem) > tuple_(*valores))
+
+    # 3. Busca um a mais para saber se existe próxima página
+    linhas = query.order_by(*ordem).limit(limite + 1).all()
+    tem_mais = len(linhas) > limite
+    linhas = linhas[:limite]
+
+    proximo_cursor = None
+    if tem_mais:
+        ultimo = linhas[-1]
+        if busca_cpf:
+            proximo_cursor = codificar_cursor([ultimo.cpf])
+        else:
+            proximo_cursor = codificar_cursor([ultimo.nome_busca, str(ultimo.id)])
+
+    return {
+        "itens": [
+            {"id": str(p.id), "nome": p.nome, "cpf": p.cpf, "telefone": p.telefone}
+            for p in linhas
+        ],
+        "proximo_cursor": proximo_cursor,
+    }
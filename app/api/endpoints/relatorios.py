@@ -0,0 +1,103 @@
+import os
+import uuid
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+
+from app.api.deps import ChecarPermissao
+from app.db.base import Usuario
+from app.core.config import EXPORTACOES_DIR
+from app.services.exportacao import (
+    TIPOS, FORMATOS, PRONTO, gerar_csv, gravar_arquivo, nome_do_arquivo,
+    agendar_exportacao, status_exportacao, caminho_exportacao
+)
+from app.utils.datas import mes_atual, proximo_mes
+
+router = APIRouter()
+
+permissao_relatorios = ChecarPermissao(["GESTOR", "SECRETARIO"])
+
+
+def filtros_exportacao(
+    tipo: str,
+    inicio: Optional[date] = Query(None, description="AAAA-MM-DD (padrão: dia 1 do mês atual)"),
+    fim: Optional[date] = Query(None, description="AAAA-MM-DD, inclusive (padrão: último dia do mês atual)"),
+    unidade_id: Optional[uuid.UUID] = None,
+    viagem_id: Optional[uuid.UUID] = Query(None, description="Só manifestos: uma viagem"),
+    destino: Optional[str] = Query(None, description="Só viagens: filtro pelo destino"),
+) -> dict:
+    """Valida o tipo e o período; os filtros vão como texto (servem direto de argumento para a tarefa do Celery)."""
+    if tipo not in TIPOS:
+        raise HTTPException(404, f"Exportação desconhecida. Opções: {', '.join(TIPOS)}.")
+    inicio = inicio or mes_atual()
+    fim = fim or proximo_mes(mes_atual()) - timedelta(days=1)
+    if fim < inicio:
+        raise HTTPException(400, "Período inválido: fim antes do início.")
+    filtros = {"inicio": inicio.isoformat(), "fim": fim.isoformat()}
+    for nome, valor in (("unidade_id", unidade_id), ("viagem_id", viagem_id), ("destino", destino)):
+        if valor:
+            filtros[nome] = str(valor)
+    return filtros
+
+
+def _validar_formato(formato: str):
+    if formato not in FORMATOS:
+        raise HTTPException(400, f"Formato inválido. Opções: {', '.join(FORMATOS)}.")
+
+
+@router.get("/exportar/{tipo}", dependencies=[Depends(permissao_relatorios)])
+async def exportar(tipo: str, formato: str = "csv", filtros: dict = Depends(filtros_exportacao)):
+    """
+    Exportação direta (viagens, manifestos ou encaminhamentos) por período e UBS.
+    CSV sai em streaming conforme as linhas chegam do banco; XLSX é montado num arquivo temporário
+    e enviado no final. Para períodos longos, use POST /exportar/{tipo}/agendar.
+    """
+    _validar_formato(formato)
+    cabecalhos = {"Content-Disposition": f'attachment; filename="{nome_do_arquivo(tipo, formato, filtros)}"'}
+
+    if formato == "csv":
+        return StreamingResponse(gerar_csv(tipo, filtros), media_type=FORMATOS["csv"], headers=cabecalhos)
+
+    caminho = os.path.join(EXPORTACOES_DIR, "tmp", f"{uuid.uuid4().hex}.xlsx")
+    await run_in_threadpool(gravar_arquivo, tipo, formato, filtros, caminho)
+    return FileResponse(caminho, media_type=FORMATOS["xlsx"], headers=cabecalhos,
+                        background=BackgroundTask(os.remove, caminho))
+
+
+@router.post("/exportar/{tipo}/agendar", status_code=202)
+async def agendar(
+    tipo: str,
+    formato: str = "xlsx",
+    filtros: dict = Depends(filtros_exportacao),
+    usuario: Usuario = Depends(permissao_relatorios),
+):
+    """Gera a exportação no worker. Acompanhe em GET /exportacoes/{id} e baixe quando estiver PRONTO."""
+    _validar_formato(formato)
+    exportacao_id = agendar_exportacao(tipo, formato, filtros, usuario.id)
+    return {"id": exportacao_id, "status": "NA_FILA", "filtros": filtros}
+
+
+@router.get("/exportacoes/{exportacao_id}")
+async def acompanhar(exportacao_id: str, usuario: Usuario = Depends(permissao_relatorios)):
+    # Só quem agendou acompanha e baixa (exportação de outro usuário responde como inexistente)
+    exportacao = status_exportacao(exportacao_id, usuario.id)
+    if not exportacao:
+        raise HTTPException(404, "Exportação não encontrada (ou expirada).")
+    return exportacao
+
+
+@router.get("/exportacoes/{exportacao_id}/arquivo")
+async def baixar(exportacao_id: str, usuario: Usuario = Depends(permissao_relatorios)):
+    exportacao = status_exportacao(exportacao_id, usuario.id)
+    if not exportacao:
+        raise HTTPException(404, "Exportação não encontrada (ou expirada).")
+    if exportacao["status"] != PRONTO:
+        raise HTTPException(409, f"Exportação ainda não está pronta (status: {exportacao['status']}).")
+    caminho = caminho_exportacao(exportacao_id, exportacao["formato"])
+    if not os.path.exists(caminho):
+        raise HTTPException(410, "Arquivo da exportação já foi removido.")
+    return FileResponse(caminho, media_type=FORMATOS[exportacao["formato"]], filename=exportacao["arquivo"])
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc
 from app.db.session import get_db
-from app.db.base import Paciente, SolicitacaoTFD, CronogramaViagem
-from datetime import datetime, timedelta
-from pydantic import BaseModel
+from app.db.base import Paciente, SolicitacaoTFD, CronogramaViagem, Usuario
+from app.api.deps import ChecarPermissao
+from app.utils.cpf import normalizar_cpf
+from app.services.cotas import consumir_cota
+from app.services.ajuda_custo import reservar_ajuda_custo, estornar_ajuda_custo, resumo_do_mes
+from app.services.notificacoes import enfileirar_notificacao
+from app.services.eventos import registrar_eventos, linha_do_tempo
+from app.utils.datas import mes_atual
+from app.core.respostas import resposta_confiavel
+from app.core.cache_http import etag_fraco, janela_publica, nao_modificado, cabecalhos_cache
+from datetime import date, datetime, timedelta
+from pydantic import BaseModel, confloat
 from typing import Optional, List
 import uuid
 
@@ -25,6 +34,9 @@ class CandidaturaVaga(BaseModel):
     com_acompanhante: bool = False
     procedimento: str
 
+class AprovacaoAjudaCusto(BaseModel):
+    valor: confloat(gt=0) # R$ para passagem/alimentação do paciente
+
 # ==========================================
 # 1. Gestão de Frota (Cadastro de Viagens)
 # ==========================================
@@ -46,12 +58,23 @@ async def criar_viagem(dados: CronogramaCreate, db: Session = Depends(get_db)):
 # ==========================================
 
 @router.get("/mural-viagens")
-async def buscar_viagens(destino: Optional[str] = None, data: Optional[str] = None, db: Session = Depends(get_db)):
+async def buscar_viagens(request: Request, destino: Optional[str] = None, data: Optional[str] = None, db: Session = Depends(get_db)):
     """
     Retorna as viagens disponíveis (Estilo busca do BlaBlaCar).
     Mostra: Horário, Motorista, Vagas Restantes.
+    Rota pública: o proxy reverso pode guardar por alguns segundos; o app revalida com If-None-Match.
     """
-    query = db.query(CronogramaViagem).filter(CronogramaViagem.data_partida >= datetime.now())
+    # ETag pela versão da tabela de viagens + filtros + janela de tempo (viagens que partem saem da lista)
+    etag = etag_fraco(("cronograma_viagens",), destino, data, janela_publica())
+    resposta = nao_modificado(request, etag, "publico")
+    if resposta:
+        return resposta
+
+    # Só as colunas usadas: linhas (tuplas) direto do cursor, sem montar objetos ORM
+    query = db.query(
+        CronogramaViagem.id, CronogramaViagem.destino, CronogramaViagem.data_partida, CronogramaViagem.motorista,
+        CronogramaViagem.placa, CronogramaViagem.capacidade_total, CronogramaViagem.vagas_ocupadas
+    ).filter(CronogramaViagem.data_partida >= datetime.now())
     
     if destino:
         query = query.filter(CronogramaViagem.destino.ilike(f"%{destino}%"))
@@ -64,19 +87,19 @@ async def buscar_viagens(destino: Optional[str] = None, data: Optional[str] = No
     
     # Formata retorno visual para o App
     resultado = []
-    for v in viagens:
-        vagas_livres = v.capacidade_total - v.vagas_ocupadas
+    for id_viagem, destino_viagem, partida, motorista, placa, capacidade, ocupadas in viagens:
+        vagas_livres = capacidade - ocupadas
         resultado.append({
-            "id_viagem": str(v.id),
+            "id_viagem": str(id_viagem),
             "origem": "Águas Belas",
-            "destino": v.destino,
-            "data_hora": v.data_partida,
-            "motorista": v.motorista,
-            "veiculo": v.placa,
+            "destino": destino_viagem,
+            "data_hora": partida,
+            "motorista": motorista,
+            "veiculo": placa,
             "vagas_disponiveis": vagas_livres,
             "status_lotacao": "Lotado" if vagas_livres <= 0 else "Disponível"
         })
-    return resultado
+    return resposta_confiavel(resultado, headers=cabecalhos_cache(etag, "publico"))
 
 @router.post("/candidatar-vaga")
 async def solicitar_vaga_blablacar(candidatura: CandidaturaVaga, db: Session = Depends(get_db)):
@@ -84,7 +107,9 @@ async def solicitar_vaga_blablacar(candidatura: CandidaturaVaga, db: Session = D
     Paciente clica em 'Solicitar' no ônibus.
     NÃO reserva a vaga imediatamente. Entra na fila para análise do gestor.
     """
-    paciente = db.query(Paciente).filter(Paciente.cpf == candidatura.cpf_paciente).first()
+    # CPF de Paciente é gravado só com dígitos (aceita "123.456.789-09" ou "12345678909")
+    cpf = normalizar_cpf(candidatura.cpf_paciente) or candidatura.cpf_paciente
+    paciente = db.query(Paciente).filter(Paciente.cpf == cpf).first()
     if not paciente:
         raise HTTPException(status_code=404, detail="Paciente não encontrado.")
 
@@ -93,10 +118,17 @@ async def solicitar_vaga_blablacar(candidatura: CandidaturaVaga, db: Session = D
     if not viagem:
         raise HTTPException(status_code=404, detail="Viagem não encontrada.")
 
+    # Cota mensal da UBS do paciente (a candidatura conta como encaminhamento dela)
+    if paciente.unidade_origem_id:
+        cota = consumir_cota(db, paciente.unidade_origem_id)
+        if not cota["permitido"]:
+            raise HTTPException(status_code=403, detail=f"Cota mensal de encaminhamentos da UBS esgotada ({cota['usados']}/{cota['cota']}).")
+
     # Cria a "Intenção de Viagem"
     solicitacao = SolicitacaoTFD(
         paciente_id=paciente.id,
         viagem_id=viagem.id,
+        unidade_solicitante_id=paciente.unidade_origem_id,
         data_desejada=viagem.data_partida,
         com_acompanhante=candidatura.com_acompanhante,
         nivel_prioridade=candidatura.prioridade_ocr, # Define a ordem na fila
@@ -106,14 +138,26 @@ async def solicitar_vaga_blablacar(candidatura: CandidaturaVaga, db: Session = D
     )
     
     db.add(solicitacao)
-    db.commit()
+    db.commit() # Grava a solicitação e o consumo da cota juntos
     
     return {
         "status": "Candidatura Registrada",
         "mensagem": "Sua solicitação foi enviada para o gestor. Você será notificado se a vaga for confirmada.",
-        "prioridade_considerada": candidatura.prioridade_ocr
+        "prioridade_considerada": candidatura.prioridade_ocr,
+        "id_solicitacao": str(solicitacao.id) # Acompanhamento: /solicitacoes/{id}/linha-do-tempo
     }
 
+@router.get("/solicitacoes/{id_solicitacao}/linha-do-tempo")
+async def linha_do_tempo_solicitacao(id_solicitacao: uuid.UUID, db: Session = Depends(get_db)):
+    """
+    Acompanhamento do pedido no app do paciente: cada mudança de status, com quando e quem (perfil).
+    O id da solicitação (devolvido na candidatura/envio do laudo) é a chave; a resposta não traz dados pessoais.
+    """
+    eventos = linha_do_tempo(db, id_solicitacao)
+    if not eventos and not db.query(SolicitacaoTFD.id).filter(SolicitacaoTFD.id == id_solicitacao).first():
+        raise HTTPException(status_code=404, detail="Solicitação não encontrada.")
+    return resposta_confiavel(eventos)
+
 # ==========================================
 # 3. Visão do Gestor (Aprovação por Prioridade)
 # ==========================================
@@ -124,7 +168,10 @@ async def listar_candidatos_viagem(id_viagem: str, db: Session = Depends(get_db)
     Mostra quem quer ir nesse ônibus, ORDENADO POR PRIORIDADE (5 primeiro).
     Isso ajuda o gestor a decidir quem viaja.
     """
-    candidatos = db.query(SolicitacaoTFD, Paciente).join(Paciente).filter(
+    candidatos = db.query(
+        SolicitacaoTFD.id, Paciente.nome, Paciente.cpf, SolicitacaoTFD.nivel_prioridade,
+        SolicitacaoTFD.procedimento, SolicitacaoTFD.com_acompanhante
+    ).join(Paciente, SolicitacaoTFD.paciente_id == Paciente.id).filter(
         SolicitacaoTFD.viagem_id == id_viagem,
         SolicitacaoTFD.status_pedido == "Aguardando_Analise"
     ).order_by(
@@ -133,18 +180,18 @@ async def listar_candidatos_viagem(id_viagem: str, db: Session = Depends(get_db)
     ).all()
     
     lista = []
-    for sol, pac in candidatos:
-        vagas_req = 2 if sol.com_acompanhante else 1
+    for id_solicitacao, nome, cpf, prioridade, procedimento, com_acompanhante in candidatos:
+        vagas_req = 2 if com_acompanhante else 1
         lista.append({
-            "id_solicitacao": str(sol.id),
-            "paciente": pac.nome,
-            "cpf": pac.cpf,
-            "prioridade": sol.nivel_prioridade, # Ex: 5 (Onco)
-            "procedimento": sol.procedimento,
+            "id_solicitacao": str(id_solicitacao),
+            "paciente": nome,
+            "cpf": cpf,
+            "prioridade": prioridade, # Ex: 5 (Onco)
+            "procedimento": procedimento,
             "vagas_solicitadas": vagas_req,
-            "acompanhante": "Sim" if sol.com_acompanhante else "Não"
+            "acompanhante": "Sim" if com_acompanhante else "Não"
         })
-    return lista
+    return resposta_confiavel(lista)
 
 @router.post("/gestao/aprovar/{id_solicitacao}")
 async def aprovar_candidato(id_solicitacao: str, db: Session = Depends(get_db)):
@@ -166,7 +213,126 @@ async def aprovar_candidato(id_solicitacao: str, db: Session = Depends(get_db)):
     viagem.vagas_ocupadas += vagas_necessarias
     solicitacao.status_pedido = "Aprovado_Onibus"
     solicitacao.status_aprovacao = True
+
+    # Aviso ao paciente: entra na outbox junto com a aprovação (o envio é do worker)
+    telefone = db.query(Paciente.telefone).filter(Paciente.id == solicitacao.paciente_id).scalar()
+    enfileirar_notificacao(
+        db, telefone,
+        f"UniSISM: sua vaga no ônibus para {viagem.destino} foi confirmada. "
+        f"Embarque em {viagem.data_partida:%d/%m/%Y às %H:%M}, placa {viagem.placa}.",
+        f"vaga_aprovada:{solicitacao.id}"
+    )
     
     db.commit()
     
-    return {"status": "Confirmado", "msg": f"Paciente {solicitacao.paciente_id} confirmado no ônibus. Vagas restantes: {viagem.capacidade_total - viagem.vagas_ocupadas}"}
\ No newline at end of file
+    return {"status": "Confirmado", "msg": f"Paciente {solicitacao.paciente_id} confirmado no ônibus. Vagas restantes: {viagem.capacidade_total - viagem.vagas_ocupadas}"}
+
+# ==========================================
+# 4. Ajuda de Custo (Teto Diário)
+# ==========================================
+
+@router.post("/gestao/aprovar-ajuda-custo/{id_solicitacao}")
+async def aprovar_ajuda_custo(
+    id_solicitacao: str,
+    dados: AprovacaoAjudaCusto,
+    usuario: Usuario = Depends(ChecarPermissao(["GESTOR", "SECRETARIO"])),
+    db: Session = Depends(get_db)
+):
+    """
+    Aprova a ajuda de custo (quando não há vaga no ônibus).
+    O valor sai do teto do dia da viagem: se não couber, a aprovação é recusada.
+    """
+    solicitacao = db.query(
+        SolicitacaoTFD.id, SolicitacaoTFD.data_desejada, SolicitacaoTFD.status_pedido, SolicitacaoTFD.status_aprovacao
+    ).filter(SolicitacaoTFD.id == id_solicitacao).first()
+    if not solicitacao: raise HTTPException(404, detail="Solicitação não encontrada.")
+
+    # 1. Marca como aprovada só se ainda não foi (duas aprovações simultâneas: a segunda não acha a linha)
+    marcada = db.query(SolicitacaoTFD).filter(
+        SolicitacaoTFD.id == solicitacao.id,
+        SolicitacaoTFD.status_pedido != "Aprovado_Ajuda_Custo"
+    ).update({
+        SolicitacaoTFD.status_pedido: "Aprovado_Ajuda_Custo",
+        SolicitacaoTFD.tipo_transporte: "Ajuda_Custo",
+        SolicitacaoTFD.valor_ajuda_custo: dados.valor,
+        SolicitacaoTFD.status_aprovacao: True,
+    }, synchronize_session=False)
+    if not marcada:
+        raise HTTPException(409, detail="Ajuda de custo já aprovada para esta solicitação.")
+    # UPDATE em massa não passa pelo flush: o histórico é gravado aqui (sai no mesmo commit)
+    registrar_eventos(db, [
+        (solicitacao.id, "status_pedido", solicitacao.status_pedido, "Aprovado_Ajuda_Custo"),
+        (solicitacao.id, "status_aprovacao", solicitacao.status_aprovacao, True),
+    ])
+
+    # 2. Reserva no teto do dia + lançamento no livro-razão (mesma transação)
+    dia = solicitacao.data_desejada.date()
+    reserva = reservar_ajuda_custo(db, solicitacao.id, dia, dados.valor, usuario.id)
+    if not reserva["reservado"]:
+        db.rollback()
+        raise HTTPException(409, detail=f"Teto de ajuda de custo do dia {dia:%d/%m/%Y} esgotado. Disponível: R$ {reserva['disponivel']:.2f}.")
+
+    telefone = db.query(Paciente.telefone).join(SolicitacaoTFD).filter(SolicitacaoTFD.id == solicitacao.id).scalar()
+    enfileirar_notificacao(
+        db, telefone,
+        f"UniSISM: sua ajuda de custo de R$ {dados.valor:.2f} para a viagem de {dia:%d/%m/%Y} foi aprovada.",
+        f"ajuda_custo_aprovada:{solicitacao.id}"
+    )
+
+    db.commit()
+    return {
+        "status": "Confirmado",
+        "msg": f"Ajuda de custo de R$ {dados.valor:.2f} aprovada.",
+        "disponivel_no_dia": reserva["disponivel"]
+    }
+
+@router.post("/gestao/estornar-ajuda-custo/{id_solicitacao}")
+async def estornar_ajuda_custo_aprovada(
+    id_solicitacao: str,
+    usuario: Usuario = Depends(ChecarPermissao(["GESTOR", "SECRETARIO"])),
+    db: Session = Depends(get_db)
+):
+    """
+    Desfaz uma aprovação de ajuda de custo feita por engano: o valor volta para o teto do dia,
+    o livro-razão ganha o lançamento de ESTORNO e a solicitação volta para análise.
+    """
+    solicitacao = db.query(
+        SolicitacaoTFD.id, SolicitacaoTFD.status_pedido, SolicitacaoTFD.status_aprovacao
+    ).filter(SolicitacaoTFD.id == id_solicitacao).first()
+    if not solicitacao: raise HTTPException(404, detail="Solicitação não encontrada.")
+
+    # Só estorna o que está aprovado (dois estornos simultâneos: o segundo não acha a linha)
+    desmarcada = db.query(SolicitacaoTFD).filter(
+        SolicitacaoTFD.id == solicitacao.id,
+        SolicitacaoTFD.status_pedido == "Aprovado_Ajuda_Custo"
+    ).update({
+        SolicitacaoTFD.status_pedido: "Aguardando_Analise",
+        SolicitacaoTFD.tipo_transporte: "Pendente",
+        SolicitacaoTFD.valor_ajuda_custo: 0.0,
+        SolicitacaoTFD.status_aprovacao: False,
+    }, synchronize_session=False)
+    if not desmarcada:
+        raise HTTPException(409, detail="A ajuda de custo desta solicitação não está aprovada.")
+    registrar_eventos(db, [
+        (solicitacao.id, "status_pedido", "Aprovado_Ajuda_Custo", "Aguardando_Analise"),
+        (solicitacao.id, "status_aprovacao", solicitacao.status_aprovacao, False),
+    ])
+
+    estornado = estornar_ajuda_custo(db, solicitacao.id, usuario.id)
+    db.commit()
+    return {"status": "Estornado", "msg": f"Ajuda de custo de R$ {estornado:.2f} estornada."}
+
+@router.get("/gestao/ajuda-custo/resumo", dependencies=[Depends(ChecarPermissao(["GESTOR", "SECRETARIO"]))])
+async def resumo_ajuda_custo(mes: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Gasto com ajuda de custo no mês (padrão: mês atual), dia a dia, contra o orçamento.
+    mes: "AAAA-MM".
+    """
+    if mes:
+        try:
+            referencia = date.fromisoformat(f"{mes}-01")
+        except ValueError:
+            raise HTTPException(400, "Mês inválido. Use AAAA-MM.")
+    else:
+        referencia = mes_atual()
+    return resumo_do_mes(db, referencia)
@@ -0,0 +1,51 @@
+import uuid
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, confloat
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+from app.db.base import UnidadeSaude
+from app.api.deps import ChecarPermissao
+from app.services.cotas import uso_das_cotas
+from app.utils.datas import mes_atual
+
+router = APIRouter()
+
+class CoordenadasUnidade(BaseModel):
+    latitude: confloat(ge=-90, le=90)
+    longitude: confloat(ge=-180, le=180)
+
+@router.get("/cotas", dependencies=[Depends(ChecarPermissao(["GESTOR", "SECRETARIO", "SUPER_ADMIN"]))])
+async def uso_cotas_mensais(mes: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Painel da Secretaria: encaminhamentos usados x cota mensal de cada UBS.
+    mes: "AAAA-MM" (padrão: mês atual).
+    """
+    if mes:
+        try:
+            referencia = date.fromisoformat(f"{mes}-01")
+        except ValueError:
+            raise HTTPException(400, "Mês inválido. Use AAAA-MM.")
+    else:
+        referencia = mes_atual()
+
+    return {
+        "mes": referencia.strftime("%Y-%m"),
+        "unidades": uso_das_cotas(db, referencia)
+    }
+
+@router.put("/{unidade_id}/coordenadas", dependencies=[Depends(ChecarPermissao(["GESTOR", "SUPER_ADMIN"]))])
+async def definir_coordenadas(unidade_id: uuid.UUID, dados: CoordenadasUnidade, db: Session = Depends(get_db)):
+    """
+    Ponto de embarque da UBS (graus decimais, ex: do Google Maps), usado na ordem das paradas do ônibus.
+    O cache de UBS de todos os processos recarrega no commit; as rotas das viagens são recalculadas na próxima leitura.
+    """
+    unidade = db.get(UnidadeSaude, unidade_id)
+    if not unidade:
+        raise HTTPException(404, "Unidade não encontrada.")
+    unidade.latitude, unidade.longitude = dados.latitude, dados.longitude
+    db.commit()
+    return {"id": str(unidade.id), "nome": unidade.nome, "latitude": unidade.latitude, "longitude": unidade.longitude}
@@ -1,13 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, selectinload
+from typing import Optional
 import uuid
 
 from app.db.session import get_db
-from app.db.base import Usuario, UnidadeSaude
+from app.db.base import Usuario, UnidadeSaude, medico_unidade
 from app.core.security import criar_hash_senha
 from app.api.deps import ChecarPermissao
-from app.schemas.usuario import UsuarioCreate, UsuarioResponse, UsuarioUpdate
+from app.schemas.usuario import UsuarioCreate, UsuarioResponse, UsuarioUpdate, UsuarioPagina
+from app.utils.paginacao import codificar_cursor, decodificar_cursor
+from app.core.respostas import resposta_confiavel
 
 router = APIRouter()
 
@@ -42,24 +45,79 @@ async def criar_usuario(
         primeiro_acesso=True
     )
 
-    # 4. Vínculo com Unidades de Saúde (Se fornecido)
+    # 4. Vínculo com Unidades de Saúde (Se fornecido) - uma consulta para todas
     if usuario_in.unidades_ids:
-        for unidade_id in usuario_in.unidades_ids:
-            unidade = db.query(UnidadeSaude).filter(UnidadeSaude.id == unidade_id).first()
-            if unidade:
-                novo_usuario.unidades.append(unidade)
+        novo_usuario.unidades = db.query(UnidadeSaude).filter(
+            UnidadeSaude.id.in_(usuario_in.unidades_ids)
+        ).all()
 
     db.add(novo_usuario)
     db.commit()
-    db.refresh(novo_usuario)
+
+    # Recarrega já com as unidades (o commit expira o objeto)
+    novo_usuario = db.query(Usuario).options(selectinload(Usuario.unidades)).filter(
+        Usuario.id == novo_usuario.id
+    ).one()
     
     # Monta resposta manual para incluir as unidades formatadas
     return formatar_retorno(novo_usuario)
 
-@router.get("/", response_model=List[UsuarioResponse], dependencies=[Depends(permissao_super_admin)])
-async def listar_usuarios(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    usuarios = db.query(Usuario).offset(skip).limit(limit).all()
-    return [formatar_retorno(u) for u in usuarios]
+@router.get("/", response_model=UsuarioPagina, dependencies=[Depends(permissao_super_admin)])
+async def listar_usuarios(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Valor de 'proximo_cursor' da página anterior"),
+    perfil: Optional[str] = None,
+    unidade_id: Optional[uuid.UUID] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Lista usuários em ordem alfabética, paginada por cursor (nome, id).
+    Sempre 2 consultas por página: os usuários + as unidades de todos eles, as duas só com as
+    colunas da resposta (tuplas, sem montar objetos ORM).
+    Filtros opcionais: perfil (ex: MEDICO) e UBS vinculada.
+    """
+    query = db.query(
+        Usuario.id, Usuario.nome, Usuario.cpf, Usuario.login, Usuario.perfil,
+        Usuario.crm, Usuario.primeiro_acesso, Usuario.criado_em
+    )
+    if perfil:
+        query = query.filter(Usuario.perfil == perfil.upper())
+    if unidade_id:
+        query = query.filter(Usuario.unidades.any(UnidadeSaude.id == unidade_id))
+    if cursor:
+        try:
+            nome, ultimo_id = decodificar_cursor(cursor, 2)
+            ultimo_id = uuid.UUID(ultimo_id)
+        except (ValueError, TypeError, AttributeError):
+            raise HTTPException(400, "Cursor inválido.")
+        query = query.filter(tuple_(Usuario.nome, Usuario.id) > tuple_(nome, ultimo_id))
+
+    # Um a mais para saber se existe próxima página
+    usuarios = query.order_by(Usuario.nome, Usuario.id).limit(limit + 1).all()
+    proximo_cursor = None
+    if len(usuarios) > limit:
+        usuarios = usuarios[:limit]
+        proximo_cursor = codificar_cursor([usuarios[-1].nome, str(usuarios[-1].id)])
+
+    # Unidades dos usuários da página numa consulta só
+    unidades = {u.id: [] for u in usuarios}
+    if unidades:
+        vinculos = db.query(medico_unidade.c.usuario_id, UnidadeSaude.id, UnidadeSaude.nome).join(
+            UnidadeSaude, UnidadeSaude.id == medico_unidade.c.unidade_id
+        ).filter(medico_unidade.c.usuario_id.in_(list(unidades))).order_by(UnidadeSaude.nome).all()
+        for usuario_id, id_unidade, nome_unidade in vinculos:
+            unidades[usuario_id].append({"id": str(id_unidade), "nome": nome_unidade})
+
+    # Mesmos campos do formatar_retorno (a página não passa pela validação do UsuarioPagina)
+    itens = [
+        {
+            "id": str(u.id), "nome": u.nome, "cpf": u.cpf, "login": u.login, "perfil": u.perfil,
+            "crm": u.crm, "primeiro_acesso": u.primeiro_acesso, "criado_em": u.criado_em,
+            "unidades": unidades[u.id]
+        }
+        for u in usuarios
+    ]
+    return resposta_confiavel({"itens": itens, "proximo_cursor": proximo_cursor})
 
 @router.put("/{user_id}/reset-senha", dependencies=[Depends(permissao_super_admin)])
 async def resetar_senha(user_id: str, db: Session = Depends(get_db)):
@@ -0,0 +1,55 @@
+import hashlib
+import time
+
+from fastapi import Request, Response
+
+from app.core.config import CACHE_HTTP_PUBLICO_SEGUNDOS
+from app.core.versoes import versoes_tabelas
+
+# Cache-Control por tipo de rota
+POLITICAS = {
+    # Dados públicos (mural): o proxy reverso e o app podem reaproveitar por alguns segundos
+    "publico": f"public, max-age={CACHE_HTTP_PUBLICO_SEGUNDOS}",
+    # Dados do usuário logado: só o próprio app guarda, e sempre confere o ETag antes de usar
+    "privado": "private, no-cache",
+}
+
+
+def etag_fraco(tabelas, *partes):
+    """
+    ETag fraco montado com a versão das tabelas lidas pela rota + os parâmetros que mudam a resposta
+    (filtros, id do usuário...). Não depende do corpo: dá para responder 304 antes da consulta principal.
+    None se o Redis estiver fora (a rota responde normalmente, sem ETag).
+    """
+    versoes = versoes_tabelas(*tabelas)
+    if versoes is None:
+        return None
+    chave = "|".join(str(p) for p in (*tabelas, *versoes, *partes))
+    return f'W/"{hashlib.blake2b(chave.encode(), digest_size=8).hexdigest()}"'
+
+
+def janela_publica() -> int:
+    """Número da janela de max-age atual: entra no ETag de listas que mudam com o relógio (viagens que já partiram)."""
+    return int(time.time() // CACHE_HTTP_PUBLICO_SEGUNDOS)
+
+
+def cabecalhos_cache(etag, politica: str) -> dict:
+    cabecalhos = {"Cache-Control": POLITICAS[politica]}
+    if etag:
+        cabecalhos["ETag"] = etag
+    return cabecalhos
+
+
+def nao_modificado(request: Request, etag, politica: str):
+    """Resposta 304 se o If-None-Match do cliente bate com o ETag atual (comparação fraca); senão None."""
+    if not etag:
+        return None
+    recebidos = request.headers.get("if-none-match")
+    if not recebidos:
+        return None
+    atual = etag.removeprefix("W/")
+    for recebido in recebidos.split(","):
+        recebido = recebido.strip()
+        if recebido == "*" or recebido.removeprefix("W/") == atual:
+            return Response(status_code=304, headers=cabecalhos_cache(etag, politica))
+    return None
@@ -1,9 +1,22 @@
 from celery import Celery
+from celery.schedules import crontab
+from kombu import Queue
 import os
 
+from app.core.config import (
+    OCR_TEMPO_LIMITE_SOFT, OCR_TEMPO_LIMITE_HARD, OCR_WORKER_MAX_MEMORIA_KB,
+    OCR_WORKER_MAX_TAREFAS, CELERY_VISIBILITY_TIMEOUT, UPLOAD_GC_INTERVALO_MINUTOS,
+    BI_INTERVALO_MINUTOS
+)
+
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/0")
 
+# Filas: o OCR (lento, CPU) tem fila própria para que notificações/relatórios nunca esperem atrás dele
+FILA_PADRAO = "default"
+FILA_OCR = "ocr"
+FILA_NOTIFICACOES = "notificacoes" # Envio ao provedor (I/O, limitado por taxa)
+
 celery_app = Celery(
     "unisism_worker",
     broker=CELERY_BROKER_URL,
@@ -17,4 +30,72 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="America/Sao_Paulo",
     enable_utc=True,
-)
\ No newline at end of file
+
+    # Roteamento
+    task_default_queue=FILA_PADRAO,
+    task_queues=(Queue(FILA_PADRAO), Queue(FILA_OCR), Queue(FILA_NOTIFICACOES)),
+    task_routes={
+        "processar_documento_task": {"queue": FILA_OCR},
+        "processar_lote_task": {"queue": FILA_OCR},
+        "despachar_lote_ocr_task": {"queue": FILA_PADRAO},
+        "coletar_uploads_orfaos_task": {"queue": FILA_PADRAO},
+        "reconciliar_backlog_ocr_task": {"queue": FILA_PADRAO},
+        "reconciliar_cotas_task": {"queue": FILA_PADRAO},
+        "despachar_notificacoes_task": {"queue": FILA_NOTIFICACOES},
+        "despachar_eventos_task": {"queue": FILA_PADRAO},
+        "gerar_exportacao_task": {"queue": FILA_PADRAO},
+        "atualizar_bi_task": {"queue": FILA_PADRAO},
+        "reconciliar_bi_task": {"queue": FILA_PADRAO},
+        "manter_particoes_task": {"queue": FILA_PADRAO},
+    },
+
+    # Tarefas periódicas (Celery Beat)
+    beat_schedule={
+        "coletar-uploads-orfaos": {
+            "task": "coletar_uploads_orfaos_task",
+            "schedule": UPLOAD_GC_INTERVALO_MINUTOS * 60,
+        },
+        "reconciliar-backlog-ocr": {
+            "task": "reconciliar_backlog_ocr_task",
+            "schedule": 300,
+        },
+        "despachar-notificacoes": { # Rede de segurança: reenvios agendados e despachos que se perderam
+            "task": "despachar_notificacoes_task",
+            "schedule": 30,
+        },
+        "despachar-eventos": { # Rede de segurança: eventos cujo despacho pós-commit se perdeu
+            "task": "despachar_eventos_task",
+            "schedule": 30,
+        },
+        "reconciliar-cotas-noturno": {
+            "task": "reconciliar_cotas_task",
+            "schedule": crontab(hour=3, minute=0), # Horário de Brasília (timezone acima)
+        },
+        "atualizar-bi": {
+            "task": "atualizar_bi_task",
+            "schedule": BI_INTERVALO_MINUTOS * 60,
+        },
+        "reconciliar-bi-noturno": {
+            "task": "reconciliar_bi_task",
+            "schedule": crontab(hour=3, minute=30),
+        },
+        "manter-particoes": { # Madrugada: DETACH/ATTACH pegam lock curto na tabela de solicitações
+            "task": "manter_particoes_task",
+            "schedule": crontab(hour=2, minute=0),
+        },
+    },
+
+    # Perfil para tarefas longas de CPU
+    worker_prefetch_multiplier=1,      # Não acumula tarefas em um worker enquanto outros estão livres
+    task_acks_late=True,               # Só confirma depois de terminar: crash no meio do OCR não perde o documento
+    task_reject_on_worker_lost=True,   # Processo morto (OOM/hard limit) devolve a mensagem para a fila
+                                       # (o documento que derrubou o processo vira Erro_OCR depois de
+                                       # OCR_MAX_TENTATIVAS_DOCUMENTO entregas: ver app/worker.py)
+    broker_transport_options={"visibility_timeout": CELERY_VISIBILITY_TIMEOUT},
+    worker_max_memory_per_child=OCR_WORKER_MAX_MEMORIA_KB,
+    worker_max_tasks_per_child=OCR_WORKER_MAX_TAREFAS,
+    task_annotations={
+        "processar_lote_task": {"soft_time_limit": OCR_TEMPO_LIMITE_SOFT, "time_limit": OCR_TEMPO_LIMITE_HARD},
+        "processar_documento_task": {"soft_time_limit": OCR_TEMPO_LIMITE_SOFT, "time_limit": OCR_TEMPO_LIMITE_HARD},
+    },
+)
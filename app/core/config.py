@@ -0,0 +1,137 @@
+import json
+import os
+
+# Configurações gerais (vêm do .env / docker-compose)
+REDIS_URL = os.getenv("REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0"))
+
+# --- OCR em Lote ---
+# Uploads que chegam em rajada (ex: recepção escaneando uma pilha) são agrupados
+# e processados por uma única tarefa. O lote sai quando enche OU quando o tempo acaba.
+OCR_LOTE_MAX_DOCUMENTOS = int(os.getenv("OCR_LOTE_MAX_DOCUMENTOS", "20"))
+OCR_LOTE_MAX_ESPERA_SEGUNDOS = float(os.getenv("OCR_LOTE_MAX_ESPERA_SEGUNDOS", "3"))
+
+# --- Worker de OCR (Celery) ---
+# Limites de tempo por LOTE: no soft o worker grava o que já leu e reenfileira o resto;
+# no hard o processo é morto.
+OCR_TEMPO_LIMITE_SOFT = int(os.getenv("OCR_TEMPO_LIMITE_SOFT", "600"))
+OCR_TEMPO_LIMITE_HARD = int(os.getenv("OCR_TEMPO_LIMITE_HARD", "720"))
+# Reciclagem do processo filho depois de PDFs grandes (em KB, como o Celery espera)
+OCR_WORKER_MAX_MEMORIA_KB = int(os.getenv("OCR_WORKER_MAX_MEMORIA_KB", "512000"))
+OCR_WORKER_MAX_TAREFAS = int(os.getenv("OCR_WORKER_MAX_TAREFAS", "50"))
+# Com ack tardio, a mensagem de um worker que morreu volta para a fila depois desse tempo.
+# Precisa ser MAIOR que o limite hard, senão a tarefa é entregue duas vezes.
+CELERY_VISIBILITY_TIMEOUT = int(os.getenv("CELERY_VISIBILITY_TIMEOUT", str(OCR_TEMPO_LIMITE_HARD + 300)))
+# Entregas de um mesmo documento antes de virar Erro_OCR (PDF que mata o processo não volta para sempre)
+OCR_MAX_TENTATIVAS_DOCUMENTO = int(os.getenv("OCR_MAX_TENTATIVAS_DOCUMENTO", "3"))
+
+# --- Armazenamento de Uploads (blobs por SHA-256) ---
+UPLOADS_DIR = os.getenv("UPLOADS_DIR", "uploads/blobs")
+# Referência de um documento que falhou no OCR fica disponível para reprocessar por esse tempo
+UPLOAD_RETENCAO_HORAS = int(os.getenv("UPLOAD_RETENCAO_HORAS", "168"))
+# Blob sem referência só é apagado depois dessa carência (upload em andamento ainda sem commit)
+UPLOAD_GC_CARENCIA_MINUTOS = int(os.getenv("UPLOAD_GC_CARENCIA_MINUTOS", "60"))
+UPLOAD_GC_INTERVALO_MINUTOS = int(os.getenv("UPLOAD_GC_INTERVALO_MINUTOS", "15"))
+
+# --- Exportações (CSV/XLSX) ---
+# Arquivos das exportações em segundo plano (pasta compartilhada entre API e worker)
+EXPORTACOES_DIR = os.getenv("EXPORTACOES_DIR", "uploads/exportacoes")
+# Arquivo pronto fica disponível para download por esse tempo (o coletor de uploads apaga depois)
+EXPORTACAO_RETENCAO_HORAS = int(os.getenv("EXPORTACAO_RETENCAO_HORAS", "24"))
+# Linhas buscadas por vez no cursor do servidor (memória constante, qualquer que seja o período)
+EXPORTACAO_LOTE_LINHAS = int(os.getenv("EXPORTACAO_LOTE_LINHAS", "1000"))
+# Fuso dos horários gravados com fuso (criado_em) nas planilhas
+FUSO_HORARIO = os.getenv("FUSO_HORARIO", "America/Sao_Paulo")
+
+# --- Controle de Admissão do OCR ---
+# Acima desses limites o upload é recusado com 429 + Retry-After (em documentos na fila)
+OCR_BACKLOG_MAX_GLOBAL = int(os.getenv("OCR_BACKLOG_MAX_GLOBAL", "400"))
+OCR_BACKLOG_MAX_UNIDADE = int(os.getenv("OCR_BACKLOG_MAX_UNIDADE", "120"))
+# A partir dessa fração do limite global, cada UBS só pode ocupar sua fatia justa
+# (limite global / UBS com documentos na fila), para uma UBS grande não travar as outras
+OCR_BACKLOG_FATIA_JUSTA_A_PARTIR = float(os.getenv("OCR_BACKLOG_FATIA_JUSTA_A_PARTIR", "0.5"))
+# Para a previsão de conclusão: processos de OCR em paralelo e tempo por documento sem histórico
+OCR_PROCESSOS = int(os.getenv("OCR_PROCESSOS", "2"))
+OCR_TEMPO_PADRAO_DOCUMENTO_SEGUNDOS = float(os.getenv("OCR_TEMPO_PADRAO_DOCUMENTO_SEGUNDOS", "15"))
+# Documento parado em Na_Fila_Processamento há mais que isso além do tempo previsto para esvaziar o backlog
+# (envio ao broker falhou) é reenfileirado pela reconciliação; sem o arquivo (referência expirada) vira
+# Erro_OCR e libera a vaga
+OCR_REENFILEIRAR_APOS_MINUTOS = int(os.getenv("OCR_REENFILEIRAR_APOS_MINUTOS", "60"))
+
+# --- Cache de Unidades de Saúde (em memória, por processo) ---
+# De quanto em quanto tempo cada processo confere no Redis se as UBS mudaram
+UNIDADES_CACHE_VERIFICAR_SEGUNDOS = float(os.getenv("UNIDADES_CACHE_VERIFICAR_SEGUNDOS", "5"))
+
+# --- Rotas de Embarque (ordem das paradas nas UBS) ---
+# Até esse número de UBS na viagem a ordem é a ótima (programação dinâmica); acima, heurística (2-opt)
+ROTA_EXATA_MAX_PARADAS = int(os.getenv("ROTA_EXATA_MAX_PARADAS", "10"))
+# Distância em linha reta x fator = estimativa da distância pela rua (sem serviço de mapas)
+ROTA_FATOR_VIARIO = float(os.getenv("ROTA_FATOR_VIARIO", "1.3"))
+ROTA_VELOCIDADE_KMH = float(os.getenv("ROTA_VELOCIDADE_KMH", "30"))
+# Saída do ônibus ("lat,lon"; vazio: começa na primeira parada)
+ROTA_GARAGEM = os.getenv("ROTA_GARAGEM", "")
+# Cidades de destino (JSON {"nome": [lat, lon]}): a última parada é a mais perto da estrada para lá
+ROTA_DESTINOS = json.loads(os.getenv(
+    "ROTA_DESTINOS", '{"Recife": [-8.0476, -34.8770], "Garanhuns": [-8.8828, -36.4969]}'
+))
+# Rota calculada fica no Redis por viagem (recalculada quando o conjunto de paradas muda)
+ROTA_CACHE_HORAS = int(os.getenv("ROTA_CACHE_HORAS", "48"))
+
+# --- Ajuda de Custo (TFD) ---
+# Orçamento do mês dividido igualmente pelos dias: cada dia tem seu teto de aprovação
+AJUDA_CUSTO_ORCAMENTO_MENSAL = float(os.getenv("AJUDA_CUSTO_ORCAMENTO_MENSAL", "5000"))
+
+# --- Notificações (WhatsApp) ---
+# Provedor HTTP (em desenvolvimento: python -m scripts.whatsapp_fake)
+WHATSAPP_API_URL = os.getenv("WHATSAPP_API_URL", "http://localhost:9000")
+WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN", "")
+# Limite do provedor. Vale por processo: o worker de notificações roda com concurrency=1
+WHATSAPP_MENSAGENS_POR_SEGUNDO = float(os.getenv("WHATSAPP_MENSAGENS_POR_SEGUNDO", "20"))
+WHATSAPP_CONEXOES = int(os.getenv("WHATSAPP_CONEXOES", "10"))
+WHATSAPP_TIMEOUT_SEGUNDOS = float(os.getenv("WHATSAPP_TIMEOUT_SEGUNDOS", "10"))
+# Mensagens retiradas da outbox por tarefa e tentativas antes de desistir (espera exponencial entre elas)
+NOTIFICACOES_LOTE = int(os.getenv("NOTIFICACOES_LOTE", "100"))
+NOTIFICACOES_MAX_TENTATIVAS = int(os.getenv("NOTIFICACOES_MAX_TENTATIVAS", "6"))
+NOTIFICACOES_ESPERA_BASE_SEGUNDOS = int(os.getenv("NOTIFICACOES_ESPERA_BASE_SEGUNDOS", "30"))
+
+# --- Histórico de Status (eventos das solicitações) ---
+# Eventos movidos da outbox para o histórico por tarefa (lote cheio encadeia a próxima)
+EVENTOS_LOTE = int(os.getenv("EVENTOS_LOTE", "1000"))
+# Mudanças dentro dessa janela depois do primeiro commit vão juntas num único lote
+EVENTOS_ESPERA_SEGUNDOS = int(os.getenv("EVENTOS_ESPERA_SEGUNDOS", "2"))
+
+# --- Métricas e Observabilidade ---
+# Requisição acima desse tempo vai para o log com as consultas SQL que fez
+METRICAS_REQUISICAO_LENTA_MS = float(os.getenv("METRICAS_REQUISICAO_LENTA_MS", "500"))
+# Log estruturado (JSON) de toda requisição, não só das lentas
+METRICAS_LOG_REQUISICOES = os.getenv("METRICAS_LOG_REQUISICOES", "true").lower() == "true"
+# Cada processo (API e workers) soma as métricas em memória e envia para o Redis nesse intervalo
+METRICAS_ENVIO_SEGUNDOS = float(os.getenv("METRICAS_ENVIO_SEGUNDOS", "5"))
+# GET /metrics exige "Authorization: Bearer <token>" (o Prometheus manda no scrape).
+# Sem token configurado a rota responde 404: latências, consultas e filas não ficam públicas
+METRICAS_TOKEN = os.getenv("METRICAS_TOKEN", "")
+
+# --- Cache HTTP (ETag / Cache-Control) e Compressão ---
+# max-age das rotas públicas (mural de viagens): o proxy reverso serve do cache por esse tempo
+CACHE_HTTP_PUBLICO_SEGUNDOS = int(os.getenv("CACHE_HTTP_PUBLICO_SEGUNDOS", "30"))
+# Respostas a partir desse tamanho saem comprimidas (gzip) quando o cliente aceita
+COMPRESSAO_MINIMO_BYTES = int(os.getenv("COMPRESSAO_MINIMO_BYTES", "1000"))
+
+# --- BI (tabelas de resumo do painel da Secretaria) ---
+# Intervalo da atualização incremental (Celery Beat)
+BI_INTERVALO_MINUTOS = int(os.getenv("BI_INTERVALO_MINUTOS", "10"))
+# Sobreposição com a execução anterior: cobre transações que gravaram antes da marca e fizeram commit depois
+BI_MARGEM_MINUTOS = int(os.getenv("BI_MARGEM_MINUTOS", "15"))
+# Reconciliação noturna: recalcula os últimos N dias inteiros (pega exclusões, que a marca d'água não vê)
+BI_RECONCILIAR_DIAS = int(os.getenv("BI_RECONCILIAR_DIAS", "35"))
+# Dias recalculados por comando (DELETE + INSERT ... SELECT)
+BI_LOTE_DIAS = int(os.getenv("BI_LOTE_DIAS", "100"))
+
+# --- Particionamento e Arquivamento (solicitacoes_tfd, uma partição por mês de criado_em) ---
+# Partições criadas adiantadas pela tarefa diária (mês atual + N)
+PARTICOES_MESES_A_FRENTE = int(os.getenv("PARTICOES_MESES_A_FRENTE", "3"))
+# Meses fechados mais antigos que isso saem da tabela (DETACH) e vão para um CSV comprimido
+ARQUIVO_RETENCAO_MESES = int(os.getenv("ARQUIVO_RETENCAO_MESES", "24"))
+# Pasta do arquivo frio (volume próprio / sincronizado com o armazenamento externo)
+ARQUIVO_DIR = os.getenv("ARQUIVO_DIR", "uploads/arquivo")
+# Depois do arquivo conferido, apaga a partição desanexada (false: mantém a tabela solta no banco)
+ARQUIVO_REMOVER_PARTICAO = os.getenv("ARQUIVO_REMOVER_PARTICAO", "true").lower() == "true"
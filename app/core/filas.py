@@ -0,0 +1,13 @@
+# A API só publica tarefas pelo nome: não precisa das tarefas (app.worker) nem das libs de OCR.
+# O próprio Celery só é carregado no primeiro envio, então processos que servem apenas
+# rotas JSON sobem mais rápido e com menos memória.
+_celery_app = None
+
+
+def enfileirar_tarefa(nome: str, args: list = None, countdown: float = None):
+    """Publica a tarefa `nome` no broker (a fila sai do task_routes do celery_app)."""
+    global _celery_app
+    if _celery_app is None:
+        from app.core.celery_app import celery_app
+        _celery_app = celery_app
+    return _celery_app.send_task(nome, args=args, countdown=countdown)
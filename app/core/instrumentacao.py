@@ -0,0 +1,121 @@
+import contextvars
+import logging
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+from app.core import metricas
+from app.core.config import METRICAS_REQUISICAO_LENTA_MS, METRICAS_LOG_REQUISICOES
+
+# Consultas SQL da requisição em andamento: [(segundos, sql), ...]
+# A lista é criada pelo middleware; as rotas síncronas rodam no threadpool com cópia do contexto,
+# então enxergam a mesma lista.
+_consultas = contextvars.ContextVar("consultas_sql", default=None)
+
+# Limites do log de requisição lenta (os parâmetros NUNCA vão para o log: têm CPF/nome de paciente)
+MAX_CONSULTAS_REGISTRADAS = 500
+MAX_CONSULTAS_NO_LOG = 20
+MAX_TAMANHO_SQL = 1000
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _antes_da_consulta(conn, cursor, statement, parameters, context, executemany):
+    if _consultas.get() is not None:
+        conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _depois_da_consulta(conn, cursor, statement, parameters, context, executemany):
+    consultas = _consultas.get()
+    if consultas is None or not conn.info.get("inicio_consulta"):
+        return
+    duracao = time.perf_counter() - conn.info["inicio_consulta"].pop()
+    if len(consultas) < MAX_CONSULTAS_REGISTRADAS:
+        consultas.append((duracao, statement))
+    else:
+        # Só soma: o texto de centenas de consultas não ajuda e pesa na memória
+        consultas.append((duracao, None))
+
+
+def _agrupar_sql(consultas: list) -> list:
+    """
+    Agrupa as consultas pelo texto do SQL (um N+1 aparece como a mesma consulta N vezes)
+    e devolve as que mais tomaram tempo.
+    """
+    grupos = {}
+    for duracao, sql in consultas:
+        if sql is None:
+            continue
+        grupo = grupos.setdefault(sql, [0, 0.0])
+        grupo[0] += 1
+        grupo[1] += duracao
+    mais_lentas = sorted(grupos.items(), key=lambda g: g[1][1], reverse=True)[:MAX_CONSULTAS_NO_LOG]
+    return [
+        {"vezes": vezes, "ms": round(total * 1000, 1), "sql": sql[:MAX_TAMANHO_SQL]}
+        for sql, (vezes, total) in mais_lentas
+    ]
+
+
+class MetricasMiddleware:
+    """
+    Middleware ASGI: latência por rota (pelo modelo da rota, ex: /tfd/viagens/{viagem_id}),
+    quantidade e tempo de consultas SQL por requisição, log estruturado e log de requisição lenta.
+    """
+    IGNORAR = {"/metrics", "/health"}
+
+    def __init__(self, app):
+        self.app = app
+        self._rotas = None # endpoint -> modelo da rota (montado na primeira requisição)
+
+    def _rota(self, scope) -> str:
+        if self._rotas is None:
+            self._rotas = {
+                getattr(r, "endpoint", None): r.path for r in scope["app"].routes if hasattr(r, "path")
+            }
+        # Sem rota (404) agrupa tudo: cada URL inventada não pode virar uma série nova
+        return self._rotas.get(scope.get("endpoint"), "desconhecida")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.IGNORAR:
+            return await self.app(scope, receive, send)
+
+        consultas = []
+        token = _consultas.set(consultas)
+        resposta = {"status": 500}
+
+        async def send_com_status(mensagem):
+            if mensagem["type"] == "http.response.start":
+                resposta["status"] = mensagem["status"]
+            await send(mensagem)
+
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            duracao = time.perf_counter() - inicio
+            _consultas.reset(token)
+            self._registrar(scope, resposta["status"], duracao, consultas)
+            if metricas.hora_de_enviar():
+                await run_in_threadpool(metricas.enviar_metricas)
+
+    def _registrar(self, scope, status: int, duracao: float, consultas: list):
+        rota = self._rota(scope)
+        metodo = scope["method"]
+        tempo_sql = sum(d for d, _ in consultas)
+        rotulos = {"metodo": metodo, "rota": rota}
+
+        metricas.observar("http_requisicao_duracao_segundos", duracao, {**rotulos, "status": status})
+        metricas.observar("http_requisicao_consultas_sql", len(consultas), rotulos)
+        metricas.incrementar("http_requisicao_sql_segundos_total", rotulos, tempo_sql)
+
+        campos = dict(
+            metodo=metodo, rota=rota, caminho=scope["path"], status=status,
+            duracao_ms=round(duracao * 1000, 1), consultas=len(consultas), sql_ms=round(tempo_sql * 1000, 1),
+        )
+        if duracao * 1000 >= METRICAS_REQUISICAO_LENTA_MS:
+            metricas.incrementar("http_requisicoes_lentas_total", rotulos)
+            metricas.log_estruturado("requisicao_lenta", logging.WARNING, **campos, sql=_agrupar_sql(consultas))
+        elif METRICAS_LOG_REQUISICOES:
+            metricas.log_estruturado("requisicao", **campos)
@@ -0,0 +1,171 @@
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from redis.exceptions import RedisError
+
+from app.core.config import METRICAS_ENVIO_SEGUNDOS
+from app.core.redis_client import redis_client
+
+# Todas as séries de todos os processos (API + workers) somadas num único hash do Redis
+CHAVE_SERIES = "metricas:series"
+
+BALDES_HTTP = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BALDES_CONSULTAS = (1, 2, 3, 5, 10, 20, 50, 100, 200)
+BALDES_OCR = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# nome -> (tipo, ajuda, baldes)
+FAMILIAS = {
+    "http_requisicao_duracao_segundos": ("histogram", "Latência das requisições por rota", BALDES_HTTP),
+    "http_requisicao_consultas_sql": ("histogram", "Consultas SQL por requisição", BALDES_CONSULTAS),
+    "http_requisicao_sql_segundos_total": ("counter", "Tempo gasto no banco pelas requisições", None),
+    "http_requisicoes_lentas_total": ("counter", "Requisições acima do limite de lentidão", None),
+    "ocr_etapa_duracao_segundos": ("histogram", "Duração de cada etapa do OCR no worker", BALDES_OCR),
+}
+
+# Log estruturado: uma linha JSON por evento
+logger = logging.getLogger("unisism.metricas")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log_estruturado(evento: str, nivel: int = logging.INFO, **campos):
+    logger.log(nivel, json.dumps({"evento": evento, **campos}, ensure_ascii=False, default=str))
+
+
+# --- Registro em memória (por processo) ---
+_series = {}
+_lock = threading.Lock()
+_ultimo_envio = time.monotonic()
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _rotulos(rotulos: dict) -> str:
+    if not rotulos:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in rotulos.items()) + "}"
+
+
+def incrementar(nome: str, rotulos: dict = None, valor: float = 1):
+    chave = nome + _rotulos(rotulos)
+    with _lock:
+        _series[chave] = _series.get(chave, 0) + valor
+
+
+def observar(nome: str, valor: float, rotulos: dict = None):
+    """Registra uma observação num histograma (baldes cumulativos + _sum + _count)."""
+    rotulos = rotulos or {}
+    baldes = FAMILIAS[nome][2]
+    with _lock:
+        # Todos os baldes, mesmo os que ficam em 0 (o histogram_quantile precisa da série completa)
+        for limite in baldes:
+            chave = f"{nome}_bucket" + _rotulos({**rotulos, "le": limite})
+            _series[chave] = _series.get(chave, 0) + (1 if valor <= limite else 0)
+        for chave, incremento in (
+            (f"{nome}_bucket" + _rotulos({**rotulos, "le": "+Inf"}), 1),
+            (f"{nome}_sum" + _rotulos(rotulos), valor),
+            (f"{nome}_count" + _rotulos(rotulos), 1),
+        ):
+            _series[chave] = _series.get(chave, 0) + incremento
+
+
+# --- Etapas do worker ---
+_etapas = contextvars.ContextVar("etapas_ocr", default=None)
+
+
+@contextmanager
+def medir_etapas():
+    """Acumula, dentro do bloco, o tempo de cada etapa cronometrada (para o log do lote)."""
+    totais = {}
+    token = _etapas.set(totais)
+    try:
+        yield totais
+    finally:
+        _etapas.reset(token)
+
+
+@contextmanager
+def cronometro(etapa: str):
+    """Cronometra uma etapa do OCR (rasterizar, tesseract, extracao, banco)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        observar("ocr_etapa_duracao_segundos", duracao, {"etapa": etapa})
+        totais = _etapas.get()
+        if totais is not None:
+            totais[etapa] = totais.get(etapa, 0) + duracao
+
+
+# --- Envio para o Redis e exposição ---
+def hora_de_enviar() -> bool:
+    return time.monotonic() - _ultimo_envio >= METRICAS_ENVIO_SEGUNDOS
+
+
+def enviar_metricas(forcar: bool = False):
+    """
+    Soma as séries acumuladas neste processo no hash do Redis (HINCRBYFLOAT em pipeline).
+    Sem `forcar`, só envia se já passou METRICAS_ENVIO_SEGUNDOS desde o último envio.
+    Redis fora do ar: as séries continuam em memória e vão no próximo envio.
+    """
+    global _ultimo_envio, _series
+    if not forcar and not hora_de_enviar():
+        return
+    with _lock:
+        _ultimo_envio = time.monotonic()
+        pendentes, _series = _series, {}
+    if not pendentes:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for chave, valor in pendentes.items():
+            pipe.hincrbyfloat(CHAVE_SERIES, chave, valor)
+        pipe.execute()
+    except RedisError as e:
+        with _lock:
+            for chave, valor in pendentes.items():
+                _series[chave] = _series.get(chave, 0) + valor
+        print(f"Métricas: Redis indisponível ({e})")
+
+
+_LE = re.compile(r'le="([^"]+)"')
+
+
+def _ordem(serie: str):
+    """Ordena por série e, dentro do histograma, pelos baldes em ordem numérica."""
+    le = _LE.search(serie)
+    base = _LE.sub("", serie)
+    return base, float(le.group(1)) if le else float("inf")
+
+
+def _numero(valor: float) -> str:
+    return str(int(valor)) if valor.is_integer() else repr(valor)
+
+
+def texto_prometheus() -> str:
+    """Todas as séries (de todos os processos) no formato texto do Prometheus."""
+    enviar_metricas(forcar=True)
+    series = {k.decode(): float(v) for k, v in redis_client.hgetall(CHAVE_SERIES).items()}
+
+    linhas = []
+    for nome, (tipo, ajuda, _) in FAMILIAS.items():
+        da_familia = sorted(
+            (s for s in series if s.split("{", 1)[0] in (nome, f"{nome}_bucket", f"{nome}_sum", f"{nome}_count")),
+            key=_ordem,
+        )
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} {tipo}")
+        linhas.extend(f"{s} {_numero(series[s])}" for s in da_familia)
+    return "\n".join(linhas) + "\n"
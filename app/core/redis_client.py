@@ -0,0 +1,6 @@
+import redis
+
+from app.core.config import REDIS_URL
+
+# Conexão compartilhada (o redis-py mantém um pool interno, seguro entre threads)
+redis_client = redis.Redis.from_url(REDIS_URL)
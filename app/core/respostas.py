@@ -0,0 +1,28 @@
+from decimal import Decimal
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _padrao(valor):
+    # Tipos que o orjson não conhece (datetime, date, UUID ele já serializa sozinho)
+    if isinstance(valor, Decimal):
+        return float(valor) # Mesmo resultado do jsonable_encoder
+    raise TypeError(f"Tipo não serializável em JSON: {type(valor).__name__}")
+
+
+class RespostaJSON(JSONResponse):
+    """Resposta JSON padrão da API, serializada com orjson (bem mais rápido que o json da biblioteca padrão)."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_padrao, option=orjson.OPT_NON_STR_KEYS)
+
+
+def resposta_confiavel(conteudo, status_code: int = 200, headers: dict = None) -> RespostaJSON:
+    """
+    Caminho rápido das listagens: devolve a resposta já serializada. Como a rota devolve uma Response,
+    o FastAPI pula a validação do response_model e o jsonable_encoder (que percorrem item por item).
+    Só para conteúdo montado pela própria rota com exatamente os campos do schema (inclusive os que
+    têm valor padrão): o response_model continua no decorador, mas só para a documentação.
+    """
+    return RespostaJSON(conteudo, status_code=status_code, headers=headers)
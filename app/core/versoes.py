@@ -0,0 +1,68 @@
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.redis_client import redis_client
+
+# Tabelas com número de versão no Redis: qualquer commit que grave nelas (API ou worker) incrementa.
+# As rotas de leitura montam o ETag com essas versões, sem consultar o banco nem serializar a resposta.
+TABELAS_VERSIONADAS = {"cronograma_viagens", "solicitacoes_tfd", "pacientes", "usuarios", "unidades_saude"}
+CHAVE_VERSAO = "versao:tabela:{}"
+
+
+def versoes_tabelas(*tabelas) -> list:
+    """Versão atual de cada tabela (0 = nunca gravada). None se o Redis não responder."""
+    try:
+        valores = redis_client.mget([CHAVE_VERSAO.format(t) for t in tabelas])
+    except RedisError as e:
+        print(f"Versões de tabela: Redis indisponível ({e})")
+        return None
+    return [int(v or 0) for v in valores]
+
+
+def _marcar(session, tabela):
+    if tabela in TABELAS_VERSIONADAS:
+        session.info.setdefault("tabelas_alteradas", set()).add(tabela)
+
+
+def marcar_tabelas(session, *tabelas):
+    """
+    Para gravações que não passam pelo flush nem pelo execute do ORM (bulk_update_mappings,
+    bulk_insert_mappings): quem grava marca as tabelas e a versão sobe no commit, como nas outras.
+    """
+    for tabela in tabelas:
+        _marcar(session, tabela)
+
+
+@event.listens_for(Session, "before_flush")
+def _marcar_objetos_alterados(session, flush_context, instances):
+    for objeto in (*session.new, *session.dirty, *session.deleted):
+        _marcar(session, getattr(objeto, "__tablename__", None))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _marcar_comandos_em_massa(estado):
+    # query(...).update()/.delete() e insert/update/delete do Core pela sessão não passam pelo flush
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        tabela = getattr(estado.statement, "table", None)
+        _marcar(estado.session, getattr(tabela, "name", None))
+
+
+@event.listens_for(Session, "after_commit")
+def _incrementar_versoes(session):
+    tabelas = session.info.pop("tabelas_alteradas", None)
+    if not tabelas:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for tabela in tabelas:
+            pipe.incr(CHAVE_VERSAO.format(tabela))
+        pipe.execute()
+    except RedisError as e:
+        # O ETag pode ficar velho até a próxima gravação na tabela: o cliente vê a lista anterior
+        print(f"Versões de tabela: não foi possível incrementar {sorted(tabelas)} ({e})")
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_versoes(session):
+    session.info.pop("tabelas_alteradas", None)
@@ -1,10 +1,17 @@
 import uuid
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Boolean, Integer, Table
+from sqlalchemy import Column, String, Float, Date, DateTime, ForeignKey, Boolean, Integer, Numeric, Table, Index, DDL, event, text
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
+from app.utils.texto import normalizar_busca
 from .session import Base
 
+# Busca por trecho de nome (LIKE '%...%') usa índice trigram: a extensão precisa existir antes das tabelas
+event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
 # Tabela de associação: Médico <-> Unidades de Saúde
 # (Permite que o Dr. Fernando atenda na UBS Centro de manhã e na UBS Vila à tarde)
 medico_unidade = Table(
@@ -22,6 +29,10 @@ class UnidadeSaude(Base):
     
     # Cota de Vagas (Para gestão da secretaria)
     cota_mensal = Column(Integer, default=50) 
+
+    # Ponto de embarque (graus decimais): ordem das paradas do ônibus (app/services/rotas.py)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
     
     medicos = relationship("Usuario", secondary=medico_unidade, back_populates="unidades")
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
@@ -49,6 +60,8 @@ class Paciente(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     cpf = Column(String, unique=True, index=True, nullable=False)
     nome = Column(String, nullable=False)
+    # Nome sem acento e em minúsculas (busca da recepção). Mantido junto com `nome`
+    nome_busca = Column(String, nullable=True)
     telefone = Column(String, nullable=True)
     
     # Vincula o paciente à unidade de origem (Onde ele tem prontuário)
@@ -56,6 +69,21 @@ class Paciente(Base):
     
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Trecho de nome em qualquer posição ("concei" acha "Maria da Conceição")
+        Index("ix_pacientes_nome_busca_trgm", "nome_busca",
+              postgresql_using="gin", postgresql_ops={"nome_busca": "gin_trgm_ops"}),
+        # Ordem alfabética + paginação por cursor (nome_busca, id)
+        Index("ix_pacientes_nome_busca_id", "nome_busca", "id"),
+        # Prefixo de CPF (LIKE '123%') independente da collation do banco
+        Index("ix_pacientes_cpf_prefixo", "cpf", postgresql_ops={"cpf": "text_pattern_ops"}),
+    )
+
+    @validates("nome")
+    def _sincronizar_nome_busca(self, chave, nome):
+        self.nome_busca = normalizar_busca(nome)
+        return nome
+
 class CronogramaViagem(Base):
     __tablename__ = "cronograma_viagens"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -66,11 +94,14 @@ class CronogramaViagem(Base):
     capacidade_total = Column(Integer, default=40)
     vagas_ocupadas = Column(Integer, default=0)
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
+    # Marca d'água do BI: o job só reprocessa o que mudou desde a última passada
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
 
 class SolicitacaoTFD(Base):
     __tablename__ = "solicitacoes_tfd"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    # ... outros campos existentes (paciente_id, viagem_id, etc...)
+    paciente_id = Column(UUID(as_uuid=True), ForeignKey("pacientes.id"), nullable=False, index=True)
+    viagem_id = Column(UUID(as_uuid=True), ForeignKey("cronograma_viagens.id"), nullable=True, index=True)
     
     # RASTREABILIDADE
     medico_solicitante_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=True)
@@ -90,4 +121,224 @@ class SolicitacaoTFD(Base):
     tipo_transporte = Column(String, default="Pendente") 
     valor_ajuda_custo = Column(Float, default=0.0)
     status_aprovacao = Column(Boolean, default=False)
-    criado_em = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    # Chave das partições mensais (app/services/particoes.py). No Postgres a chave primária de tabela
+    # particionada precisa conter a coluna da partição; o id (uuid4) continua único na prática
+    criado_em = Column(DateTime(timezone=True), server_default=func.now(), primary_key=True)
+    # Marca d'água do BI (também vale para query().update(): o onupdate entra no UPDATE em massa)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True)
+
+    __table_args__ = (
+        # Índices parciais por status (só as linhas de cada fila, não o histórico inteiro).
+        # Fila de candidatos da viagem já na ordem da tela (prioridade maior primeiro, depois quem pediu antes)
+        Index("ix_solicitacoes_tfd_candidatos", "viagem_id", nivel_prioridade.desc(), "criado_em",
+              postgresql_where=text("status_pedido = 'Aguardando_Analise'")),
+        # Passageiros da viagem (prancheta do motorista, contagens do painel sem ler a tabela)
+        Index("ix_solicitacoes_tfd_passageiros", "viagem_id",
+              postgresql_include=["com_acompanhante", "status_embarque", "unidade_solicitante_id"],
+              postgresql_where=text("status_pedido = 'Aprovado_Onibus'")),
+        {"postgresql_partition_by": "RANGE (criado_em)"},
+    )
+    # Para o ORM a identidade é só o id: db.get(SolicitacaoTFD, id) e filtros por id continuam iguais.
+    # eager_defaults traz o criado_em no RETURNING do INSERT: o UPDATE do ORM filtra por id + criado_em
+    # e o Postgres vai direto na partição da linha
+    __mapper_args__ = {"primary_key": [id], "eager_defaults": True}
+
+# Partição padrão: recebe o que chegar de um mês ainda sem partição (o INSERT nunca falha).
+# As mensais são criadas adiantadas pelo manter_particoes_task (e pelo init_db)
+event.listen(
+    SolicitacaoTFD.__table__, "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS solicitacoes_tfd_padrao PARTITION OF solicitacoes_tfd DEFAULT")
+    .execute_if(dialect="postgresql")
+)
+
+class ReferenciaUpload(Base):
+    """
+    Liga um arquivo do armazenamento (blob por SHA-256) à solicitação que o usa.
+    Blob sem nenhuma referência (ou com todas expiradas) é apagado pelo coletor.
+    """
+    __tablename__ = "referencias_upload"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    blob_sha256 = Column(String(64), nullable=False, index=True)
+    # Sem FK: solicitacoes_tfd é particionada (chave única com criado_em) e tem meses arquivados
+    solicitacao_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    nome_arquivo = Column(String, nullable=False) # Nome original (define se é PDF ou imagem)
+    expira_em = Column(DateTime(timezone=True), nullable=False, index=True)
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+
+class ConsumoCota(Base):
+    """
+    Contador de encaminhamentos de cada UBS no mês (cota_mensal).
+    Incrementado com UPDATE condicional na mesma transação da solicitação: nunca passa da cota
+    e não precisa contar solicitacoes_tfd a cada pedido. Reconciliado toda noite.
+    """
+    __tablename__ = "consumo_cotas"
+    unidade_id = Column(UUID(as_uuid=True), ForeignKey("unidades_saude.id"), primary_key=True)
+    mes = Column(Date, primary_key=True) # Sempre o dia 1 do mês
+    usados = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class SaldoAjudaCusto(Base):
+    """
+    Teto diário da ajuda de custo (orçamento mensal dividido pelos dias do mês) e quanto já foi reservado.
+    A reserva é um UPDATE condicional nesta linha: o teto nunca é ultrapassado, nem com aprovações simultâneas.
+    """
+    __tablename__ = "saldos_ajuda_custo"
+    dia = Column(Date, primary_key=True)
+    limite = Column(Numeric(12, 2), nullable=False)
+    reservado = Column(Numeric(12, 2), nullable=False, default=0)
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class LancamentoAjudaCusto(Base):
+    """
+    Livro-razão da ajuda de custo (somente inserção): cada reserva/estorno com o saldo do dia depois dele.
+    Auditoria: o total do dia em saldos_ajuda_custo sempre bate com a soma dos lançamentos.
+    """
+    __tablename__ = "lancamentos_ajuda_custo"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    dia = Column(Date, ForeignKey("saldos_ajuda_custo.dia"), nullable=False, index=True)
+    # Sem FK (ver ReferenciaUpload): o livro-razão fica mesmo depois que a solicitação é arquivada
+    solicitacao_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    tipo = Column(String, nullable=False) # RESERVA, ESTORNO
+    valor = Column(Numeric(12, 2), nullable=False) # Positivo na reserva, negativo no estorno
+    reservado_apos = Column(Numeric(12, 2), nullable=False) # Total reservado no dia depois deste lançamento
+    usuario_id = Column(UUID(as_uuid=True), ForeignKey("usuarios.id"), nullable=True) # Quem aprovou/estornou
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+
+# No Postgres o livro-razão recusa UPDATE/DELETE (correção = estornar_ajuda_custo, em app/services/ajuda_custo.py)
+event.listen(
+    LancamentoAjudaCusto.__table__, "after_create",
+    DDL("""
+        CREATE OR REPLACE FUNCTION lancamentos_ajuda_custo_somente_insercao() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'lancamentos_ajuda_custo é somente inserção (use um lançamento de ESTORNO)';
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER lancamentos_ajuda_custo_somente_insercao
+            BEFORE UPDATE OR DELETE ON lancamentos_ajuda_custo
+            FOR EACH ROW EXECUTE FUNCTION lancamentos_ajuda_custo_somente_insercao();
+    """).execute_if(dialect="postgresql")
+)
+
+class NotificacaoOutbox(Base):
+    """
+    Outbox de notificações: gravada na MESMA transação da mudança de status (ex: vaga aprovada).
+    O worker da fila "notificacoes" retira em lotes e envia; nada é enviado de dentro da requisição.
+    """
+    __tablename__ = "notificacoes_outbox"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    canal = Column(String, nullable=False, default="WHATSAPP")
+    telefone = Column(String, nullable=False)
+    mensagem = Column(String, nullable=False)
+    # Mesmo evento enfileirado duas vezes (ex: clique duplo) vira uma única mensagem.
+    # Também vai como Idempotency-Key para o provedor não duplicar em reenvio.
+    chave_dedupe = Column(String, nullable=False, unique=True)
+    status = Column(String, nullable=False, default="PENDENTE") # PENDENTE, ENVIANDO, ENVIADA, FALHA
+    tentativas = Column(Integer, nullable=False, default=0)
+    proxima_tentativa_em = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    ultimo_erro = Column(String, nullable=True)
+    id_provedor = Column(String, nullable=True)
+    enviada_em = Column(DateTime(timezone=True), nullable=True)
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Só as que ainda precisam sair (a tabela cresce com o histórico de enviadas)
+        Index("ix_notificacoes_outbox_fila", "proxima_tentativa_em",
+              postgresql_where=text("status IN ('PENDENTE', 'ENVIANDO')")),
+    )
+
+
+# --- Histórico de status das solicitações (app/services/eventos.py) ---
+
+class EventoOutbox(Base):
+    """
+    Saída dos eventos de status: gravada na MESMA transação da mudança (não se perde com o commit).
+    Só a chave primária, sem índices nem FK: o INSERT no caminho da requisição fica barato.
+    O worker move em lotes para eventos_solicitacao (despachar_eventos_task).
+    """
+    __tablename__ = "eventos_outbox"
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    solicitacao_id = Column(UUID(as_uuid=True), nullable=False)
+    campo = Column(String, nullable=False) # status_pedido, status_embarque, status_aprovacao
+    anterior = Column(String, nullable=True) # None na criação da solicitação
+    novo = Column(String, nullable=True)
+    ator_id = Column(UUID(as_uuid=True), nullable=True) # Usuário logado (None: paciente ou sistema)
+    ator_perfil = Column(String, nullable=True) # Perfil do usuário, ou SISTEMA (worker)
+    ocorrido_em = Column(DateTime(timezone=True), nullable=False)
+
+class EventoSolicitacao(Base):
+    """Linha do tempo da solicitação (somente inserção). Mesmo id do evento na outbox."""
+    __tablename__ = "eventos_solicitacao"
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    # Sem FK (ver ReferenciaUpload): o histórico fica mesmo depois que a solicitação é arquivada
+    solicitacao_id = Column(UUID(as_uuid=True), nullable=False)
+    campo = Column(String, nullable=False)
+    anterior = Column(String, nullable=True)
+    novo = Column(String, nullable=True)
+    ator_id = Column(UUID(as_uuid=True), nullable=True)
+    ator_perfil = Column(String, nullable=True)
+    ocorrido_em = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Linha do tempo de uma solicitação: um trecho contíguo do índice, já na ordem
+        Index("ix_eventos_solicitacao_linha_do_tempo", "solicitacao_id", "ocorrido_em"),
+    )
+
+# Como o livro-razão: o histórico recusa UPDATE/DELETE no Postgres
+event.listen(
+    EventoSolicitacao.__table__, "after_create",
+    DDL("""
+        CREATE OR REPLACE FUNCTION eventos_solicitacao_somente_insercao() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'eventos_solicitacao é somente inserção';
+        END;
+        $$ LANGUAGE plpgsql;
+        CREATE TRIGGER eventos_solicitacao_somente_insercao
+            BEFORE UPDATE OR DELETE ON eventos_solicitacao
+            FOR EACH ROW EXECUTE FUNCTION eventos_solicitacao_somente_insercao();
+    """).execute_if(dialect="postgresql")
+)
+
+
+# --- BI da Secretaria (tabelas de resumo) ---
+# Mantidas pelo job atualizar_bi_task (app/services/bi.py): o painel lê só daqui, sem varrer o histórico.
+# Cada dia é recalculado inteiro a partir das tabelas de origem (apaga e insere), então reprocessar é seguro.
+
+class BiEncaminhamentoDia(Base):
+    """Encaminhamentos por dia de criação, UBS e prioridade."""
+    __tablename__ = "bi_encaminhamentos_dia"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    dia = Column(Date, nullable=False, index=True)
+    unidade_id = Column(UUID(as_uuid=True), nullable=True) # Sem FK: resumo não trava exclusão de UBS
+    prioridade = Column(Integer, nullable=True)
+    total = Column(Integer, nullable=False, default=0)
+    aguardando = Column(Integer, nullable=False, default=0)
+    aprovados_onibus = Column(Integer, nullable=False, default=0)
+    aprovados_ajuda_custo = Column(Integer, nullable=False, default=0)
+    valor_ajuda_custo = Column(Numeric(14, 2), nullable=False, default=0)
+
+class BiViagemDia(Base):
+    """Ocupação das viagens por dia de partida e destino."""
+    __tablename__ = "bi_viagens_dia"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    dia = Column(Date, nullable=False, index=True)
+    destino = Column(String, nullable=False)
+    viagens = Column(Integer, nullable=False, default=0)
+    capacidade = Column(Integer, nullable=False, default=0)
+    vagas_ocupadas = Column(Integer, nullable=False, default=0)
+
+class BiEmbarqueDia(Base):
+    """Passageiros aprovados (embarcaram/ausentes) por dia da viagem, destino e UBS de origem."""
+    __tablename__ = "bi_embarques_dia"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    dia = Column(Date, nullable=False, index=True)
+    destino = Column(String, nullable=False)
+    unidade_id = Column(UUID(as_uuid=True), nullable=True)
+    passageiros = Column(Integer, nullable=False, default=0)
+    embarcaram = Column(Integer, nullable=False, default=0)
+    ausentes = Column(Integer, nullable=False, default=0)
+
+class BiMarca(Base):
+    """Até quando (relógio do banco) as tabelas de origem já foram resumidas."""
+    __tablename__ = "bi_marcas"
+    nome = Column(String, primary_key=True)
+    processado_ate = Column(DateTime(timezone=True), nullable=False)
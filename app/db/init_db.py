@@ -0,0 +1,23 @@
+"""
+Criação das tabelas (create_all + DDL dos eventos: extensão pg_trgm, trigger do livro-razão,
+partição padrão de solicitacoes_tfd) e das partições mensais do mês atual em diante.
+
+Roda uma vez antes de subir a API, não a cada import do app.main (com --reload e vários
+processos uvicorn, cada um repetia as consultas ao catálogo do banco na inicialização):
+    python -m app.db.init_db
+"""
+from app.db.session import engine
+from app.db import base
+from app.services.particoes import garantir_particoes
+
+
+def criar_tabelas():
+    # Cria tabelas se não existirem (Usuario, UnidadeSaude, SolicitacaoTFD, etc.)
+    base.Base.metadata.create_all(bind=engine)
+    # Banco novo já sobe com os meses à frente (não espera a tarefa diária)
+    garantir_particoes()
+
+
+if __name__ == "__main__":
+    criar_tabelas()
+    print("Tabelas verificadas/criadas.")
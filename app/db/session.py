@@ -17,4 +17,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Eventos da sessão que incrementam a versão das tabelas gravadas (ETag das rotas de leitura).
+# Registrados aqui para valer em todo processo que grava pelo SessionLocal (API, workers, scripts).
+import app.core.versoes # noqa: E402,F401
@@ -1,24 +1,35 @@
-from fastapi import FastAPI
+import secrets
+
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
 
-# Importação da Conexão e Banco
-from app.db.session import engine
-from app.db import base
+from app.services.cache_unidades import carregar_unidades
+from app.core.instrumentacao import MetricasMiddleware
+from app.core.metricas import texto_prometheus
+from app.core.config import METRICAS_TOKEN, COMPRESSAO_MINIMO_BYTES
+from app.core.respostas import RespostaJSON
 
 # Importação dos Módulos (Endpoints)
 # ATUALIZADO: Adicionado 'usuarios' para gestão de acesso
-from app.api.endpoints import auth, ocr, pacientes, tfd, frota, medico, usuarios
+from app.api.endpoints import auth, ocr, pacientes, tfd, frota, medico, usuarios, unidades, relatorios, bi
 
-# 1. Inicialização do Banco de Dados
-# Cria tabelas se não existirem (Usuario, UnidadeSaude, SolicitacaoTFD, etc.)
-base.Base.metadata.create_all(bind=engine)
+# 1. Banco de Dados: as tabelas são criadas antes de subir a API (python -m app.db.init_db),
+# não no import: cada processo uvicorn (e cada --reload) sobe sem ir ao catálogo do banco
 
 app = FastAPI(
     title="UniSISM - Sistema Integrado de Saúde Municipal",
     description="Plataforma Governamental de Regulação, TFD e Gestão de Frota.",
-    version="1.3.0-admin" # Versão atualizada com módulo de Gestão
+    version="1.3.0-admin", # Versão atualizada com módulo de Gestão
+    default_response_class=RespostaJSON # JSON via orjson em todas as rotas
 )
 
+# Tabelas de referência em memória (UBS): as rotas leem nomes/cotas sem ir ao banco
+@app.on_event("startup")
+def carregar_caches():
+    carregar_unidades()
+
 # 2. Configuração de CORS
 # Permite que o Frontend acesse a API
 app.add_middleware(
@@ -27,8 +38,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"], # Front web lê o ETag para mandar no If-None-Match
 )
 
+# Compressão gzip das respostas grandes (listas no 3G da zona rural)
+app.add_middleware(GZipMiddleware, minimum_size=COMPRESSAO_MINIMO_BYTES)
+
+# Latência por rota, consultas SQL por requisição e log de requisição lenta (ver GET /metrics)
+app.add_middleware(MetricasMiddleware)
+
 # 3. Registro de Rotas (Router)
 
 # Autenticação e Primeiro Acesso
@@ -52,6 +70,15 @@ app.include_router(frota.router, prefix="/api/v1/frota", tags=["Logística & Fro
 # Gestão Básica de Pacientes
 app.include_router(pacientes.router, prefix="/api/v1/pacientes", tags=["Pacientes"])
 
+# Unidades de Saúde (Cotas mensais)
+app.include_router(unidades.router, prefix="/api/v1/unidades", tags=["Unidades de Saúde"])
+
+# Relatórios da Secretaria (exportação CSV/XLSX)
+app.include_router(relatorios.router, prefix="/api/v1/relatorios", tags=["Relatórios"])
+
+# BI da Secretaria (painel sobre as tabelas de resumo)
+app.include_router(bi.router, prefix="/api/v1/bi", tags=["BI"])
+
 # 4. Status do Sistema
 @app.get("/")
 async def root():
@@ -71,4 +98,14 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "database": "connected"}
\ No newline at end of file
+    return {"status": "healthy", "database": "connected"}
+
+# 5. Métricas (Prometheus) - uso interno, fora da documentação.
+# Fechado por padrão: sem METRICAS_TOKEN configurado a rota não existe (404)
+@app.get("/metrics", include_in_schema=False, response_class=PlainTextResponse)
+def metricas(authorization: str = Header(None)):
+    if not METRICAS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(authorization or "", f"Bearer {METRICAS_TOKEN}"):
+        raise HTTPException(status_code=403, detail="Acesso restrito ao monitoramento.")
+    return PlainTextResponse(texto_prometheus(), media_type="text/plain; version=0.0.4")
@@ -32,4 +32,9 @@ class UsuarioResponse(BaseModel):
     criado_em: datetime
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# Página da listagem (paginação por cursor)
+class UsuarioPagina(BaseModel):
+    itens: List[UsuarioResponse]
+    proximo_cursor: Optional[str] = None # None = última página
@@ -0,0 +1,114 @@
+from datetime import date
+from decimal import Decimal, ROUND_DOWN
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import AJUDA_CUSTO_ORCAMENTO_MENSAL
+from app.db.base import SaldoAjudaCusto, LancamentoAjudaCusto
+from app.utils.datas import dias_no_mes, proximo_mes
+
+CENTAVO = Decimal("0.01")
+
+
+def teto_diario(dia: date) -> Decimal:
+    """Orçamento mensal dividido pelos dias do mês (arredonda para baixo: a soma nunca passa do mês)."""
+    return (Decimal(str(AJUDA_CUSTO_ORCAMENTO_MENSAL)) / dias_no_mes(dia)).quantize(CENTAVO, rounding=ROUND_DOWN)
+
+
+def reservar_saldo(db: Session, dia: date, valor: Decimal):
+    """
+    Reserva `valor` no teto do dia com um único UPDATE condicional (trava só a linha do dia).
+    Devolve (reservado, limite) do dia depois da reserva, ou None se não couber. Sem commit.
+    """
+    # Primeira aprovação do dia cria a linha com o teto vigente
+    db.execute(
+        insert(SaldoAjudaCusto).values(dia=dia, limite=teto_diario(dia), reservado=0)
+        .on_conflict_do_nothing(index_elements=["dia"])
+    )
+    return db.execute(
+        SaldoAjudaCusto.__table__.update()
+        .where(SaldoAjudaCusto.dia == dia, SaldoAjudaCusto.reservado + valor <= SaldoAjudaCusto.limite)
+        .values(reservado=SaldoAjudaCusto.reservado + valor)
+        .returning(SaldoAjudaCusto.reservado, SaldoAjudaCusto.limite)
+    ).first()
+
+
+def reservar_ajuda_custo(db: Session, solicitacao_id, dia: date, valor: float, usuario_id=None) -> dict:
+    """
+    Reserva a ajuda de custo de uma solicitação no teto do dia e registra o lançamento no livro-razão.
+    Sem commit: vale junto com a aprovação da solicitação.
+    Retorna {"reservado": bool, "disponivel": Decimal} (disponível no dia depois da tentativa).
+    """
+    valor = Decimal(str(valor)).quantize(CENTAVO)
+    saldo = reservar_saldo(db, dia, valor)
+    if saldo is None:
+        limite, reservado = db.query(SaldoAjudaCusto.limite, SaldoAjudaCusto.reservado).filter(
+            SaldoAjudaCusto.dia == dia
+        ).one()
+        return {"reservado": False, "disponivel": limite - reservado}
+
+    reservado_apos, limite = saldo
+    db.add(LancamentoAjudaCusto(
+        dia=dia,
+        solicitacao_id=solicitacao_id,
+        tipo="RESERVA",
+        valor=valor,
+        reservado_apos=reservado_apos,
+        usuario_id=usuario_id,
+    ))
+    return {"reservado": True, "disponivel": limite - reservado_apos}
+
+
+def estornar_ajuda_custo(db: Session, solicitacao_id, usuario_id=None) -> Decimal:
+    """
+    Devolve ao teto do dia o que a solicitação ainda tem reservado e registra o ESTORNO (valor negativo)
+    no livro-razão. Sem commit: vale junto com a volta da solicitação para análise.
+    Retorna o valor estornado (zero se não havia reserva em aberto).
+    """
+    em_aberto = db.query(LancamentoAjudaCusto.dia, func.sum(LancamentoAjudaCusto.valor)).filter(
+        LancamentoAjudaCusto.solicitacao_id == solicitacao_id
+    ).group_by(LancamentoAjudaCusto.dia).all()
+
+    estornado = Decimal("0")
+    for dia, valor in em_aberto:
+        if valor <= 0:
+            continue
+        reservado_apos = db.execute(
+            SaldoAjudaCusto.__table__.update()
+            .where(SaldoAjudaCusto.dia == dia)
+            .values(reservado=SaldoAjudaCusto.reservado - valor)
+            .returning(SaldoAjudaCusto.reservado)
+        ).scalar()
+        db.add(LancamentoAjudaCusto(
+            dia=dia,
+            solicitacao_id=solicitacao_id,
+            tipo="ESTORNO",
+            valor=-valor,
+            reservado_apos=reservado_apos,
+            usuario_id=usuario_id,
+        ))
+        estornado += valor
+    return estornado
+
+
+def resumo_do_mes(db: Session, mes: date) -> dict:
+    """Gasto do mês até agora, dia a dia (no máximo 31 linhas de saldo, sem somar solicitações)."""
+    dias = db.query(SaldoAjudaCusto).filter(
+        SaldoAjudaCusto.dia >= mes, SaldoAjudaCusto.dia < proximo_mes(mes)
+    ).order_by(SaldoAjudaCusto.dia).all()
+
+    orcamento = Decimal(str(AJUDA_CUSTO_ORCAMENTO_MENSAL)).quantize(CENTAVO)
+    gasto = sum((d.reservado for d in dias), Decimal("0"))
+    return {
+        "mes": mes.strftime("%Y-%m"),
+        "orcamento_mensal": orcamento,
+        "teto_diario": teto_diario(mes),
+        "gasto_no_mes": gasto,
+        "saldo_do_mes": orcamento - gasto,
+        "dias": [
+            {"dia": d.dia, "limite": d.limite, "reservado": d.reservado, "disponivel": d.limite - d.reservado}
+            for d in dias
+        ],
+    }
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import BinaryIO, Iterator, Tuple
+
+from app.core.config import UPLOADS_DIR
+
+TAMANHO_BLOCO = 1024 * 1024
+
+
+class ArmazenamentoBlobs(ABC):
+    """
+    Interface mínima do armazenamento de uploads, endereçado pelo SHA-256 do conteúdo.
+    Cada método tem equivalente direto em S3 (put/get/head/delete/list_objects),
+    então um MinIO local pode substituir o disco sem mexer em quem usa.
+    Backend incompleto falha ao ser instanciado, não no primeiro upload.
+    """
+    @abstractmethod
+    def salvar(self, arquivo: BinaryIO) -> str:
+        """Grava o conteúdo e devolve o SHA-256. Conteúdo repetido não é gravado de novo."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def ler(self, sha256: str) -> bytes:
+        raise NotImplementedError
+
+    @abstractmethod
+    def existe(self, sha256: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def remover(self, sha256: str):
+        raise NotImplementedError
+
+    @abstractmethod
+    def listar(self) -> Iterator[Tuple[str, datetime]]:
+        """Todos os blobs com a data da última gravação (usado pelo coletor de órfãos)."""
+        raise NotImplementedError
+
+    def limpar_temporarios(self, anteriores_a: datetime) -> int:
+        """Remove gravações interrompidas (ex: crash no meio do upload)."""
+        return 0
+
+
+class ArmazenamentoLocal(ArmazenamentoBlobs):
+    """
+    Blobs no disco compartilhado entre API e worker: {raiz}/ab/cd/abcd...
+    A gravação vai para um temporário e é renomeada no final (atômico no mesmo volume).
+    """
+    def __init__(self, raiz: str):
+        self.raiz = raiz
+        self.dir_tmp = os.path.join(raiz, "tmp")
+        os.makedirs(self.dir_tmp, exist_ok=True)
+
+    def _caminho(self, sha256: str) -> str:
+        return os.path.join(self.raiz, sha256[:2], sha256[2:4], sha256)
+
+    def salvar(self, arquivo: BinaryIO) -> str:
+        hasher = hashlib.sha256()
+        fd, caminho_tmp = tempfile.mkstemp(dir=self.dir_tmp)
+        try:
+            with os.fdopen(fd, "wb") as destino:
+                while bloco := arquivo.read(TAMANHO_BLOCO):
+                    hasher.update(bloco)
+                    destino.write(bloco)
+            sha256 = hasher.hexdigest()
+            caminho = self._caminho(sha256)
+            if os.path.exists(caminho):
+                # Deduplicação: já temos esse conteúdo. Renova a data para o coletor
+                # não apagar o blob antes da nova referência ser gravada.
+                os.utime(caminho)
+                os.remove(caminho_tmp)
+            else:
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                os.replace(caminho_tmp, caminho)
+            return sha256
+        except BaseException:
+            if os.path.exists(caminho_tmp):
+                os.remove(caminho_tmp)
+            raise
+
+    def ler(self, sha256: str) -> bytes:
+        with open(self._caminho(sha256), "rb") as f:
+            return f.read()
+
+    def existe(self, sha256: str) -> bool:
+        return os.path.exists(self._caminho(sha256))
+
+    def remover(self, sha256: str):
+        try:
+            os.remove(self._caminho(sha256))
+        except FileNotFoundError:
+            pass
+
+    def listar(self) -> Iterator[Tuple[str, datetime]]:
+        for pasta, subpastas, arquivos in os.walk(self.raiz):
+            if pasta == self.raiz:
+                subpastas[:] = [d for d in subpastas if d != "tmp"]
+            for nome in arquivos:
+                try:
+                    mtime = os.stat(os.path.join(pasta, nome)).st_mtime
+                except FileNotFoundError:
+                    continue
+                yield nome, datetime.fromtimestamp(mtime, tz=timezone.utc)
+
+    def limpar_temporarios(self, anteriores_a: datetime) -> int:
+        limite = anteriores_a.timestamp()
+        removidos = 0
+        for nome in os.listdir(self.dir_tmp):
+            caminho = os.path.join(self.dir_tmp, nome)
+            try:
+                if os.stat(caminho).st_mtime < limite:
+                    os.remove(caminho)
+                    removidos += 1
+            except FileNotFoundError:
+                continue
+        return removidos
+
+
+_armazenamento = None
+
+
+def get_armazenamento() -> ArmazenamentoBlobs:
+    """Instância única por processo (troque aqui para um backend S3 no futuro)."""
+    global _armazenamento
+    if _armazenamento is None:
+        _armazenamento = ArmazenamentoLocal(UPLOADS_DIR)
+    return _armazenamento
@@ -0,0 +1,297 @@
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import case, delete, extract, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import BI_MARGEM_MINUTOS, BI_LOTE_DIAS, FUSO_HORARIO
+from app.db.base import (
+    SolicitacaoTFD, CronogramaViagem, BiEncaminhamentoDia, BiViagemDia, BiEmbarqueDia, BiMarca
+)
+from app.db.session import engine
+from app.services.cache_unidades import nome_unidade
+from app.utils.datas import hoje, inicio_do_dia
+
+MARCA = "bi"
+NUNCA = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _como_data(valor) -> date:
+    # func.date devolve date no Postgres e texto 'AAAA-MM-DD' no SQLite
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor)[:10])
+
+
+def _intervalo(dias: list):
+    """[primeiro dia 00:00, dia seguinte ao último 00:00): deixa o índice da coluna de data limitar a leitura."""
+    return datetime.combine(min(dias), time.min), datetime.combine(max(dias) + timedelta(days=1), time.min)
+
+
+def _intervalo_local(dias: list):
+    """O mesmo intervalo com fuso, para criado_em: meia-noite local (poda as partições mensais pelo mês local)."""
+    return inicio_do_dia(min(dias)), inicio_do_dia(max(dias) + timedelta(days=1))
+
+
+def _dia_local(coluna):
+    """
+    Dia de uma coluna com fuso (criado_em) no fuso do município, o mesmo corte das partições mensais
+    e das cotas. data_partida já é gravada no horário local e usa func.date direto.
+    """
+    if engine.dialect.name == "postgresql":
+        return func.date(func.timezone(FUSO_HORARIO, coluna))
+    return func.date(coluna)
+
+
+# --- Recalcular dias (apaga e insere o dia inteiro a partir das tabelas de origem) ---
+
+def _recalcular_encaminhamentos(db, dias):
+    dia = _dia_local(SolicitacaoTFD.criado_em)
+    origem = select(
+        dia, SolicitacaoTFD.unidade_solicitante_id, SolicitacaoTFD.nivel_prioridade,
+        func.count(),
+        func.sum(case((SolicitacaoTFD.status_pedido == "Aguardando_Analise", 1), else_=0)),
+        func.sum(case((SolicitacaoTFD.status_pedido == "Aprovado_Onibus", 1), else_=0)),
+        func.sum(case((SolicitacaoTFD.status_pedido == "Aprovado_Ajuda_Custo", 1), else_=0)),
+        func.coalesce(func.sum(case(
+            (SolicitacaoTFD.status_pedido == "Aprovado_Ajuda_Custo", SolicitacaoTFD.valor_ajuda_custo), else_=0
+        )), 0),
+    ).where(SolicitacaoTFD.criado_em.is_not(None)).group_by(
+        dia, SolicitacaoTFD.unidade_solicitante_id, SolicitacaoTFD.nivel_prioridade
+    )
+    apagar = delete(BiEncaminhamentoDia)
+    if dias is not None:
+        inicio, fim = _intervalo_local(dias)
+        origem = origem.where(SolicitacaoTFD.criado_em >= inicio, SolicitacaoTFD.criado_em < fim, dia.in_(dias))
+        apagar = apagar.where(BiEncaminhamentoDia.dia.in_(dias))
+    db.execute(apagar)
+    db.execute(insert(BiEncaminhamentoDia).from_select(
+        ["dia", "unidade_id", "prioridade", "total", "aguardando", "aprovados_onibus",
+         "aprovados_ajuda_custo", "valor_ajuda_custo"], origem
+    ))
+
+
+def _recalcular_viagens(db, dias):
+    dia = func.date(CronogramaViagem.data_partida)
+    viagens = select(
+        dia, CronogramaViagem.destino, func.count(),
+        func.coalesce(func.sum(CronogramaViagem.capacidade_total), 0),
+        func.coalesce(func.sum(CronogramaViagem.vagas_ocupadas), 0),
+    ).group_by(dia, CronogramaViagem.destino)
+    embarques = select(
+        dia, CronogramaViagem.destino, SolicitacaoTFD.unidade_solicitante_id, func.count(),
+        func.sum(case((SolicitacaoTFD.status_embarque == "EMBARCOU", 1), else_=0)),
+        func.sum(case((SolicitacaoTFD.status_embarque == "AUSENTE", 1), else_=0)),
+    ).select_from(SolicitacaoTFD).join(
+        CronogramaViagem, SolicitacaoTFD.viagem_id == CronogramaViagem.id
+    ).where(SolicitacaoTFD.status_pedido == "Aprovado_Onibus").group_by(
+        dia, CronogramaViagem.destino, SolicitacaoTFD.unidade_solicitante_id
+    )
+    apagar_viagens, apagar_embarques = delete(BiViagemDia), delete(BiEmbarqueDia)
+    if dias is not None:
+        inicio, fim = _intervalo(dias)
+        periodo = (CronogramaViagem.data_partida >= inicio, CronogramaViagem.data_partida < fim, dia.in_(dias))
+        viagens, embarques = viagens.where(*periodo), embarques.where(*periodo)
+        apagar_viagens = apagar_viagens.where(BiViagemDia.dia.in_(dias))
+        apagar_embarques = apagar_embarques.where(BiEmbarqueDia.dia.in_(dias))
+    db.execute(apagar_viagens)
+    db.execute(apagar_embarques)
+    db.execute(insert(BiViagemDia).from_select(
+        ["dia", "destino", "viagens", "capacidade", "vagas_ocupadas"], viagens
+    ))
+    db.execute(insert(BiEmbarqueDia).from_select(
+        ["dia", "destino", "unidade_id", "passageiros", "embarcaram", "ausentes"], embarques
+    ))
+
+
+def _em_lotes(dias: set):
+    dias = sorted(dias)
+    for i in range(0, len(dias), BI_LOTE_DIAS):
+        yield dias[i:i + BI_LOTE_DIAS]
+
+
+# --- Quais dias mudaram ---
+
+def _dias_alterados(db, desde: datetime):
+    """
+    Dias de criação (encaminhamentos) e de partida (viagens/embarques) com linhas gravadas desde `desde`.
+    Só o dia atual de cada linha: viagem remarcada direto no banco deixa o dia antigo para a reconciliação,
+    como as exclusões (a API não muda data_partida nem criado_em).
+    """
+    dias_encaminhamentos = {
+        _como_data(d) for (d,) in db.query(_dia_local(SolicitacaoTFD.criado_em)).filter(
+            SolicitacaoTFD.atualizado_em >= desde, SolicitacaoTFD.criado_em.is_not(None)
+        ).distinct()
+    }
+    # Viagem alterada ou passageiro alterado (embarque marcado, aprovação) muda o dia da viagem
+    viagens_de_solicitacoes = select(SolicitacaoTFD.viagem_id).where(
+        SolicitacaoTFD.atualizado_em >= desde, SolicitacaoTFD.viagem_id.is_not(None)
+    )
+    dias_viagens = {
+        _como_data(d) for (d,) in db.query(func.date(CronogramaViagem.data_partida)).filter(or_(
+            CronogramaViagem.atualizado_em >= desde, CronogramaViagem.id.in_(viagens_de_solicitacoes)
+        )).distinct()
+    }
+    return dias_encaminhamentos, dias_viagens
+
+
+def _dias_recentes(db, desde_dia: date):
+    """
+    Todos os dias a partir de `desde_dia` que têm dado na origem OU no resumo: a reconciliação também
+    zera dias cujas linhas foram apagadas na origem (exclusão não aparece na marca d'água).
+    """
+    inicio = datetime.combine(desde_dia, time.min)
+    dias_encaminhamentos = {
+        _como_data(d) for (d,) in db.query(_dia_local(SolicitacaoTFD.criado_em)).filter(
+            SolicitacaoTFD.criado_em >= inicio_do_dia(desde_dia)
+        ).distinct()
+    } | {d for (d,) in db.query(BiEncaminhamentoDia.dia).filter(BiEncaminhamentoDia.dia >= desde_dia).distinct()}
+    dias_viagens = {
+        _como_data(d) for (d,) in db.query(func.date(CronogramaViagem.data_partida)).filter(
+            CronogramaViagem.data_partida >= inicio
+        ).distinct()
+    } | {d for (d,) in db.query(BiViagemDia.dia).filter(BiViagemDia.dia >= desde_dia).distinct()} \
+      | {d for (d,) in db.query(BiEmbarqueDia.dia).filter(BiEmbarqueDia.dia >= desde_dia).distinct()}
+    return dias_encaminhamentos, dias_viagens
+
+
+def atualizar_bi(db, reconciliar_dias: int = None) -> dict:
+    """
+    Atualiza as tabelas de resumo:
+    - primeira execução (sem marca): recalcula tudo;
+    - normal: só os dias com linhas gravadas desde a última marca (menos BI_MARGEM_MINUTOS: uma transação
+      que começou antes da marca e fez commit depois tem atualizado_em anterior a ela);
+    - reconciliar_dias=N: todos os dias a partir de N dias atrás (pega exclusões e o que escapou da marca).
+    Uma execução por vez (a linha da marca fica travada até o commit).
+    """
+    # 1. Marca d'água (criada na primeira vez) travada contra execuções simultâneas
+    if db.get(BiMarca, MARCA) is None:
+        try:
+            db.add(BiMarca(nome=MARCA, processado_ate=NUNCA))
+            db.commit()
+        except IntegrityError:
+            db.rollback() # Outra execução criou ao mesmo tempo
+    marca = db.query(BiMarca).filter(BiMarca.nome == MARCA).with_for_update().one()
+    agora = db.query(func.now()).scalar() # Relógio do banco, o mesmo do atualizado_em
+    ultima = marca.processado_ate if marca.processado_ate.tzinfo else marca.processado_ate.replace(tzinfo=timezone.utc)
+
+    # 2. Dias a recalcular
+    if ultima <= NUNCA:
+        modo = "completo"
+        _recalcular_encaminhamentos(db, None)
+        _recalcular_viagens(db, None)
+        dias_encaminhamentos = dias_viagens = set()
+    else:
+        if reconciliar_dias:
+            modo = "reconciliacao"
+            dias_encaminhamentos, dias_viagens = _dias_recentes(db, hoje() - timedelta(days=reconciliar_dias))
+        else:
+            modo = "incremental"
+            dias_encaminhamentos, dias_viagens = _dias_alterados(db, ultima - timedelta(minutes=BI_MARGEM_MINUTOS))
+        for lote in _em_lotes(dias_encaminhamentos):
+            _recalcular_encaminhamentos(db, lote)
+        for lote in _em_lotes(dias_viagens):
+            _recalcular_viagens(db, lote)
+
+    # 3. Avança a marca junto com os resumos (mesma transação)
+    marca.processado_ate = agora
+    db.commit()
+    return {"modo": modo, "dias_encaminhamentos": len(dias_encaminhamentos), "dias_viagens": len(dias_viagens)}
+
+
+# --- Leitura (painel da Secretaria): só as tabelas de resumo, filtradas por dia ---
+
+def atualizado_ate(db):
+    marca = db.get(BiMarca, MARCA)
+    return marca.processado_ate if marca and marca.processado_ate.year > NUNCA.year else None
+
+
+def _periodo_do_agrupamento(coluna, agrupar: str):
+    if agrupar == "dia":
+        return [coluna]
+    return [extract("year", coluna), extract("month", coluna)]
+
+
+def _rotulo_periodo(partes, agrupar: str) -> str:
+    if agrupar == "dia":
+        return _como_data(partes[0]).isoformat()
+    return f"{int(partes[0]):04d}-{int(partes[1]):02d}"
+
+
+def encaminhamentos_por_unidade(db, inicio: date, fim: date, agrupar: str = "mes", unidade_id=None) -> list:
+    """Encaminhamentos por período (mês ou dia) e UBS."""
+    periodo = _periodo_do_agrupamento(BiEncaminhamentoDia.dia, agrupar)
+    query = db.query(
+        *periodo, BiEncaminhamentoDia.unidade_id,
+        func.sum(BiEncaminhamentoDia.total), func.sum(BiEncaminhamentoDia.aguardando),
+        func.sum(BiEncaminhamentoDia.aprovados_onibus), func.sum(BiEncaminhamentoDia.aprovados_ajuda_custo),
+        func.sum(BiEncaminhamentoDia.valor_ajuda_custo),
+    ).filter(BiEncaminhamentoDia.dia >= inicio, BiEncaminhamentoDia.dia <= fim)
+    if unidade_id:
+        query = query.filter(BiEncaminhamentoDia.unidade_id == unidade_id)
+    linhas = query.group_by(*periodo, BiEncaminhamentoDia.unidade_id).order_by(*periodo).all()
+
+    n = len(periodo)
+    return [
+        {
+            "periodo": _rotulo_periodo(linha[:n], agrupar),
+            "unidade_id": str(linha[n]) if linha[n] else None,
+            "unidade": nome_unidade(linha[n]),
+            "total": int(linha[n + 1] or 0),
+            "aguardando": int(linha[n + 2] or 0),
+            "aprovados_onibus": int(linha[n + 3] or 0),
+            "aprovados_ajuda_custo": int(linha[n + 4] or 0),
+            "valor_ajuda_custo": round(float(linha[n + 5] or 0), 2),
+        }
+        for linha in linhas
+    ]
+
+
+def distribuicao_prioridade(db, inicio: date, fim: date, unidade_id=None) -> list:
+    query = db.query(BiEncaminhamentoDia.prioridade, func.sum(BiEncaminhamentoDia.total)).filter(
+        BiEncaminhamentoDia.dia >= inicio, BiEncaminhamentoDia.dia <= fim
+    )
+    if unidade_id:
+        query = query.filter(BiEncaminhamentoDia.unidade_id == unidade_id)
+    linhas = query.group_by(BiEncaminhamentoDia.prioridade).order_by(BiEncaminhamentoDia.prioridade).all()
+    total = sum(int(t or 0) for _, t in linhas)
+    return [
+        {"prioridade": prioridade, "total": int(t or 0), "percentual": round(100 * int(t or 0) / total, 1) if total else 0.0}
+        for prioridade, t in linhas
+    ]
+
+
+def ocupacao_por_destino(db, inicio: date, fim: date, destino: str = None) -> list:
+    query = db.query(
+        BiViagemDia.destino, func.sum(BiViagemDia.viagens), func.sum(BiViagemDia.capacidade),
+        func.sum(BiViagemDia.vagas_ocupadas),
+    ).filter(BiViagemDia.dia >= inicio, BiViagemDia.dia <= fim)
+    if destino:
+        query = query.filter(BiViagemDia.destino.ilike(f"%{destino}%"))
+    linhas = query.group_by(BiViagemDia.destino).order_by(BiViagemDia.destino).all()
+    return [
+        {
+            "destino": nome, "viagens": int(viagens or 0), "capacidade": int(capacidade or 0),
+            "vagas_ocupadas": int(ocupadas or 0),
+            "ocupacao_percentual": round(100 * int(ocupadas or 0) / int(capacidade), 1) if capacidade else 0.0,
+        }
+        for nome, viagens, capacidade, ocupadas in linhas
+    ]
+
+
+def taxa_ausencia(db, inicio: date, fim: date, agrupar: str = "unidade") -> list:
+    """Passageiros aprovados que não embarcaram (AUSENTE), por UBS de origem ou por destino."""
+    chave = BiEmbarqueDia.unidade_id if agrupar == "unidade" else BiEmbarqueDia.destino
+    linhas = db.query(
+        chave, func.sum(BiEmbarqueDia.passageiros), func.sum(BiEmbarqueDia.embarcaram), func.sum(BiEmbarqueDia.ausentes),
+    ).filter(BiEmbarqueDia.dia >= inicio, BiEmbarqueDia.dia <= fim).group_by(chave).all()
+
+    resultado = []
+    for valor, passageiros, embarcaram, ausentes in linhas:
+        item = {"unidade_id": str(valor) if valor else None, "unidade": nome_unidade(valor)} if agrupar == "unidade" \
+            else {"destino": valor}
+        # Taxa sobre quem já teve o embarque marcado (PENDENTE ainda não conta como falta)
+        marcados = int(embarcaram or 0) + int(ausentes or 0)
+        item.update({
+            "passageiros": int(passageiros or 0), "embarcaram": int(embarcaram or 0), "ausentes": int(ausentes or 0),
+            "taxa_ausencia_percentual": round(100 * int(ausentes or 0) / marcados, 1) if marcados else 0.0,
+        })
+        resultado.append(item)
+    return sorted(resultado, key=lambda i: i["taxa_ausencia_percentual"], reverse=True)
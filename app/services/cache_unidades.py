@@ -0,0 +1,142 @@
+import threading
+import time
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import UNIDADES_CACHE_VERIFICAR_SEGUNDOS, ROTA_FATOR_VIARIO
+from app.core.redis_client import redis_client
+from app.db.session import SessionLocal
+from app.db.base import UnidadeSaude
+from app.utils.geo import distancia_km
+
+# Número de versão da tabela de UBS: qualquer processo que gravar uma UBS incrementa,
+# e os outros recarregam na próxima conferência
+CHAVE_VERSAO = "cache:unidades:versao"
+
+_lock = threading.Lock()
+# Mapas trocados inteiros a cada recarga (quem leu o antigo continua com uma cópia consistente).
+# Chave: str(id) da UBS. Somente leitura para quem usa.
+_unidades = {} # -> {"nome", "bairro", "cota_mensal", "latitude", "longitude"}
+_nomes = {}
+_cotas = {}
+_distancias = {} # -> {str(id): km pela rua}, só entre UBS com coordenadas (rotas de embarque)
+_versao = None # Versão do Redis quando a tabela foi carregada (None = nunca carregou)
+_conferido_em = 0.0
+
+
+def _versao_redis():
+    try:
+        return int(redis_client.get(CHAVE_VERSAO) or 0)
+    except RedisError as e:
+        # Sem Redis o cache segue com os dados que tem (UBS quase nunca mudam)
+        print(f"Cache de UBS: Redis indisponível ({e})")
+        return None
+
+
+def carregar_unidades(versao=None):
+    """Lê a tabela inteira (são poucas dezenas de UBS) e troca o cache de uma vez."""
+    global _unidades, _nomes, _cotas, _distancias, _versao, _conferido_em
+    db = SessionLocal()
+    try:
+        linhas = db.query(
+            UnidadeSaude.id, UnidadeSaude.nome, UnidadeSaude.bairro, UnidadeSaude.cota_mensal,
+            UnidadeSaude.latitude, UnidadeSaude.longitude
+        ).all()
+    finally:
+        db.close()
+    _nomes = {str(u.id): u.nome for u in linhas}
+    _cotas = {str(u.id): u.cota_mensal for u in linhas}
+    _unidades = {
+        str(u.id): {"nome": u.nome, "bairro": u.bairro, "cota_mensal": u.cota_mensal,
+                    "latitude": u.latitude, "longitude": u.longitude}
+        for u in linhas
+    }
+    # Matriz de distâncias pré-calculada (poucas dezenas de UBS): o roteiro do ônibus não calcula nada por par
+    pontos = {str(u.id): (u.latitude, u.longitude) for u in linhas if u.latitude is not None and u.longitude is not None}
+    _distancias = {
+        a: {b: distancia_km(pa, pb) * ROTA_FATOR_VIARIO for b, pb in pontos.items()}
+        for a, pa in pontos.items()
+    }
+    _versao = versao if versao is not None else (_versao_redis() or 0)
+    _conferido_em = time.monotonic()
+
+
+def _conferir():
+    """Recarrega o cache se outro processo avisou que as UBS mudaram (no máximo uma ida ao Redis a cada N segundos)."""
+    global _conferido_em
+    if _versao is not None and time.monotonic() - _conferido_em < UNIDADES_CACHE_VERIFICAR_SEGUNDOS:
+        return
+
+    with _lock:
+        # Outra thread pode ter recarregado enquanto esperávamos o lock
+        if _versao is not None and time.monotonic() - _conferido_em < UNIDADES_CACHE_VERIFICAR_SEGUNDOS:
+            return
+        versao = _versao_redis()
+        if _versao is None or (versao is not None and versao != _versao):
+            carregar_unidades(versao)
+        else:
+            _conferido_em = time.monotonic()
+
+
+def invalidar_unidades():
+    """Avisa todos os processos (API e workers) que a tabela de UBS mudou."""
+    try:
+        redis_client.incr(CHAVE_VERSAO)
+    except RedisError as e:
+        print(f"Cache de UBS: não foi possível avisar a mudança ({e})")
+    # O próprio processo recarrega na hora, sem esperar a próxima conferência
+    global _conferido_em
+    _conferido_em = 0.0
+
+
+def unidades() -> dict:
+    """str(id) -> {"nome", "bairro", "cota_mensal", "latitude", "longitude"}."""
+    _conferir()
+    return _unidades
+
+
+def distancias_unidades() -> dict:
+    """str(id) -> {str(id): km estimado pela rua}, só UBS com coordenadas."""
+    _conferir()
+    return _distancias
+
+
+def nomes_unidades() -> dict:
+    """str(id) -> nome da UBS."""
+    _conferir()
+    return _nomes
+
+
+def cotas_unidades() -> dict:
+    """str(id) -> cota mensal de vagas da UBS."""
+    _conferir()
+    return _cotas
+
+
+def nome_unidade(unidade_id, padrao: str = "Não informada") -> str:
+    if not unidade_id:
+        return padrao
+    return nomes_unidades().get(str(unidade_id), padrao)
+
+
+# Qualquer commit que mexa em UnidadeSaude (ORM) invalida o cache de todos os processos.
+# Alteração por SQL direto precisa chamar invalidar_unidades() no final.
+@event.listens_for(Session, "before_flush")
+def _marcar_mudanca_unidades(session, flush_context, instances):
+    # Só colunas da própria UBS contam (vincular médico também "suja" a UBS pela relação)
+    alteradas = [o for o in session.dirty if isinstance(o, UnidadeSaude) and session.is_modified(o, include_collections=False)]
+    if alteradas or any(isinstance(o, UnidadeSaude) for o in (*session.new, *session.deleted)):
+        session.info["unidades_alteradas"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _avisar_mudanca_unidades(session):
+    if session.info.pop("unidades_alteradas", False):
+        invalidar_unidades()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_mudanca_unidades(session):
+    session.info.pop("unidades_alteradas", None)
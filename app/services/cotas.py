@@ -0,0 +1,101 @@
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.db.base import ConsumoCota, UnidadeSaude
+from app.services.cache_unidades import cotas_unidades, unidades
+from app.utils.datas import mes_atual, proximo_mes, inicio_do_dia
+
+
+def _cota_da_unidade(db: Session, unidade_id: str) -> Optional[int]:
+    """Cota do cache de UBS; só vai ao banco se a UBS acabou de ser criada em outro processo."""
+    cotas = cotas_unidades()
+    if str(unidade_id) in cotas:
+        return cotas[str(unidade_id)]
+    return db.query(UnidadeSaude.cota_mensal).filter(UnidadeSaude.id == unidade_id).scalar()
+
+
+def consumir_cota(db: Session, unidade_id: str) -> dict:
+    """
+    Reserva 1 vaga da cota do mês para a UBS, SEM commit: vale junto com a solicitação
+    (se a transação for desfeita, a vaga volta sozinha).
+    Retorna {"permitido", "usados", "cota"}. Cota None = UBS sem limite.
+    O UPDATE condicional trava só a linha da UBS/mês: dois pedidos simultâneos nunca passam da cota.
+    """
+    cota = _cota_da_unidade(db, unidade_id)
+    mes = mes_atual()
+
+    # 1. Garante a linha do mês (primeiro pedido do mês da UBS)
+    db.execute(
+        insert(ConsumoCota).values(unidade_id=unidade_id, mes=mes, usados=0)
+        .on_conflict_do_nothing(index_elements=["unidade_id", "mes"])
+    )
+
+    # 2. Incrementa só se ainda houver cota
+    condicao = [ConsumoCota.unidade_id == unidade_id, ConsumoCota.mes == mes]
+    if cota is not None:
+        condicao.append(ConsumoCota.usados < cota)
+    usados = db.execute(
+        ConsumoCota.__table__.update().where(*condicao)
+        .values(usados=ConsumoCota.usados + 1)
+        .returning(ConsumoCota.usados)
+    ).scalar()
+
+    if usados is None:
+        return {"permitido": False, "usados": cota, "cota": cota}
+    return {"permitido": True, "usados": usados, "cota": cota}
+
+
+def uso_das_cotas(db: Session, mes: date) -> list:
+    """Uso x cota de todas as UBS no mês (nomes e cotas do cache, contadores em uma consulta)."""
+    usados = {
+        str(unidade_id): total
+        for unidade_id, total in db.query(ConsumoCota.unidade_id, ConsumoCota.usados).filter(ConsumoCota.mes == mes)
+    }
+    resultado = []
+    for unidade_id, unidade in unidades().items():
+        cota, usado = unidade["cota_mensal"], usados.get(unidade_id, 0)
+        resultado.append({
+            "unidade_id": unidade_id,
+            "unidade": unidade["nome"],
+            "bairro": unidade["bairro"],
+            "cota_mensal": cota,
+            "usados": usado,
+            "restantes": max(0, cota - usado) if cota is not None else None,
+            "percentual_uso": round(100 * usado / cota, 1) if cota else None,
+        })
+    return sorted(resultado, key=lambda u: u["unidade"])
+
+
+def reconciliar_cotas(db: Session, mes: date) -> int:
+    """
+    Regrava os contadores do mês a partir de solicitacoes_tfd (fonte da verdade).
+    Corrige deriva de ajustes manuais no banco ou de solicitações apagadas. Faz commit.
+    Trava as linhas do mês ANTES de contar: consumir_cota em andamento termina primeiro (e entra
+    na contagem) e os seguintes esperam o commit, então nenhum incremento é sobrescrito.
+    O mês é o do fuso do município, o mesmo corte das partições de solicitacoes_tfd.
+    """
+    db.execute(text("""
+        INSERT INTO consumo_cotas (unidade_id, mes, usados)
+        SELECT id, :mes, 0 FROM unidades_saude
+        ON CONFLICT (unidade_id, mes) DO NOTHING
+    """), {"mes": mes})
+    db.execute(
+        select(ConsumoCota.unidade_id).where(ConsumoCota.mes == mes)
+        .order_by(ConsumoCota.unidade_id).with_for_update()
+    ).all()
+    resultado = db.execute(text("""
+        UPDATE consumo_cotas
+        SET usados = (
+                SELECT count(*) FROM solicitacoes_tfd s
+                WHERE s.unidade_solicitante_id = consumo_cotas.unidade_id
+                  AND s.criado_em >= :inicio AND s.criado_em < :fim
+            ),
+            atualizado_em = now()
+        WHERE mes = :mes
+    """), {"mes": mes, "inicio": inicio_do_dia(mes), "fim": inicio_do_dia(proximo_mes(mes))})
+    db.commit()
+    return resultado.rowcount
@@ -0,0 +1,129 @@
+"""
+Histórico de status das solicitações (linha do tempo do paciente).
+
+1. Captura: toda mudança de status_pedido / status_embarque / status_aprovacao vira uma linha em
+   eventos_outbox na MESMA transação (commit junto, rollback junto: nada se perde nem sobra).
+   Objetos do ORM são vistos no flush; UPDATE em massa (query().update, bulk_update_mappings) não
+   passa pelo flush, então quem faz chama registrar_eventos com o status anterior que já leu.
+2. Despacho: depois do commit, um único despacho por janela de EVENTOS_ESPERA_SEGUNDOS (Redis NX)
+   move a outbox para eventos_solicitacao em lotes; o Beat cobre despachos que se perderam.
+3. Leitura: linha_do_tempo junta o histórico e o que ainda está na outbox numa consulta só.
+"""
+import uuid
+from datetime import datetime, timezone
+
+from sqlalchemy import event, inspect, select, insert, delete, union_all
+from sqlalchemy.orm import Session
+
+from app.core.config import EVENTOS_ESPERA_SEGUNDOS
+from app.core.filas import enfileirar_tarefa
+from app.core.redis_client import redis_client
+from app.db.base import SolicitacaoTFD, EventoOutbox, EventoSolicitacao
+
+CAMPOS = ("status_pedido", "status_embarque", "status_aprovacao")
+CHAVE_DESPACHO = "eventos:despacho_agendado"
+_COLUNAS = ("id", "solicitacao_id", "campo", "anterior", "novo", "ator_id", "ator_perfil", "ocorrido_em")
+
+
+def definir_ator(db: Session, usuario=None, perfil: str = None):
+    """Quem está mudando os status nesta sessão (usuário logado, ou perfil=SISTEMA no worker)."""
+    db.info["ator"] = (usuario.id, usuario.perfil) if usuario is not None else (None, perfil)
+
+
+def _texto(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, bool):
+        return "true" if valor else "false"
+    return str(valor)
+
+
+def registrar_eventos(db: Session, mudancas: list):
+    """
+    Grava na outbox, SEM commit, as mudanças [(solicitacao_id, campo, anterior, novo), ...].
+    Mudança para o mesmo valor é ignorada.
+    """
+    ator_id, ator_perfil = db.info.get("ator", (None, None))
+    agora = datetime.now(timezone.utc)
+    eventos = [
+        EventoOutbox(
+            solicitacao_id=solicitacao_id, campo=campo, anterior=_texto(anterior), novo=_texto(novo),
+            ator_id=ator_id, ator_perfil=ator_perfil, ocorrido_em=agora,
+        )
+        for solicitacao_id, campo, anterior, novo in mudancas
+        if _texto(anterior) != _texto(novo)
+    ]
+    if eventos:
+        db.add_all(eventos)
+        db.info["eventos_pendentes"] = True
+
+
+@event.listens_for(Session, "before_flush")
+def _capturar_mudancas(session, flush_context, instances):
+    mudancas = []
+    for objeto in session.new:
+        if isinstance(objeto, SolicitacaoTFD):
+            # A chave sai do default só no INSERT: adianta aqui para o evento apontar para ela
+            if objeto.id is None:
+                objeto.id = uuid.uuid4()
+            inicial = objeto.status_pedido or SolicitacaoTFD.__table__.c.status_pedido.default.arg
+            mudancas.append((objeto.id, "status_pedido", None, inicial))
+    for objeto in session.dirty:
+        if isinstance(objeto, SolicitacaoTFD):
+            estado = inspect(objeto)
+            for campo in CAMPOS:
+                historico = estado.attrs[campo].history
+                if historico.added:
+                    anterior = historico.deleted[0] if historico.deleted else None
+                    mudancas.append((objeto.id, campo, anterior, historico.added[0]))
+    if mudancas:
+        registrar_eventos(session, mudancas)
+
+
+@event.listens_for(Session, "after_commit")
+def _agendar_despacho(session):
+    """Depois do commit (a outbox já está visível para o worker), agenda o despacho."""
+    if not session.info.pop("eventos_pendentes", False):
+        return
+    try:
+        if redis_client.set(CHAVE_DESPACHO, 1, nx=True, ex=EVENTOS_ESPERA_SEGUNDOS + 5):
+            enfileirar_tarefa("despachar_eventos_task", countdown=EVENTOS_ESPERA_SEGUNDOS)
+    except Exception as e:
+        # Redis ou broker fora do ar (o kombu não é importado aqui: a API só carrega o Celery no primeiro envio).
+        # O commit já valeu e os eventos continuam na outbox (e na linha do tempo): o Beat despacha depois
+        print(f"Eventos: não foi possível agendar o despacho ({e})")
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_despacho(session):
+    session.info.pop("eventos_pendentes", None)
+
+
+def mover_lote(db: Session, limite: int) -> int:
+    """
+    Move até `limite` eventos da outbox para o histórico numa transação (INSERT ... SELECT + DELETE).
+    SKIP LOCKED: dois workers nunca pegam o mesmo evento. Faz commit e devolve quantos moveu.
+    """
+    ids = db.scalars(
+        select(EventoOutbox.id).limit(limite).with_for_update(skip_locked=True)
+    ).all()
+    if not ids:
+        db.rollback()
+        return 0
+    origem = select(*(getattr(EventoOutbox, c) for c in _COLUNAS)).where(EventoOutbox.id.in_(ids))
+    db.execute(insert(EventoSolicitacao).from_select(_COLUNAS, origem))
+    db.execute(delete(EventoOutbox).where(EventoOutbox.id.in_(ids)))
+    db.commit()
+    return len(ids)
+
+
+def linha_do_tempo(db: Session, solicitacao_id) -> list:
+    """Eventos da solicitação em ordem: histórico + outbox (o que ainda não foi despachado) numa consulta."""
+    def eventos(tabela):
+        return select(
+            tabela.campo, tabela.anterior, tabela.novo, tabela.ator_perfil, tabela.ocorrido_em
+        ).where(tabela.solicitacao_id == solicitacao_id)
+
+    consulta = union_all(eventos(EventoSolicitacao), eventos(EventoOutbox))
+    consulta = consulta.order_by(consulta.selected_columns.ocorrido_em)
+    return [dict(linha._mapping) for linha in db.execute(consulta)]
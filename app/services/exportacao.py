@@ -0,0 +1,311 @@
+import csv
+import io
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from zoneinfo import ZoneInfo
+
+from app.core.config import EXPORTACOES_DIR, EXPORTACAO_RETENCAO_HORAS, EXPORTACAO_LOTE_LINHAS, FUSO_HORARIO
+from app.core.filas import enfileirar_tarefa
+from app.core.redis_client import redis_client
+from app.db.session import SessionLocal
+from app.db.base import CronogramaViagem, SolicitacaoTFD, Paciente
+from app.services.cache_unidades import nome_unidade
+
+# Relatórios mensais da Secretaria para o Estado. As linhas vêm de um cursor no servidor (yield_per):
+# a memória não cresce com o período, seja na resposta em streaming ou no arquivo gerado pelo worker.
+
+FORMATOS = {
+    "csv": "text/csv", # O Starlette acrescenta "; charset=utf-8"
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Exportação em segundo plano: estado no Redis, arquivo na pasta compartilhada
+CHAVE_EXPORTACAO = "exportacao:{}"
+NA_FILA, GERANDO, PRONTO, ERRO = "NA_FILA", "GERANDO", "PRONTO", "ERRO"
+
+_fuso = ZoneInfo(FUSO_HORARIO)
+
+
+def _periodo(filtros: dict):
+    """
+    [início 00:00, dia seguinte ao fim 00:00) a partir das datas AAAA-MM-DD dos filtros.
+    Sem fuso: para data_partida, que já é gravada no horário local.
+    """
+    inicio = date.fromisoformat(filtros["inicio"])
+    fim = date.fromisoformat(filtros["fim"])
+    return datetime.combine(inicio, time.min), datetime.combine(fim + timedelta(days=1), time.min)
+
+
+def _periodo_com_fuso(filtros: dict):
+    """O mesmo período com o fuso do município, para colunas com fuso (criado_em): o corte é a meia-noite local."""
+    return tuple(limite.replace(tzinfo=_fuso) for limite in _periodo(filtros))
+
+
+def _linhas_viagens(db, filtros: dict):
+    inicio, fim = _periodo(filtros)
+    query = db.query(
+        CronogramaViagem.data_partida, CronogramaViagem.destino, CronogramaViagem.placa, CronogramaViagem.motorista,
+        CronogramaViagem.capacidade_total, CronogramaViagem.vagas_ocupadas
+    ).filter(CronogramaViagem.data_partida >= inicio, CronogramaViagem.data_partida < fim)
+    if filtros.get("destino"):
+        query = query.filter(CronogramaViagem.destino.ilike(f"%{filtros['destino']}%"))
+    if filtros.get("unidade_id"):
+        # Viagens que levaram pacientes da UBS
+        query = query.filter(CronogramaViagem.id.in_(
+            db.query(SolicitacaoTFD.viagem_id).filter(
+                SolicitacaoTFD.unidade_solicitante_id == filtros["unidade_id"],
+                SolicitacaoTFD.status_pedido == "Aprovado_Onibus"
+            )
+        ))
+
+    for partida, destino, placa, motorista, capacidade, ocupadas in query.order_by(
+        CronogramaViagem.data_partida
+    ).yield_per(EXPORTACAO_LOTE_LINHAS):
+        ocupadas = ocupadas or 0
+        ocupacao = round(100 * ocupadas / capacidade, 1) if capacidade else None
+        yield partida, destino, placa, motorista, capacidade, ocupadas, capacidade - ocupadas, ocupacao
+
+
+def _linhas_manifestos(db, filtros: dict):
+    inicio, fim = _periodo(filtros)
+    query = db.query(
+        CronogramaViagem.data_partida, CronogramaViagem.destino, CronogramaViagem.placa, CronogramaViagem.motorista,
+        Paciente.nome, Paciente.cpf, SolicitacaoTFD.com_acompanhante, SolicitacaoTFD.status_embarque,
+        SolicitacaoTFD.unidade_solicitante_id
+    ).select_from(SolicitacaoTFD).join(
+        CronogramaViagem, SolicitacaoTFD.viagem_id == CronogramaViagem.id
+    ).join(
+        Paciente, SolicitacaoTFD.paciente_id == Paciente.id
+    ).filter(
+        SolicitacaoTFD.status_pedido == "Aprovado_Onibus",
+        CronogramaViagem.data_partida >= inicio, CronogramaViagem.data_partida < fim
+    )
+    if filtros.get("unidade_id"):
+        query = query.filter(SolicitacaoTFD.unidade_solicitante_id == filtros["unidade_id"])
+    if filtros.get("viagem_id"):
+        query = query.filter(SolicitacaoTFD.viagem_id == filtros["viagem_id"])
+
+    for *viagem, paciente, cpf, acompanhante, embarque, unidade_id in query.order_by(
+        CronogramaViagem.data_partida, CronogramaViagem.id, Paciente.nome
+    ).yield_per(EXPORTACAO_LOTE_LINHAS):
+        yield (*viagem, paciente, cpf, bool(acompanhante), embarque, nome_unidade(unidade_id))
+
+
+def _linhas_encaminhamentos(db, filtros: dict):
+    inicio, fim = _periodo_com_fuso(filtros)
+    query = db.query(
+        SolicitacaoTFD.criado_em, SolicitacaoTFD.unidade_solicitante_id, Paciente.nome, Paciente.cpf,
+        SolicitacaoTFD.procedimento, SolicitacaoTFD.nivel_prioridade, SolicitacaoTFD.status_pedido,
+        SolicitacaoTFD.tipo_transporte, SolicitacaoTFD.data_desejada, SolicitacaoTFD.valor_ajuda_custo
+    ).select_from(SolicitacaoTFD).outerjoin(
+        Paciente, SolicitacaoTFD.paciente_id == Paciente.id
+    ).filter(SolicitacaoTFD.criado_em >= inicio, SolicitacaoTFD.criado_em < fim)
+    if filtros.get("unidade_id"):
+        query = query.filter(SolicitacaoTFD.unidade_solicitante_id == filtros["unidade_id"])
+
+    for criado_em, unidade_id, *resto in query.order_by(SolicitacaoTFD.criado_em).yield_per(EXPORTACAO_LOTE_LINHAS):
+        yield (criado_em, nome_unidade(unidade_id), *resto)
+
+
+# tipo -> cabeçalho e gerador de linhas (db, filtros)
+TIPOS = {
+    "viagens": {
+        "cabecalho": ["Partida", "Destino", "Placa", "Motorista", "Capacidade", "Vagas ocupadas",
+                      "Vagas livres", "Ocupação (%)"],
+        "linhas": _linhas_viagens,
+    },
+    "manifestos": {
+        "cabecalho": ["Partida", "Destino", "Placa", "Motorista", "Paciente", "CPF", "Acompanhante",
+                      "Embarque", "UBS de origem"],
+        "linhas": _linhas_manifestos,
+    },
+    "encaminhamentos": {
+        "cabecalho": ["Criado em", "UBS", "Paciente", "CPF", "Procedimento", "Prioridade", "Status",
+                      "Transporte", "Data desejada", "Ajuda de custo (R$)"],
+        "linhas": _linhas_encaminhamentos,
+    },
+}
+
+
+def _local(valor: datetime) -> datetime:
+    """Horário com fuso (criado_em) no fuso do município, sem fuso (o Excel não guarda fuso)."""
+    return valor.astimezone(_fuso).replace(tzinfo=None) if valor.tzinfo else valor
+
+
+def _texto_csv(valor) -> str:
+    # Formato do Excel em português: data dd/mm/aaaa e vírgula decimal
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "Sim" if valor else "Não"
+    if isinstance(valor, datetime):
+        return _local(valor).strftime("%d/%m/%Y %H:%M")
+    if isinstance(valor, date):
+        return valor.strftime("%d/%m/%Y")
+    if isinstance(valor, (float, Decimal)):
+        return f"{valor:.2f}".replace(".", ",")
+    return str(valor)
+
+
+def _celula_xlsx(valor):
+    if isinstance(valor, bool):
+        return "Sim" if valor else "Não"
+    if isinstance(valor, datetime):
+        return _local(valor)
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, uuid.UUID):
+        return str(valor)
+    return valor
+
+
+@contextmanager
+def _linhas(tipo: str, filtros: dict):
+    """Gerador de linhas do tipo com a própria sessão (fechada quando a exportação termina)."""
+    db = SessionLocal()
+    try:
+        yield TIPOS[tipo]["linhas"](db, filtros)
+    finally:
+        db.close()
+
+
+def _blocos_csv(tipo: str, linhas):
+    # Separador ";" e BOM UTF-8: o Excel em português abre em colunas e com acento
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=";")
+    buffer.write("\ufeff")
+    escritor.writerow(TIPOS[tipo]["cabecalho"])
+    for i, linha in enumerate(linhas, 1):
+        escritor.writerow([_texto_csv(v) for v in linha])
+        if i % EXPORTACAO_LOTE_LINHAS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def gerar_csv(tipo: str, filtros: dict):
+    """
+    CSV em blocos de bytes, para StreamingResponse. Roda enquanto a resposta é enviada
+    (depois que a rota já retornou), por isso abre a própria sessão.
+    """
+    with _linhas(tipo, filtros) as linhas:
+        yield from _blocos_csv(tipo, linhas)
+
+
+def gravar_arquivo(tipo: str, formato: str, filtros: dict, caminho: str) -> int:
+    """Grava a exportação em `caminho` (temporário + rename: quem baixa nunca vê arquivo pela metade). Devolve as linhas."""
+    pasta = os.path.dirname(caminho) or "."
+    os.makedirs(pasta, exist_ok=True)
+    fd, caminho_tmp = tempfile.mkstemp(dir=pasta, suffix=".tmp")
+    total = 0
+
+    def contar(linhas):
+        nonlocal total
+        for linha in linhas:
+            total += 1
+            yield linha
+
+    try:
+        with os.fdopen(fd, "wb") as destino, _linhas(tipo, filtros) as linhas:
+            if formato == "csv":
+                for bloco in _blocos_csv(tipo, contar(linhas)):
+                    destino.write(bloco)
+            else:
+                _escrever_xlsx(tipo, contar(linhas), destino)
+        os.replace(caminho_tmp, caminho)
+        return total
+    except BaseException:
+        if os.path.exists(caminho_tmp):
+            os.remove(caminho_tmp)
+        raise
+
+
+def _escrever_xlsx(tipo: str, linhas, destino):
+    # openpyxl só carrega quando alguém pede planilha (não pesa na inicialização da API)
+    from openpyxl import Workbook
+
+    # write_only: cada linha vai para um XML temporário em disco, não fica na memória
+    planilha = Workbook(write_only=True)
+    aba = planilha.create_sheet(tipo.capitalize())
+    aba.append(TIPOS[tipo]["cabecalho"])
+    for linha in linhas:
+        aba.append([_celula_xlsx(v) for v in linha])
+    planilha.save(destino)
+
+
+def nome_do_arquivo(tipo: str, formato: str, filtros: dict) -> str:
+    return f"{tipo}_{filtros['inicio']}_{filtros['fim']}.{formato}"
+
+
+def caminho_exportacao(exportacao_id: str, formato: str) -> str:
+    return os.path.join(EXPORTACOES_DIR, f"{exportacao_id}.{formato}")
+
+
+# --- Exportação em segundo plano (Celery) ---
+
+def agendar_exportacao(tipo: str, formato: str, filtros: dict, usuario_id) -> str:
+    """Registra a exportação e enfileira a tarefa que gera o arquivo. Devolve o id para acompanhar."""
+    exportacao_id = uuid.uuid4().hex
+    chave = CHAVE_EXPORTACAO.format(exportacao_id)
+    pipe = redis_client.pipeline()
+    pipe.hset(chave, mapping={
+        "status": NA_FILA, "tipo": tipo, "formato": formato, "usuario_id": str(usuario_id),
+        "arquivo": nome_do_arquivo(tipo, formato, filtros),
+        "criado_em": datetime.now(timezone.utc).isoformat(),
+    })
+    pipe.expire(chave, EXPORTACAO_RETENCAO_HORAS * 3600)
+    pipe.execute()
+    enfileirar_tarefa("gerar_exportacao_task", args=[exportacao_id, tipo, formato, filtros])
+    return exportacao_id
+
+
+def status_exportacao(exportacao_id: str, usuario_id=None):
+    """
+    Estado da exportação ({"status", "tipo", "formato", "arquivo", ...}) ou None se não existe/expirou.
+    Com usuario_id, também None se a exportação é de outro usuário (o arquivo tem dados de pacientes).
+    """
+    dados = redis_client.hgetall(CHAVE_EXPORTACAO.format(exportacao_id))
+    exportacao = {k.decode(): v.decode() for k, v in dados.items()} or None
+    if exportacao and usuario_id is not None and exportacao.get("usuario_id") != str(usuario_id):
+        return None
+    return exportacao
+
+
+def executar_exportacao(exportacao_id: str, tipo: str, formato: str, filtros: dict) -> int:
+    """Corpo da tarefa do worker: gera o arquivo e marca PRONTO (ou ERRO, com a mensagem)."""
+    chave = CHAVE_EXPORTACAO.format(exportacao_id)
+    redis_client.hset(chave, "status", GERANDO)
+    try:
+        linhas = gravar_arquivo(tipo, formato, filtros, caminho_exportacao(exportacao_id, formato))
+    except Exception as e:
+        redis_client.hset(chave, mapping={"status": ERRO, "erro": str(e)[:500]})
+        raise
+    redis_client.hset(chave, mapping={
+        "status": PRONTO, "linhas": linhas, "concluido_em": datetime.now(timezone.utc).isoformat()
+    })
+    return linhas
+
+
+def limpar_exportacoes(anteriores_a: datetime) -> int:
+    """
+    Apaga arquivos gerados antes de `anteriores_a` (o estado no Redis expira sozinho no mesmo prazo),
+    inclusive planilhas temporárias da exportação direta que sobraram de um download interrompido.
+    """
+    limite = anteriores_a.timestamp()
+    removidos = 0
+    for pasta in (EXPORTACOES_DIR, os.path.join(EXPORTACOES_DIR, "tmp")):
+        if not os.path.isdir(pasta):
+            continue
+        for entrada in os.scandir(pasta):
+            try:
+                if entrada.is_file() and entrada.stat().st_mtime < limite:
+                    os.remove(entrada.path)
+                    removidos += 1
+            except FileNotFoundError:
+                continue
+    return removidos
@@ -0,0 +1,109 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.filas import enfileirar_tarefa
+from app.core.config import NOTIFICACOES_MAX_TENTATIVAS, NOTIFICACOES_ESPERA_BASE_SEGUNDOS
+from app.core.redis_client import redis_client
+from app.db.base import NotificacaoOutbox
+
+# Várias aprovações no mesmo segundo viram um único despacho (um lote)
+CHAVE_DESPACHO = "notificacoes:despacho_agendado"
+ESPERA_DESPACHO_SEGUNDOS = 1
+# Mensagem "ENVIANDO" de um worker que morreu volta para a fila depois desse tempo
+PRAZO_ENVIO = timedelta(minutes=5)
+
+
+def enfileirar_notificacao(db: Session, telefone: str, mensagem: str, chave_dedupe: str) -> bool:
+    """
+    Grava a notificação na outbox, SEM commit: sai junto com a mudança de status que a gerou.
+    chave_dedupe identifica o evento (ex: "vaga_aprovada:<id>"); repetida, é ignorada.
+    Retorna False se o paciente não tem telefone válido.
+    """
+    digitos = "".join(c for c in (telefone or "") if c.isdigit())
+    if len(digitos) < 10:
+        return False
+
+    db.execute(
+        insert(NotificacaoOutbox).values(telefone=digitos, mensagem=mensagem, chave_dedupe=chave_dedupe)
+        .on_conflict_do_nothing(index_elements=["chave_dedupe"])
+    )
+    db.info["notificacoes_pendentes"] = True
+    return True
+
+
+@event.listens_for(Session, "after_commit")
+def _agendar_despacho(session):
+    """Depois do commit (a outbox já está visível para o worker), agenda o despacho."""
+    if not session.info.pop("notificacoes_pendentes", False):
+        return
+    try:
+        if redis_client.set(CHAVE_DESPACHO, 1, nx=True, ex=ESPERA_DESPACHO_SEGUNDOS + 5):
+            enfileirar_tarefa("despachar_notificacoes_task", countdown=ESPERA_DESPACHO_SEGUNDOS)
+    except RedisError as e:
+        # A tarefa periódica do Beat pega a mensagem depois
+        print(f"Notificações: não foi possível agendar o despacho ({e})")
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_despacho(session):
+    session.info.pop("notificacoes_pendentes", None)
+
+
+def reivindicar_lote(db: Session, limite: int) -> list:
+    """
+    Pega até `limite` mensagens vencidas e marca como ENVIANDO (com prazo).
+    SKIP LOCKED: dois workers nunca pegam a mesma mensagem. Faz commit.
+    """
+    agora = datetime.now(timezone.utc)
+    linhas = db.query(NotificacaoOutbox).filter(
+        NotificacaoOutbox.status.in_(["PENDENTE", "ENVIANDO"]),
+        NotificacaoOutbox.proxima_tentativa_em <= agora,
+    ).order_by(NotificacaoOutbox.proxima_tentativa_em).limit(limite).with_for_update(skip_locked=True).all()
+
+    itens = []
+    for n in linhas:
+        n.status = "ENVIANDO"
+        n.proxima_tentativa_em = agora + PRAZO_ENVIO
+        itens.append({
+            "id": n.id, "telefone": n.telefone, "mensagem": n.mensagem,
+            "chave": n.chave_dedupe, "tentativas": n.tentativas,
+        })
+    db.commit()
+    return itens
+
+
+def registrar_resultados(db: Session, itens: list, resultados: list) -> dict:
+    """Grava o resultado de cada envio em lote (espera exponencial com jitter nas falhas temporárias)."""
+    agora = datetime.now(timezone.utc)
+    atualizacoes = []
+    contagem = {"enviadas": 0, "reenviar": 0, "falhas": 0}
+    for item, resultado in zip(itens, resultados):
+        tentativas = item["tentativas"] + 1
+        if resultado["ok"]:
+            atualizacoes.append({
+                "id": item["id"], "status": "ENVIADA", "tentativas": tentativas,
+                "id_provedor": resultado.get("id_provedor"), "enviada_em": agora, "ultimo_erro": None,
+            })
+            contagem["enviadas"] += 1
+        elif resultado["reenviar"] and tentativas < NOTIFICACOES_MAX_TENTATIVAS:
+            espera = NOTIFICACOES_ESPERA_BASE_SEGUNDOS * 2 ** (tentativas - 1)
+            atualizacoes.append({
+                "id": item["id"], "status": "PENDENTE", "tentativas": tentativas,
+                "proxima_tentativa_em": agora + timedelta(seconds=espera * random.uniform(0.5, 1.5)),
+                "ultimo_erro": resultado["erro"],
+            })
+            contagem["reenviar"] += 1
+        else:
+            atualizacoes.append({
+                "id": item["id"], "status": "FALHA", "tentativas": tentativas, "ultimo_erro": resultado["erro"],
+            })
+            contagem["falhas"] += 1
+
+    db.bulk_update_mappings(NotificacaoOutbox, atualizacoes)
+    db.commit()
+    return contagem
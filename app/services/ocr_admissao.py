@@ -0,0 +1,121 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import (
+    OCR_BACKLOG_MAX_GLOBAL, OCR_BACKLOG_MAX_UNIDADE, OCR_BACKLOG_FATIA_JUSTA_A_PARTIR,
+    OCR_PROCESSOS, OCR_TEMPO_PADRAO_DOCUMENTO_SEGUNDOS, OCR_LOTE_MAX_ESPERA_SEGUNDOS
+)
+from app.core.redis_client import redis_client
+
+# Documentos aguardando OCR (total e por UBS) e os últimos tempos de processamento
+CHAVE_BACKLOG_TOTAL = "ocr:backlog:total"
+CHAVE_BACKLOG_UNIDADES = "ocr:backlog:unidades"
+CHAVE_TEMPOS = "ocr:tempos_documento"
+AMOSTRAS_TEMPO = 200
+
+# Verifica e reserva a vaga na fila em uma única operação atômica no Redis
+_LUA_ADMITIR = redis_client.register_script("""
+local total = tonumber(redis.call('GET', KEYS[1]) or '0')
+local da_unidade = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+local max_global = tonumber(ARGV[2])
+local limite = tonumber(ARGV[3])
+if total >= tonumber(ARGV[4]) then
+    local ativas = redis.call('HLEN', KEYS[2])
+    if da_unidade == 0 then ativas = ativas + 1 end
+    local fatia = math.max(1, math.floor(max_global / ativas))
+    if fatia < limite then limite = fatia end
+end
+if total >= max_global or da_unidade >= limite then
+    return {0, total, da_unidade, limite}
+end
+redis.call('INCR', KEYS[1])
+redis.call('HINCRBY', KEYS[2], ARGV[1], 1)
+return {1, total + 1, da_unidade + 1, limite}
+""")
+
+# Baixa de N documentos (um ARGV por documento, com a UBS de origem)
+_LUA_BAIXAR = redis_client.register_script("""
+for _, unidade in ipairs(ARGV) do
+    if redis.call('HINCRBY', KEYS[2], unidade, -1) <= 0 then
+        redis.call('HDEL', KEYS[2], unidade)
+    end
+end
+if redis.call('DECRBY', KEYS[1], #ARGV) < 0 then
+    redis.call('SET', KEYS[1], 0)
+end
+""")
+
+
+def tempo_medio_documento() -> float:
+    """Média dos últimos tempos de OCR por documento (segundos)."""
+    amostras = [float(t) for t in redis_client.lrange(CHAVE_TEMPOS, 0, -1)]
+    if not amostras:
+        return OCR_TEMPO_PADRAO_DOCUMENTO_SEGUNDOS
+    return sum(amostras) / len(amostras)
+
+
+def admitir_documento(unidade_id: str) -> dict:
+    """
+    Tenta reservar um lugar na fila do OCR para a UBS.
+    Retorna {"admitido": True, "posicao_fila", "previsao_conclusao"} ou
+    {"admitido": False, "motivo", "retry_after"} (segundos).
+    """
+    fatia_justa_a_partir = int(OCR_BACKLOG_MAX_GLOBAL * OCR_BACKLOG_FATIA_JUSTA_A_PARTIR)
+    admitido, total, da_unidade, limite = _LUA_ADMITIR(
+        keys=[CHAVE_BACKLOG_TOTAL, CHAVE_BACKLOG_UNIDADES],
+        args=[unidade_id, OCR_BACKLOG_MAX_GLOBAL, OCR_BACKLOG_MAX_UNIDADE, fatia_justa_a_partir],
+    )
+    segundos_por_documento = tempo_medio_documento() / max(1, OCR_PROCESSOS)
+
+    if not admitido:
+        if total >= OCR_BACKLOG_MAX_GLOBAL:
+            motivo = "Fila de OCR lotada. Tente novamente mais tarde."
+            excedente = total - OCR_BACKLOG_MAX_GLOBAL + 1
+        else:
+            motivo = f"Sua unidade já tem {da_unidade} documento(s) aguardando leitura (limite atual: {limite})."
+            excedente = da_unidade - limite + 1
+        return {
+            "admitido": False,
+            "motivo": motivo,
+            "retry_after": max(1, math.ceil(excedente * segundos_por_documento)),
+        }
+
+    espera = total * segundos_por_documento + OCR_LOTE_MAX_ESPERA_SEGUNDOS
+    return {
+        "admitido": True,
+        "posicao_fila": total,
+        "previsao_conclusao": datetime.now(timezone.utc) + timedelta(seconds=espera),
+    }
+
+
+def cancelar_admissao(unidade_id: str):
+    """Devolve a vaga reservada quando o upload falha antes de entrar na fila."""
+    baixar_documentos([unidade_id])
+
+
+def baixar_documentos(unidades_ids: list):
+    """Chamado pelo worker quando os documentos saem da fila (lidos ou com erro)."""
+    if unidades_ids:
+        _LUA_BAIXAR(keys=[CHAVE_BACKLOG_TOTAL, CHAVE_BACKLOG_UNIDADES], args=[str(u) for u in unidades_ids])
+
+
+def registrar_tempos(duracoes: list):
+    """Guarda os últimos tempos de OCR por documento para a previsão de conclusão."""
+    if duracoes:
+        pipe = redis_client.pipeline()
+        pipe.lpush(CHAVE_TEMPOS, *[f"{d:.3f}" for d in duracoes])
+        pipe.ltrim(CHAVE_TEMPOS, 0, AMOSTRAS_TEMPO - 1)
+        pipe.execute()
+
+
+def reconciliar_backlog(contagem_por_unidade: dict):
+    """
+    Regrava os contadores a partir do banco (fonte da verdade).
+    Corrige a deriva de worker que morreu no meio do lote ou de mensagem antiga sem contagem.
+    """
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(CHAVE_BACKLOG_UNIDADES)
+    if contagem_por_unidade:
+        pipe.hset(CHAVE_BACKLOG_UNIDADES, mapping={str(k): v for k, v in contagem_por_unidade.items()})
+    pipe.set(CHAVE_BACKLOG_TOTAL, sum(contagem_por_unidade.values()))
+    pipe.execute()
@@ -0,0 +1,53 @@
+import json
+
+from app.core.filas import enfileirar_tarefa
+from app.core.config import OCR_LOTE_MAX_DOCUMENTOS, OCR_LOTE_MAX_ESPERA_SEGUNDOS
+from app.core.redis_client import redis_client
+
+# Buffer compartilhado entre todos os processos da API (vários uvicorn workers)
+CHAVE_FILA = "ocr:lote:pendentes"
+CHAVE_TIMER = "ocr:lote:timer"
+
+
+def enfileirar_documento(solicitacao_id: str, blob_sha256: str, nome_arquivo: str):
+    """
+    Coloca o documento no buffer de lote.
+    - Buffer cheio: despacha o lote na hora.
+    - Primeiro documento da rajada: agenda o despacho para daqui a OCR_LOTE_MAX_ESPERA_SEGUNDOS.
+    """
+    item = json.dumps({"solicitacao_id": solicitacao_id, "blob_sha256": blob_sha256, "nome_arquivo": nome_arquivo})
+    tamanho = redis_client.rpush(CHAVE_FILA, item)
+
+    if tamanho >= OCR_LOTE_MAX_DOCUMENTOS:
+        despachar_lotes(somente_cheios=True)
+    # O timer expira sozinho: se a tarefa agendada se perder, a próxima rajada cria outro
+    elif redis_client.set(CHAVE_TIMER, 1, nx=True, ex=int(OCR_LOTE_MAX_ESPERA_SEGUNDOS) + 30):
+        enfileirar_tarefa("despachar_lote_ocr_task", countdown=OCR_LOTE_MAX_ESPERA_SEGUNDOS)
+
+
+def despachar_lotes(somente_cheios: bool = False) -> int:
+    """
+    Retira os documentos do buffer em lotes de até OCR_LOTE_MAX_DOCUMENTOS e envia para o worker.
+    Retorna quantos lotes foram enviados.
+    """
+    if not somente_cheios:
+        # Apaga o timer ANTES de ler a fila: quem chegar depois agenda um novo despacho
+        redis_client.delete(CHAVE_TIMER)
+
+    lotes = 0
+    while True:
+        if somente_cheios and redis_client.llen(CHAVE_FILA) < OCR_LOTE_MAX_DOCUMENTOS:
+            break
+        # LPOP com contagem é atômico: dois processos nunca pegam o mesmo documento
+        itens = redis_client.lpop(CHAVE_FILA, OCR_LOTE_MAX_DOCUMENTOS)
+        if not itens:
+            break
+        try:
+            enfileirar_tarefa("processar_lote_task", args=[[json.loads(i) for i in itens]])
+        except Exception:
+            # Broker fora do ar: devolve os documentos para o início do buffer, na mesma ordem.
+            # O próximo upload ou a reconciliação do backlog (Beat) despacha de novo
+            redis_client.lpush(CHAVE_FILA, *reversed(itens))
+            raise
+        lotes += 1
+    return lotes
@@ -0,0 +1,172 @@
+import re
+import ahocorasick
+
+# ==========================================
+# Tabela de Regras do OCR (Declarativa)
+# ==========================================
+# Para adicionar uma regra nova (ex: outro termo de hemodiálise ou outra faixa de CID)
+# basta mexer nas tabelas abaixo. Tudo é compilado UMA vez na importação e o texto
+# do documento é varrido em uma única passada.
+
+# Tipos de documento: a ordem define a precedência (o primeiro que casar vence)
+TIPOS_DOCUMENTO = (
+    ("COMPROVANTE_AGENDAMENTO", ("COMPROVANTE DE AGENDAMENTO",)),
+    ("LAUDO_SOLICITACAO", ("LAUDO PARA SOLICITAÇÃO", "PROCEDIMENTO AMBULATORIAL")),
+)
+TIPO_GENERICO = "DESCONHECIDO"
+
+# Destinos conhecidos (a ordem define a precedência)
+DESTINOS = ("GARANHUNS", "RECIFE")
+
+# Conjuntos de palavras-chave (buscadas no texto em MAIÚSCULAS)
+PALAVRAS_CHAVE = {
+    "ALTO_RISCO": ("NEOPLASIA MALIGNA", "CANCER", "ONCOLOGIA", "HEMODIALISE"),
+    "RISCO": ("URGENTE", "PRIORIDADE", "RISCO"),
+    "ALERTA_GENERICO": ("URGENTE", "CANCER", "ONCOLOGIA"),
+}
+
+# Campos extraídos: (campo, âncora literal, regex iniciada na âncora, converter para maiúsculas)
+# - A âncora entra no autômato (texto em MAIÚSCULAS); a regex só roda nas posições onde ela aparece.
+# - Campos sem âncora (ex: CPF) vão para a regex combinada, que roda uma vez sobre o texto.
+# - As regex rodam sobre o texto ORIGINAL; trechos "(?i:...)" ignoram caixa.
+CAMPOS = (
+    ("cpf", None, r"(?P<cpf>\d{3}\.\d{3}\.\d{3}-\d{2})", False),
+    ("nome", "NOME:", r"(?i:NOME:\s*(?P<nome>.*))", True),
+    ("data_exame", "DATA:", r"(?i:DATA:)\s*(?P<data_exame>\d{2}/\d{2}/\d{4})", False),
+    ("hora_exame", "HORA:", r"(?i:HORA:)\s*(?P<hora_exame>\d{2}:\d{2})", False),
+    ("item_agendamento", "ITEM AGENDAMENTO:", r"(?i:ITEM AGENDAMENTO:\s*(?P<item_agendamento>.*))", True),
+    ("telefone", "TELEFONE", r"Telefone\s*(?P<telefone>[\(\)0-9\-\s]+)", False),
+    ("cid", "CID10", r"(?i:CID10\s*(?P<cid>[A-Z]\d{2,3}|.*))", True),
+    # Linha seguinte ao rótulo (ou a próxima, se vier em branco)
+    ("nome_cidadao", "NOME DO CIDADÃO", r"Nome do cidadão[^\n]*(?:\n(?P<nome_cidadao>[^\n]*)(?:\n(?P<nome_cidadao_2>[^\n]*))?)?", False),
+    ("procedimento_solicitado", "PROCEDIMENTO SOLICITADO", r"(?i:PROCEDIMENTO SOLICITADO)[^\n]*(?:\n(?P<procedimento_solicitado>[^\n]*))?", False),
+)
+
+# Regras de prioridade por tipo de documento: (nivel, condição). Vence a primeira que casar.
+# Condições:
+#   ("grupo", nome)                -> algum termo de PALAVRAS_CHAVE[nome] aparece no texto
+#   ("campo_prefixo", campo, txt)  -> o campo extraído começa com txt
+#   ("campo_contem", campo, txt)   -> o campo extraído contém txt
+REGRAS_PRIORIDADE = {
+    "COMPROVANTE_AGENDAMENTO": (
+        (5, ("campo_contem", "procedimento", "ONCOLOGIA")),  # Já agendado e oncológico
+    ),
+    "LAUDO_SOLICITACAO": (
+        (5, ("campo_prefixo", "cid", "C")),  # Câncer (CID C*)
+        (5, ("grupo", "ALTO_RISCO")),
+        (3, ("grupo", "RISCO")),
+    ),
+    TIPO_GENERICO: (
+        (3, ("grupo", "ALERTA_GENERICO")),
+    ),
+}
+PRIORIDADE_PADRAO = 1
+
+
+class ExtratorRegras:
+    """
+    Compila as tabelas acima em um matcher multi-padrão:
+    - Autômato Aho-Corasick com todas as palavras-chave (tipos, destinos, grupos de risco)
+      e as âncoras dos campos. Uma passada no texto devolve termos e posições.
+    - Uma regex combinada para os campos que não têm âncora literal.
+    O custo por documento deixa de crescer com o número de regras.
+    """
+    def __init__(self, tipos_documento, destinos, palavras_chave, campos):
+        self.tipos_documento = tipos_documento
+        self.destinos = destinos
+        self.palavras_chave = {grupo: frozenset(termos) for grupo, termos in palavras_chave.items()}
+
+        termos = {t for _, ts in tipos_documento for t in ts}
+        termos.update(destinos)
+        for ts in palavras_chave.values():
+            termos.update(ts)
+
+        self.campos_ancorados = []  # (campo, âncora, regex compilada)
+        self.maiusculas = set()
+        self.campo_por_regra = {}
+        alternativas = []
+        for i, (campo, ancora, padrao, maiusculas) in enumerate(campos):
+            if maiusculas:
+                self.maiusculas.add(campo)
+            if ancora:
+                self.campos_ancorados.append((campo, ancora, re.compile(padrao)))
+            else:
+                # Lookahead: um campo sem âncora nunca "engole" o início de outro
+                alternativas.append(f"(?P<_r{i}>{padrao})")
+                self.campo_por_regra[f"_r{i}"] = campo
+        self.regex_sem_ancora = re.compile("(?=" + "|".join(alternativas) + ")") if alternativas else None
+
+        self.ancoras = frozenset(ancora for _, ancora, _ in self.campos_ancorados)
+        self.automato = ahocorasick.Automaton()
+        for palavra in termos | self.ancoras:
+            self.automato.add_word(palavra, (palavra, len(palavra)))
+        self.automato.make_automaton()
+
+    def extrair(self, text: str, text_upper: str) -> dict:
+        """
+        Varre o documento uma vez e devolve tipo, termos encontrados e a PRIMEIRA ocorrência de cada campo.
+        """
+        termos = set()
+        posicoes = {}
+        for fim, (palavra, tamanho) in self.automato.iter(text_upper):
+            termos.add(palavra)
+            if palavra in self.ancoras:
+                posicoes.setdefault(palavra, []).append(fim - tamanho + 1)
+
+        # Raro: upper() mudou o tamanho do texto (ex: "ß" -> "SS"), as posições não batem
+        alinhado = len(text_upper) == len(text)
+
+        campos = {}
+        for campo, ancora, regex in self.campos_ancorados:
+            if alinhado:
+                m = next((m for m in (regex.match(text, p) for p in posicoes.get(ancora, ())) if m), None)
+            else:
+                m = regex.search(text) if ancora in posicoes else None
+            if m:
+                campos[campo] = self._grupos(campo, m)
+
+        if self.regex_sem_ancora:
+            pendentes = len(self.campo_por_regra)
+            for m in self.regex_sem_ancora.finditer(text):
+                campo = self.campo_por_regra[m.lastgroup]
+                if campo in campos:
+                    continue
+                campos[campo] = self._grupos(campo, m)
+                pendentes -= 1
+                if not pendentes:
+                    break
+
+        tipo = TIPO_GENERICO
+        for nome_tipo, marcadores in self.tipos_documento:
+            if termos.intersection(marcadores):
+                tipo = nome_tipo
+                break
+
+        destino = next((d for d in self.destinos if d in termos), None)
+
+        return {"tipo_doc": tipo, "termos": termos, "campos": campos, "destino": destino}
+
+    def _grupos(self, campo: str, m) -> dict:
+        grupos = {k: v for k, v in m.groupdict().items() if v is not None and not k.startswith("_r")}
+        if campo in self.maiusculas:
+            grupos = {k: v.upper() for k, v in grupos.items()}
+        return grupos
+
+    def tem_grupo(self, termos: set, grupo: str) -> bool:
+        return not self.palavras_chave[grupo].isdisjoint(termos)
+
+    def calcular_prioridade(self, tipo_doc: str, dados: dict, termos: set) -> int:
+        for nivel, condicao in REGRAS_PRIORIDADE.get(tipo_doc, ()):
+            regra = condicao[0]
+            if regra == "grupo" and self.tem_grupo(termos, condicao[1]):
+                return nivel
+            valor = dados.get(condicao[1]) if regra != "grupo" else None
+            if regra == "campo_prefixo" and valor and valor.startswith(condicao[2]):
+                return nivel
+            if regra == "campo_contem" and valor and condicao[2] in valor:
+                return nivel
+        return PRIORIDADE_PADRAO
+
+
+# Compilado uma única vez por processo
+EXTRATOR = ExtratorRegras(TIPOS_DOCUMENTO, DESTINOS, PALAVRAS_CHAVE, CAMPOS)
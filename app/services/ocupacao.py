@@ -0,0 +1,90 @@
+"""
+Visão geral da ocupação das viagens (painel do gestor): todas as viagens do período com capacidade,
+vagas ocupadas, candidatos aguardando por prioridade e passageiros aprovados (embarcaram/ausentes).
+
+Uma consulta só: as contagens saem de dois GROUP BY, cada um lido do índice parcial do seu status
+(ix_solicitacoes_tfd_candidatos e ix_solicitacoes_tfd_passageiros), ligados às viagens do período.
+"""
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import case, func, literal, select, union_all
+
+from app.db.base import CronogramaViagem, SolicitacaoTFD
+
+# Período máximo de uma chamada (um trimestre): o painel pede o dia, a semana ou o mês
+MAX_DIAS = 93
+
+
+def _contagens(viagens_do_periodo):
+    """Contagens por viagem: candidatos por prioridade ("A") e passageiros aprovados ("P")."""
+    acompanhantes = func.sum(case((SolicitacaoTFD.com_acompanhante.is_(True), 1), else_=0))
+    aguardando = select(
+        SolicitacaoTFD.viagem_id, literal("A").label("grupo"), SolicitacaoTFD.nivel_prioridade.label("prioridade"),
+        func.count().label("total"), acompanhantes.label("acompanhantes"),
+        literal(0).label("embarcaram"), literal(0).label("ausentes"),
+    ).where(
+        SolicitacaoTFD.status_pedido == "Aguardando_Analise",
+        SolicitacaoTFD.viagem_id.in_(viagens_do_periodo),
+    ).group_by(SolicitacaoTFD.viagem_id, SolicitacaoTFD.nivel_prioridade)
+
+    aprovados = select(
+        SolicitacaoTFD.viagem_id, literal("P"), literal(None),
+        func.count(), acompanhantes,
+        func.sum(case((SolicitacaoTFD.status_embarque == "EMBARCOU", 1), else_=0)),
+        func.sum(case((SolicitacaoTFD.status_embarque == "AUSENTE", 1), else_=0)),
+    ).where(
+        SolicitacaoTFD.status_pedido == "Aprovado_Onibus",
+        SolicitacaoTFD.viagem_id.in_(viagens_do_periodo),
+    ).group_by(SolicitacaoTFD.viagem_id)
+
+    return union_all(aguardando, aprovados).subquery("contagens")
+
+
+def ocupacao_das_viagens(db, inicio: date, fim: date, destino: str = None) -> list:
+    """Viagens com partida entre `inicio` e `fim` (inclusive), na ordem de saída."""
+    periodo = [
+        CronogramaViagem.data_partida >= datetime.combine(inicio, time.min),
+        CronogramaViagem.data_partida < datetime.combine(fim + timedelta(days=1), time.min),
+    ]
+    if destino:
+        periodo.append(CronogramaViagem.destino == destino)
+    contagens = _contagens(select(CronogramaViagem.id).where(*periodo))
+
+    linhas = db.execute(
+        select(
+            CronogramaViagem.id, CronogramaViagem.destino, CronogramaViagem.data_partida, CronogramaViagem.placa,
+            CronogramaViagem.motorista, CronogramaViagem.capacidade_total, CronogramaViagem.vagas_ocupadas,
+            contagens.c.grupo, contagens.c.prioridade, contagens.c.total, contagens.c.acompanhantes,
+            contagens.c.embarcaram, contagens.c.ausentes,
+        ).outerjoin(contagens, contagens.c.viagem_id == CronogramaViagem.id)
+        .where(*periodo)
+        .order_by(CronogramaViagem.data_partida, CronogramaViagem.id)
+    )
+
+    # Várias linhas por viagem (uma por prioridade aguardando + uma dos aprovados): junta aqui
+    viagens = {}
+    for (viagem_id, destino_viagem, partida, placa, motorista, capacidade, ocupadas,
+         grupo, prioridade, total, acompanhantes, embarcaram, ausentes) in linhas:
+        viagem = viagens.get(viagem_id)
+        if viagem is None:
+            capacidade, ocupadas = capacidade or 0, ocupadas or 0
+            viagem = viagens[viagem_id] = {
+                "id": str(viagem_id), "destino": destino_viagem, "data_partida": partida,
+                "placa": placa, "motorista": motorista,
+                "capacidade": capacidade, "vagas_ocupadas": ocupadas, "vagas_livres": capacidade - ocupadas,
+                "aguardando": {"total": 0, "acompanhantes": 0, "por_prioridade": {}},
+                "aprovados": {"total": 0, "acompanhantes": 0, "embarcaram": 0, "ausentes": 0, "pendentes": 0},
+            }
+        if grupo == "A":
+            fila = viagem["aguardando"]
+            fila["total"] += total
+            fila["acompanhantes"] += int(acompanhantes or 0)
+            nivel = str(prioridade if prioridade is not None else 0)
+            fila["por_prioridade"][nivel] = fila["por_prioridade"].get(nivel, 0) + total
+        elif grupo == "P":
+            embarcaram, ausentes = int(embarcaram or 0), int(ausentes or 0)
+            viagem["aprovados"] = {
+                "total": total, "acompanhantes": int(acompanhantes or 0),
+                "embarcaram": embarcaram, "ausentes": ausentes, "pendentes": total - embarcaram - ausentes,
+            }
+    return list(viagens.values())
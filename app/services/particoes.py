@@ -0,0 +1,236 @@
+"""
+Partições mensais de solicitacoes_tfd (RANGE em criado_em) e arquivamento dos meses antigos.
+
+- garantir_particoes: cria as partições do mês atual até PARTICOES_MESES_A_FRENTE meses à frente;
+- arquivar_particoes: meses com mais de ARQUIVO_RETENCAO_MESES saem da tabela (DETACH), viram
+  {ARQUIVO_DIR}/solicitacoes_tfd_AAAAMM.csv.gz e a tabela solta é apagada depois do arquivo conferido;
+- restaurar_mes: devolve um mês arquivado para a tabela (auditoria, recurso).
+Só Postgres: em outros bancos (ou com a tabela ainda não particionada) as funções não fazem nada.
+"""
+import csv
+import gzip
+import os
+import re
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import text
+
+from app.core.config import (
+    PARTICOES_MESES_A_FRENTE, ARQUIVO_RETENCAO_MESES, ARQUIVO_DIR, ARQUIVO_REMOVER_PARTICAO, FUSO_HORARIO
+)
+from app.db.session import engine
+from app.utils.datas import proximo_mes
+
+TABELA = "solicitacoes_tfd"
+PADRAO = f"{TABELA}_padrao"
+_NOME_MENSAL = re.compile(rf"^{TABELA}_p(\d{{4}})(\d{{2}})$")
+_COLUNA = re.compile(r"^[a-z_][a-z0-9_]*$")
+# DDL na tabela-mãe espera no máximo isso por consultas em andamento (senão tenta na próxima execução)
+ESPERA_LOCK = "5s"
+# Tabela desanexada que já virou arquivo (mantida no banco com ARQUIVO_REMOVER_PARTICAO=false)
+_COMENTARIO_ARQUIVADA = "arquivada em "
+
+
+def nome_particao(mes: date) -> str:
+    return f"{TABELA}_p{mes:%Y%m}"
+
+
+def _mes_do_nome(nome: str):
+    achado = _NOME_MENSAL.match(nome)
+    return date(int(achado[1]), int(achado[2]), 1) if achado else None
+
+
+def _inicio_do_mes(mes: date) -> datetime:
+    """Meia-noite do dia 1 no fuso do município: a partição é o mês local, como nos relatórios."""
+    return datetime(mes.year, mes.month, 1, tzinfo=ZoneInfo(FUSO_HORARIO))
+
+
+def mes_corrente() -> date:
+    return datetime.now(ZoneInfo(FUSO_HORARIO)).date().replace(day=1)
+
+
+def somar_meses(mes: date, meses: int) -> date:
+    total = mes.year * 12 + mes.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _disponivel() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def particionada(conexao) -> bool:
+    return bool(conexao.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t))"
+    ), {"t": TABELA}).scalar())
+
+
+def meses_anexados(conexao) -> list:
+    """Meses com partição ligada à tabela (a padrão fica de fora)."""
+    nomes = conexao.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:t)"
+    ), {"t": TABELA}).scalars()
+    return sorted(m for m in map(_mes_do_nome, nomes) if m)
+
+
+def _meses_soltos(conexao) -> list:
+    """Partições desanexadas que ainda não viraram arquivo (inclusive de uma execução que parou no meio)."""
+    nomes = conexao.execute(text("""
+        SELECT relname FROM pg_class
+        WHERE relkind = 'r' AND NOT relispartition AND relname LIKE :prefixo AND pg_table_is_visible(oid)
+          AND coalesce(obj_description(oid, 'pg_class'), '') NOT LIKE :arquivada
+    """), {"prefixo": f"{TABELA}_p%", "arquivada": f"{_COMENTARIO_ARQUIVADA}%"}).scalars()
+    return sorted(m for m in map(_mes_do_nome, nomes) if m)
+
+
+def criar_particao(conexao, mes: date) -> int:
+    """
+    Cria e anexa a partição do mês (na transação de `conexao`). Linhas do mês que caíram na partição
+    padrão (INSERT antes de a partição existir) são movidas para ela: o ATTACH recusa se a padrão tiver
+    linhas do intervalo. Devolve quantas linhas foram movidas.
+    """
+    nome, inicio, fim = nome_particao(mes), _inicio_do_mes(mes), _inicio_do_mes(proximo_mes(mes))
+    conexao.execute(text(f"CREATE TABLE {nome} (LIKE {TABELA} INCLUDING DEFAULTS)"))
+    movidas = conexao.execute(text(f"""
+        WITH movidas AS (
+            DELETE FROM {PADRAO} WHERE criado_em >= :inicio AND criado_em < :fim RETURNING *
+        )
+        INSERT INTO {nome} SELECT * FROM movidas
+    """), {"inicio": inicio, "fim": fim}).rowcount
+    # Os índices da tabela-mãe são criados na partição pelo próprio ATTACH
+    conexao.execute(text(
+        f"ALTER TABLE {TABELA} ATTACH PARTITION {nome} "
+        f"FOR VALUES FROM ('{inicio.isoformat()}') TO ('{fim.isoformat()}')"
+    ))
+    return movidas
+
+
+def garantir_particoes(meses_a_frente: int = None, desde: date = None) -> list:
+    """
+    Cria as partições que faltam, de `desde` (padrão: mês atual) até o mês atual + meses_a_frente.
+    Uma transação por mês (o lock na tabela-mãe dura só o CREATE/ATTACH). Devolve os meses criados.
+    """
+    if not _disponivel():
+        return []
+    meses_a_frente = PARTICOES_MESES_A_FRENTE if meses_a_frente is None else meses_a_frente
+    with engine.connect() as conexao:
+        if not particionada(conexao):
+            return []
+        existentes = set(meses_anexados(conexao))
+
+    atual = mes_corrente()
+    mes, ultimo = (desde or atual).replace(day=1), somar_meses(atual, meses_a_frente)
+    criadas = []
+    while mes <= ultimo:
+        if mes not in existentes:
+            with engine.begin() as conexao:
+                conexao.execute(text(f"SET LOCAL lock_timeout = '{ESPERA_LOCK}'"))
+                conexao.execute(text(f"CREATE TABLE IF NOT EXISTS {PADRAO} PARTITION OF {TABELA} DEFAULT"))
+                movidas = criar_particao(conexao, mes)
+            criadas.append({"mes": f"{mes:%Y-%m}", "linhas_movidas": movidas})
+        mes = proximo_mes(mes)
+    return criadas
+
+
+def _caminho_arquivo(destino: str, mes: date) -> str:
+    caminho = os.path.join(destino, f"{TABELA}_{mes:%Y%m}.csv.gz")
+    if os.path.exists(caminho): # Mês restaurado e arquivado de novo: não sobrescreve o arquivo anterior
+        caminho = os.path.join(destino, f"{TABELA}_{mes:%Y%m}_{datetime.now():%Y%m%d%H%M%S}.csv.gz")
+    return caminho
+
+
+def _exportar(nome: str, caminho: str) -> int:
+    """COPY da tabela para CSV gzip (tmp + rename), conferido linha a linha antes de valer."""
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    temporario = caminho + ".tmp"
+    conexao = engine.raw_connection()
+    try:
+        with conexao.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {nome}")
+            total = cursor.fetchone()[0]
+            with gzip.open(temporario, "wb") as arquivo:
+                cursor.copy_expert(f"COPY {nome} TO STDOUT WITH (FORMAT csv, HEADER)", arquivo)
+        conexao.commit()
+    finally:
+        conexao.close()
+
+    # Relê o arquivo: só apaga a partição se todas as linhas estiverem lá
+    with gzip.open(temporario, "rt", encoding="utf-8", newline="") as arquivo:
+        gravadas = sum(1 for _ in csv.reader(arquivo)) - 1
+    if gravadas != total:
+        os.remove(temporario)
+        raise RuntimeError(f"Arquivo de {nome} com {gravadas} linha(s), a tabela tem {total}.")
+    os.replace(temporario, caminho)
+    return total
+
+
+def arquivar_particoes(retencao_meses: int = None, destino: str = None, remover: bool = None) -> list:
+    """
+    Tira da tabela os meses anteriores a (mês atual - retencao_meses) e grava cada um em CSV gzip.
+    1. DETACH: o mês some das consultas na hora (a tabela continua no banco até o arquivo ficar pronto).
+       Sem CONCURRENTLY: o Postgres não permite com partição padrão; o lock é curto e limitado pelo lock_timeout.
+    2. COPY para o arquivo, conferido; depois DROP (ou só marca como arquivada, se remover=False).
+    Os resumos do BI (bi_*) não dependem da tabela: o painel continua com o histórico arquivado.
+    """
+    if not _disponivel():
+        return []
+    retencao_meses = ARQUIVO_RETENCAO_MESES if retencao_meses is None else retencao_meses
+    destino = destino or ARQUIVO_DIR
+    remover = ARQUIVO_REMOVER_PARTICAO if remover is None else remover
+    limite = somar_meses(mes_corrente(), -retencao_meses)
+
+    with engine.connect() as conexao:
+        if not particionada(conexao):
+            return []
+        antigos = [mes for mes in meses_anexados(conexao) if mes < limite]
+
+    # 1. Desanexa
+    for mes in antigos:
+        with engine.begin() as conexao:
+            conexao.execute(text(f"SET LOCAL lock_timeout = '{ESPERA_LOCK}'"))
+            conexao.execute(text(f"ALTER TABLE {TABELA} DETACH PARTITION {nome_particao(mes)}"))
+
+    # 2. Arquiva toda partição solta
+    with engine.connect() as conexao:
+        soltos = _meses_soltos(conexao)
+    arquivados = []
+    for mes in soltos:
+        nome = nome_particao(mes)
+        caminho = _caminho_arquivo(destino, mes)
+        linhas = _exportar(nome, caminho)
+        with engine.begin() as conexao:
+            if remover:
+                conexao.execute(text(f"DROP TABLE {nome}"))
+            else:
+                conexao.execute(text(f"COMMENT ON TABLE {nome} IS :comentario"),
+                                {"comentario": f"{_COMENTARIO_ARQUIVADA}{caminho}"})
+        arquivados.append({"mes": f"{mes:%Y-%m}", "linhas": linhas, "arquivo": caminho, "removida": remover})
+    return arquivados
+
+
+def restaurar_mes(caminho: str) -> int:
+    """
+    Carrega um arquivo gerado por arquivar_particoes de volta na tabela (cria a partição do mês se faltar).
+    Tudo numa transação: linha repetida (mês já restaurado) desfaz a carga inteira.
+    """
+    if not _disponivel():
+        raise RuntimeError("Restauração só existe no Postgres.")
+    achado = re.search(r"_(\d{4})(\d{2})(?:_\d{14})?\.csv\.gz$", caminho)
+    if not achado:
+        raise ValueError(f"Nome de arquivo inesperado: {caminho}")
+    mes = date(int(achado[1]), int(achado[2]), 1)
+
+    nome = nome_particao(mes)
+    with engine.begin() as conexao, gzip.open(caminho, "rt", encoding="utf-8", newline="") as arquivo:
+        colunas = next(csv.reader([arquivo.readline()]))
+        if not all(_COLUNA.match(coluna) for coluna in colunas):
+            raise ValueError(f"Cabeçalho inválido em {caminho}.")
+        if mes not in meses_anexados(conexao):
+            if conexao.execute(text("SELECT to_regclass(:nome) IS NOT NULL"), {"nome": nome}).scalar():
+                raise RuntimeError(f"{nome} ainda existe solta no banco: reanexe com ATTACH PARTITION.")
+            conexao.execute(text(f"CREATE TABLE IF NOT EXISTS {PADRAO} PARTITION OF {TABELA} DEFAULT"))
+            criar_particao(conexao, mes)
+        # O resto do arquivo (sem o cabeçalho) vai para a tabela-mãe, que roteia cada linha pela data
+        with conexao.connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {TABELA} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)", arquivo)
+            return cursor.rowcount
@@ -0,0 +1,186 @@
+"""
+Ordem das paradas do ônibus nas UBS antes de seguir para o destino (Recife, Garanhuns...).
+
+- Distâncias: matriz pré-calculada entre as UBS (cache_unidades, linha reta x ROTA_FATOR_VIARIO),
+  sem serviço de mapas. A saída (ROTA_GARAGEM) e a cidade de destino (ROTA_DESTINOS) entram como
+  pontas fixas; sem elas a ponta fica livre (custo zero para qualquer parada).
+- Ordem: ótima (programação dinâmica de Held-Karp) até ROTA_EXATA_MAX_PARADAS paradas; acima disso,
+  vizinho mais próximo + 2-opt.
+- Cache: a rota de cada viagem fica no Redis com a assinatura das paradas (UBS + coordenadas +
+  destino). Entrou ou saiu passageiro de outra UBS, a assinatura muda e a rota é recalculada.
+"""
+import hashlib
+import json
+
+from redis.exceptions import RedisError
+
+from app.core.config import (
+    ROTA_EXATA_MAX_PARADAS, ROTA_FATOR_VIARIO, ROTA_VELOCIDADE_KMH, ROTA_GARAGEM, ROTA_DESTINOS, ROTA_CACHE_HORAS
+)
+from app.core.redis_client import redis_client
+from app.services.cache_unidades import unidades, distancias_unidades
+from app.utils.geo import distancia_km, ler_ponto
+from app.utils.texto import normalizar_busca
+
+CHAVE_ROTA = "rota:viagem:{}"
+GARAGEM = ler_ponto(ROTA_GARAGEM)
+_DESTINOS = {normalizar_busca(nome): tuple(ponto) for nome, ponto in ROTA_DESTINOS.items()}
+
+
+def ponto_do_destino(destino: str):
+    """Coordenadas da cidade de destino da viagem ("Recife - IMIP" casa com "Recife"); None se desconhecida."""
+    texto = normalizar_busca(destino or "")
+    for nome, ponto in _DESTINOS.items():
+        if texto.startswith(nome):
+            return ponto
+    return None
+
+
+def _custo(matriz: list, rota: list) -> float:
+    return sum(matriz[a][b] for a, b in zip(rota, rota[1:]))
+
+
+def _exata(matriz: list, n: int) -> list:
+    """
+    Held-Karp: menor caminho saindo da ponta n, passando por todas as paradas 0..n-1 e chegando na ponta n+1.
+    custo[mascara][ultima] = menor custo para visitar `mascara` terminando em `ultima`. O(2^n * n^2).
+    """
+    infinito = float("inf")
+    custo = [[infinito] * n for _ in range(1 << n)]
+    anterior = [[-1] * n for _ in range(1 << n)]
+    for i in range(n):
+        custo[1 << i][i] = matriz[n][i]
+    for mascara in range(1, 1 << n):
+        linha = custo[mascara]
+        for ultima in range(n):
+            atual = linha[ultima]
+            if atual == infinito:
+                continue
+            distancias = matriz[ultima]
+            for proxima in range(n):
+                bit = 1 << proxima
+                if mascara & bit:
+                    continue
+                novo = atual + distancias[proxima]
+                if novo < custo[mascara | bit][proxima]:
+                    custo[mascara | bit][proxima] = novo
+                    anterior[mascara | bit][proxima] = ultima
+
+    cheia = (1 << n) - 1
+    ultima = min(range(n), key=lambda i: custo[cheia][i] + matriz[i][n + 1])
+    ordem, mascara = [], cheia
+    while ultima != -1:
+        ordem.append(ultima)
+        ultima, mascara = anterior[mascara][ultima], mascara ^ (1 << ultima)
+    return ordem[::-1]
+
+
+def _heuristica(matriz: list, n: int) -> list:
+    """Vizinho mais próximo a partir da ponta de saída, melhorado com 2-opt até não haver ganho."""
+    restantes, ordem, atual = set(range(n)), [], n
+    while restantes:
+        atual = min(restantes, key=lambda i: matriz[atual][i])
+        restantes.remove(atual)
+        ordem.append(atual)
+
+    rota = [n, *ordem, n + 1]
+    melhorou = True
+    while melhorou:
+        melhorou = False
+        for i in range(1, n):
+            for j in range(i + 1, n + 1):
+                a, b, c, d = rota[i - 1], rota[i], rota[j], rota[j + 1]
+                if matriz[a][c] + matriz[b][d] < matriz[a][b] + matriz[c][d] - 1e-9:
+                    rota[i:j + 1] = rota[i:j + 1][::-1]
+                    melhorou = True
+    return rota[1:-1]
+
+
+def ordenar_paradas(matriz: list) -> tuple:
+    """
+    matriz: (n+2) x (n+2) em km; índices 0..n-1 são as paradas, n é a saída e n+1 a chegada
+    (linha/coluna de zeros = ponta livre). Devolve (ordem dos índices, método).
+    """
+    n = len(matriz) - 2
+    if n <= 1:
+        return list(range(n)), "exato"
+    if n <= ROTA_EXATA_MAX_PARADAS:
+        return _exata(matriz, n), "exato"
+    return _heuristica(matriz, n), "heuristico"
+
+
+def _montar_matriz(paradas: list, pontos: dict, distancias: dict, chegada) -> list:
+    n = len(paradas)
+    matriz = [[0.0] * (n + 2) for _ in range(n + 2)]
+    for i, a in enumerate(paradas):
+        for j, b in enumerate(paradas):
+            matriz[i][j] = distancias[a][b]
+        if GARAGEM:
+            matriz[n][i] = matriz[i][n] = distancia_km(GARAGEM, pontos[a]) * ROTA_FATOR_VIARIO
+        if chegada:
+            matriz[i][n + 1] = matriz[n + 1][i] = distancia_km(pontos[a], chegada) * ROTA_FATOR_VIARIO
+    return matriz
+
+
+def calcular_rota(unidades_ids, destino: str) -> dict:
+    """
+    Ordem das UBS de embarque. UBS sem coordenadas vão no fim (sem distância), na ordem do nome.
+    {"paradas": [{"unidade_id", "km_trecho"}], "km_total", "minutos_estimados", "metodo"}: total e tempo
+    são do recolhimento (saída até a última UBS); o trecho até o destino só decide qual UBS fica por último.
+    """
+    todas, distancias = unidades(), distancias_unidades()
+    ids = sorted({str(u) for u in unidades_ids if u})
+    roteaveis = [u for u in ids if u in distancias and u in todas]
+    pontos = {u: (todas[u]["latitude"], todas[u]["longitude"]) for u in roteaveis}
+    chegada = ponto_do_destino(destino)
+
+    matriz = _montar_matriz(roteaveis, pontos, distancias, chegada)
+    ordem, metodo = ordenar_paradas(matriz)
+    n = len(roteaveis)
+    caminho = [n, *ordem, n + 1]
+
+    paradas = [
+        {"unidade_id": roteaveis[i], "km_trecho": round(matriz[anterior][i], 2)}
+        for anterior, i in zip(caminho, ordem)
+    ]
+    sem_coordenadas = sorted((u for u in ids if u not in distancias), key=lambda u: todas.get(u, {}).get("nome", ""))
+    paradas += [{"unidade_id": u, "km_trecho": None} for u in sem_coordenadas]
+
+    km_total = _custo(matriz, caminho[:-1])
+    return {
+        "paradas": paradas,
+        "km_total": round(km_total, 2),
+        "minutos_estimados": round(km_total / ROTA_VELOCIDADE_KMH * 60),
+        "metodo": metodo,
+    }
+
+
+def _assinatura(unidades_ids, destino: str) -> str:
+    todas = unidades()
+    partes = [destino or "", ROTA_GARAGEM]
+    for u in sorted({str(u) for u in unidades_ids if u}):
+        unidade = todas.get(u, {})
+        partes.append(f"{u}:{unidade.get('latitude')}:{unidade.get('longitude')}")
+    return hashlib.blake2b("|".join(partes).encode(), digest_size=8).hexdigest()
+
+
+def rota_da_viagem(viagem_id, unidades_ids, destino: str) -> dict:
+    """Rota da viagem pelo cache do Redis; recalcula (e guarda) se as paradas mudaram. Sem Redis, só calcula."""
+    chave = CHAVE_ROTA.format(viagem_id)
+    assinatura = _assinatura(unidades_ids, destino)
+    try:
+        guardada = redis_client.get(chave)
+    except RedisError as e:
+        print(f"Rotas: Redis indisponível ({e})")
+        return calcular_rota(unidades_ids, destino)
+    if guardada:
+        rota = json.loads(guardada)
+        if rota.get("assinatura") == assinatura:
+            return rota
+
+    rota = dict(calcular_rota(unidades_ids, destino), assinatura=assinatura)
+    try:
+        redis_client.set(chave, json.dumps(rota), ex=ROTA_CACHE_HORAS * 3600)
+    except RedisError as e:
+        print(f"Rotas: não foi possível guardar a rota da viagem {viagem_id} ({e})")
+    return rota
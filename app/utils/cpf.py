@@ -0,0 +1,15 @@
+import re
+from typing import Optional
+
+_NAO_DIGITOS = re.compile(r"\D")
+
+
+def normalizar_cpf(cpf: Optional[str]) -> Optional[str]:
+    """
+    Forma canônica do CPF de Paciente: só os 11 dígitos ("123.456.789-09" -> "12345678909").
+    Retorna None se não sobrar um CPF com 11 dígitos (ex: "TEMP-1a2b3c4d").
+    """
+    if not cpf:
+        return None
+    digitos = _NAO_DIGITOS.sub("", cpf)
+    return digitos if len(digitos) == 11 else None
@@ -0,0 +1,28 @@
+import calendar
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+from app.core.config import FUSO_HORARIO
+
+
+def hoje() -> date:
+    """Data de hoje no fuso do município (o servidor e o banco rodam em UTC)."""
+    return datetime.now(ZoneInfo(FUSO_HORARIO)).date()
+
+
+def mes_atual() -> date:
+    """Dia 1 do mês corrente."""
+    return hoje().replace(day=1)
+
+
+def inicio_do_dia(dia: date) -> datetime:
+    """Meia-noite local do dia, com fuso: é o limite certo para comparar com colunas timestamptz."""
+    return datetime(dia.year, dia.month, dia.day, tzinfo=ZoneInfo(FUSO_HORARIO))
+
+
+def proximo_mes(mes: date) -> date:
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def dias_no_mes(dia: date) -> int:
+    return calendar.monthrange(dia.year, dia.month)[1]
@@ -0,0 +1,19 @@
+import math
+
+RAIO_TERRA_KM = 6371.0
+
+
+def distancia_km(a: tuple, b: tuple) -> float:
+    """Distância em linha reta (haversine) entre dois pontos (lat, lon) em graus."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(math.sqrt(h))
+
+
+def ler_ponto(texto: str):
+    """"lat,lon" -> (lat, lon); None se vazio ou inválido."""
+    try:
+        lat, lon = (float(parte) for parte in texto.split(","))
+    except (AttributeError, ValueError):
+        return None
+    return (lat, lon) if -90 <= lat <= 90 and -180 <= lon <= 180 else None
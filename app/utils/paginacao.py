@@ -0,0 +1,18 @@
+import base64
+import json
+
+
+def codificar_cursor(valores: list) -> str:
+    """Cursor opaco da paginação por chave: os valores de ordenação do último item da página."""
+    return base64.urlsafe_b64encode(json.dumps(valores, default=str).encode()).decode()
+
+
+def decodificar_cursor(cursor: str, tamanho: int) -> list:
+    """Devolve os valores do cursor. ValueError se o cursor estiver corrompido ou for de outra listagem."""
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise ValueError("Cursor inválido.")
+    if not isinstance(valores, list) or len(valores) != tamanho:
+        raise ValueError("Cursor inválido.")
+    return valores
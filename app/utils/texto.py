@@ -0,0 +1,18 @@
+import re
+import unicodedata
+from typing import Optional
+
+_ESPACOS = re.compile(r"\s+")
+
+
+def normalizar_busca(texto: Optional[str]) -> str:
+    """
+    Forma usada nas buscas por nome: minúsculas, sem acento e com espaços simples
+    ("  JOSÉ  da Conceição" -> "jose da conceicao").
+    """
+    if not texto:
+        return ""
+    sem_acento = "".join(
+        c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c)
+    )
+    return _ESPACOS.sub(" ", sem_acento).strip().lower()
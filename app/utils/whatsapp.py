@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import httpx
+
+from app.core.config import (
+    WHATSAPP_API_URL, WHATSAPP_TOKEN, WHATSAPP_MENSAGENS_POR_SEGUNDO,
+    WHATSAPP_CONEXOES, WHATSAPP_TIMEOUT_SEGUNDOS
+)
+
+
+class LimiteTaxa:
+    """
+    Espaça as chamadas para não passar de N mensagens/segundo no provedor.
+    Um 429 do provedor pausa todo mundo pelo Retry-After.
+    """
+    def __init__(self, por_segundo: float):
+        self.intervalo = 1 / por_segundo
+        self._proxima = 0.0
+        self._lock = asyncio.Lock()
+
+    async def aguardar(self):
+        async with self._lock:
+            agora = time.monotonic()
+            espera = self._proxima - agora
+            self._proxima = max(agora, self._proxima) + self.intervalo
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+    def pausar(self, segundos: float):
+        self._proxima = max(self._proxima, time.monotonic() + segundos)
+
+
+class ClienteWhatsApp:
+    """
+    Cliente HTTP assíncrono do provedor, com pool de conexões reaproveitado entre lotes.
+    API esperada: POST /v1/messages {"to", "text"} + header Idempotency-Key -> {"id"}.
+    """
+    def __init__(self):
+        self.http = httpx.AsyncClient(
+            base_url=WHATSAPP_API_URL,
+            headers={"Authorization": f"Bearer {WHATSAPP_TOKEN}"} if WHATSAPP_TOKEN else {},
+            limits=httpx.Limits(max_connections=WHATSAPP_CONEXOES, max_keepalive_connections=WHATSAPP_CONEXOES),
+            timeout=WHATSAPP_TIMEOUT_SEGUNDOS,
+        )
+        self.limite = LimiteTaxa(WHATSAPP_MENSAGENS_POR_SEGUNDO)
+
+    async def enviar(self, telefone: str, mensagem: str, chave: str) -> dict:
+        """
+        Envia uma mensagem. Retorna {"ok", "id_provedor", "erro", "reenviar"}:
+        reenviar=True para falhas temporárias (rede, 429, 5xx); False para recusa definitiva (4xx).
+        """
+        await self.limite.aguardar()
+        try:
+            resposta = await self.http.post(
+                "/v1/messages",
+                json={"to": telefone, "text": mensagem},
+                headers={"Idempotency-Key": chave},
+            )
+        except httpx.HTTPError as e:
+            return {"ok": False, "erro": f"{type(e).__name__}: {e}"[:200], "reenviar": True}
+
+        if resposta.status_code < 300:
+            return {"ok": True, "id_provedor": _id_provedor(resposta)}
+        if resposta.status_code == 429:
+            self.limite.pausar(_retry_after(resposta))
+        return {
+            "ok": False,
+            "erro": f"HTTP {resposta.status_code}: {resposta.text[:150]}",
+            "reenviar": resposta.status_code == 429 or resposta.status_code >= 500,
+        }
+
+    async def enviar_lote(self, mensagens: list) -> list:
+        """
+        mensagens: [{"telefone", "mensagem", "chave"}]. Resultados na mesma ordem.
+        Um erro inesperado em uma mensagem vira falha temporária só dela: o lote segue e todas
+        recebem resultado (nenhuma fica presa em ENVIANDO).
+        """
+        resultados = await asyncio.gather(*[
+            self.enviar(m["telefone"], m["mensagem"], m["chave"]) for m in mensagens
+        ], return_exceptions=True)
+        return [
+            {"ok": False, "erro": f"{type(r).__name__}: {r}"[:200], "reenviar": True} if isinstance(r, Exception) else r
+            for r in resultados
+        ]
+
+
+def _id_provedor(resposta: httpx.Response):
+    """Id da mensagem no provedor; corpo vazio ou que não é JSON (204, text/plain) não tem id."""
+    try:
+        corpo = resposta.json()
+    except ValueError:
+        return None
+    return corpo.get("id") if isinstance(corpo, dict) else None
+
+
+def _retry_after(resposta: httpx.Response) -> float:
+    """Retry-After em segundos (o provedor também pode mandar uma data HTTP: aí espera 1s)."""
+    try:
+        return float(resposta.headers.get("Retry-After", 1))
+    except ValueError:
+        return 1.0
+
+
+# Um loop e um cliente por processo do worker (criados depois do fork do Celery)
+_loop = None
+_cliente = None
+
+
+def enviar_lote(mensagens: list) -> list:
+    """Ponte síncrona para as tarefas do Celery."""
+    global _loop, _cliente
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+        _cliente = ClienteWhatsApp()
+    return _loop.run_until_complete(_cliente.enviar_lote(mensagens))
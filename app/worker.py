@@ -1,73 +1,579 @@
+from celery.exceptions import SoftTimeLimitExceeded
+from celery.signals import task_postrun
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import func, or_, and_, update
+from sqlalchemy.exc import IntegrityError, OperationalError
 from app.core.celery_app import celery_app
+from app.core.redis_client import redis_client
+from app.core.versoes import marcar_tabelas
 from app.db.session import SessionLocal
-from app.db.base import SolicitacaoTFD, Paciente
-from app.services.ocr_service import OCRService # <--- Importação Corrigida
+from app.db.base import SolicitacaoTFD, Paciente, ReferenciaUpload
+from app.services.ocr_lote import despachar_lotes
+from app.services.armazenamento import get_armazenamento
+from app.services.ocr_admissao import baixar_documentos, registrar_tempos, reconciliar_backlog, tempo_medio_documento
+from app.services.cotas import reconciliar_cotas
+from app.utils.datas import hoje, mes_atual
+from app.services.notificacoes import reivindicar_lote, registrar_resultados
+from app.services.eventos import definir_ator, registrar_eventos, mover_lote
+from app.services.exportacao import executar_exportacao, limpar_exportacoes
+from app.services.bi import atualizar_bi
+from app.services.particoes import garantir_particoes, arquivar_particoes
+from app.core.config import (
+    OCR_MAX_TENTATIVAS_DOCUMENTO, OCR_REENFILEIRAR_APOS_MINUTOS, OCR_LOTE_MAX_DOCUMENTOS, CELERY_VISIBILITY_TIMEOUT, OCR_PROCESSOS, UPLOAD_GC_CARENCIA_MINUTOS, NOTIFICACOES_LOTE, EXPORTACAO_RETENCAO_HORAS, BI_RECONCILIAR_DIAS, EVENTOS_LOTE
+)
+from app.core.metricas import cronometro, medir_etapas, log_estruturado, enviar_metricas
+from app.utils.cpf import normalizar_cpf
+from app.utils.texto import normalizar_busca
+from datetime import datetime, timedelta, timezone
 import os
+import time
 
-@celery_app.task(name="processar_documento_task")
+# Tentativas de OCR por documento: sobe antes de ler e é apagada quando a leitura termina.
+# Só fica alta a de um documento que derrubou o processo (OOM/limite hard) e voltou pela fila
+CHAVE_TENTATIVAS = "ocr:tentativas:{}"
+# Status de quem ainda espera o OCR (ocupa vaga no controle de admissão)
+STATUS_FILA_OCR = ["Na_Fila_Processamento", "Processando_IA"]
+
+# Falhas transitórias (banco/redis fora do ar): tenta de novo com espera exponencial + jitter
+RETRY_TRANSITORIO = dict(
+    autoretry_for=(OperationalError, RedisConnectionError),
+    retry_backoff=True,
+    retry_backoff_max=300,
+    retry_jitter=True,
+    max_retries=5,
+)
+
+@task_postrun.connect
+def _enviar_metricas_do_worker(**kwargs):
+    """Tempos das etapas vão para o Redis ao fim de cada tarefa (o GET /metrics da API expõe)."""
+    enviar_metricas(forcar=True)
+
+@celery_app.task(name="processar_documento_task", **RETRY_TRANSITORIO)
 def processar_documento_task(solicitacao_id: str, file_path: str):
     """
-    Worker que roda em background.
-    Agora usa a classe OCRService robusta.
+    Worker que roda em background (um documento por tarefa).
+    Mantida para mensagens antigas ainda na fila; usa o mesmo fluxo do lote.
     """
-    db = SessionLocal()
-    solicitacao = db.query(SolicitacaoTFD).filter(SolicitacaoTFD.id == solicitacao_id).first()
-    
-    if not solicitacao:
-        return "Solicitação não encontrada"
+    return processar_lote_task([{"solicitacao_id": solicitacao_id, "file_path": file_path}])[0]
+
+@celery_app.task(name="despachar_lote_ocr_task", **RETRY_TRANSITORIO)
+def despachar_lote_ocr_task():
+    """Disparada pelo timer do buffer de lote (ver app/services/ocr_lote.py)."""
+    return f"{despachar_lotes()} lote(s) despachado(s)."
 
+@celery_app.task(name="processar_lote_task", **RETRY_TRANSITORIO)
+def processar_lote_task(itens: list):
+    """
+    Processa N documentos enfileirados com UMA sessão e o motor de OCR já aquecido no processo.
+    - Carrega todas as Solicitações e Pacientes com consultas IN.
+    - Grava todos os resultados em lote com um único commit.
+    itens: [{"solicitacao_id": "...", "blob_sha256": "...", "nome_arquivo": "laudo.pdf"}, ...]
+           (mensagens antigas ainda trazem "file_path")
+    """
+    inicio = time.perf_counter()
+    with medir_etapas() as etapas:
+        mensagens = _processar_lote(itens)
+    # Onde o tempo do lote foi parar (rasterizar, tesseract, extracao, banco)
+    log_estruturado(
+        "lote_ocr",
+        documentos=len(itens),
+        duracao_ms=round((time.perf_counter() - inicio) * 1000, 1),
+        etapas_ms={etapa: round(segundos * 1000, 1) for etapa, segundos in etapas.items()},
+    )
+    return mensagens
+
+def _processar_lote(itens: list):
+    db = SessionLocal()
+    definir_ator(db, perfil="SISTEMA")
     try:
-        # 1. Atualiza status para Processando
-        solicitacao.status_pedido = "Processando_IA"
-        db.commit()
+        ids = [item["solicitacao_id"] for item in itens]
+        with cronometro("banco"):
+            # 1. Reivindica o lote: Na_Fila_Processamento -> Processando_IA em um único UPDATE atômico.
+            # Só volta quem este worker tirou da fila: um documento reenviado pela reconciliação
+            # que outro worker já pegou (ou já leu) fica de fora e não é lido nem baixado duas vezes.
+            # Só as colunas usadas (tuplas não expiram no commit -> nenhuma consulta extra por documento).
+            # criado_em faz parte da chave (partição do mês): o bulk update por chave precisa dele.
+            solicitacoes = {
+                str(s.id): s for s in db.execute(
+                    update(SolicitacaoTFD)
+                    .where(SolicitacaoTFD.id.in_(ids), SolicitacaoTFD.status_pedido == "Na_Fila_Processamento")
+                    .values(status_pedido="Processando_IA")
+                    .returning(
+                        SolicitacaoTFD.id, SolicitacaoTFD.criado_em,
+                        SolicitacaoTFD.paciente_id, SolicitacaoTFD.unidade_solicitante_id,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            }
+            if not solicitacoes:
+                db.rollback()
+                return ["Solicitação não encontrada ou já processada"] * len(itens)
+            registrar_eventos(db, [
+                (s.id, "status_pedido", "Na_Fila_Processamento", "Processando_IA") for s in solicitacoes.values()
+            ])
+            db.commit()
+
+            pacientes = {
+                p.id: p for p in db.query(Paciente.id, Paciente.cpf).filter(
+                    Paciente.id.in_([s.paciente_id for s in solicitacoes.values()])
+                )
+            }
 
-        # 2. Ler o arquivo do disco para passar para o Serviço
-        if not os.path.exists(file_path):
+        # 2. OCR de cada documento (sem tocar no banco)
+        # Cada documento vira um "plano" de gravação: {"sol", "pac", "remover_paciente", "concluido"}
+        planos, mensagens = [], []
+        restantes, arquivos_antigos = [], []
+        unidades_baixadas, duracoes = [], []
+        for indice, item in enumerate(itens):
+            solicitacao = solicitacoes.get(item["solicitacao_id"])
+            if not solicitacao:
+                mensagens.append("Solicitação não encontrada ou já processada")
+                continue
+            tentativas = CHAVE_TENTATIVAS.format(item["solicitacao_id"])
+            if _contar_tentativa(tentativas) > OCR_MAX_TENTATIVAS_DOCUMENTO:
+                # Mensagem venenosa: com ack tardio voltaria para a fila para sempre
+                planos.append(_plano_erro(solicitacao, "Falha na leitura: o documento derrubou o processo de OCR"))
+                mensagens.append("Erro fatal: tentativas de OCR esgotadas")
+                unidades_baixadas.append(solicitacao.unidade_solicitante_id)
+                redis_client.delete(tentativas)
+                continue
+            inicio = time.perf_counter()
+            try:
+                plano, msg = _executar_ocr(solicitacao, solicitacao.paciente_id in pacientes, item)
+            except SoftTimeLimitExceeded:
+                # Estourou o tempo do lote: grava o que já foi lido e devolve o resto para a fila.
+                # Se nem o primeiro documento coube no tempo, ele é o problema: vira Erro_OCR.
+                if not planos:
+                    redis_client.delete(tentativas)
+                    planos.append(_plano_erro(solicitacao, "Falha na leitura: tempo limite de processamento excedido"))
+                    mensagens.append("Erro fatal: tempo limite excedido")
+                    unidades_baixadas.append(solicitacao.unidade_solicitante_id)
+                    restantes = itens[indice + 1:]
+                else:
+                    restantes = itens[indice:]
+                # Só volta para a fila quem este lote reivindicou
+                restantes = [i for i in restantes if i["solicitacao_id"] in solicitacoes]
+                break
+            redis_client.delete(tentativas)
+            duracoes.append(time.perf_counter() - inicio)
+            unidades_baixadas.append(solicitacao.unidade_solicitante_id)
+            planos.append(plano)
+            if plano["concluido"] and item.get("file_path"):
+                arquivos_antigos.append(item["file_path"])
+            mensagens.append(msg)
+
+        with cronometro("banco"):
+            # 3. Identidade: CPF lido pelo OCR aponta para o paciente definitivo (uma consulta IN)
+            _resolver_identidades(db, planos, pacientes)
+
+            # 4. Grava tudo de uma vez (e solta a referência ao arquivo de quem terminou:
+            #    o coletor de órfãos apaga o blob quando ninguém mais usar)
+            try:
+                _aplicar_planos(db, planos)
+                db.commit()
+            except IntegrityError:
+                # Um único conflito (ex: CPF gravado por outro lote ao mesmo tempo) não pode
+                # derrubar o lote inteiro: grava documento a documento
+                db.rollback()
+                _gravar_individualmente(db, planos)
+
+        # Fila do OCR (controle de admissão e previsão de conclusão da API)
+        baixar_documentos(unidades_baixadas)
+        registrar_tempos(duracoes)
+
+        if restantes:
+            # Devolve a reivindicação antes de reenviar: o próximo lote só pega quem está na fila
+            devolvidos = [solicitacoes[i["solicitacao_id"]].id for i in restantes]
+            db.query(SolicitacaoTFD).filter(
+                SolicitacaoTFD.id.in_(devolvidos), SolicitacaoTFD.status_pedido == "Processando_IA"
+            ).update({SolicitacaoTFD.status_pedido: "Na_Fila_Processamento"}, synchronize_session=False)
+            registrar_eventos(db, [(i, "status_pedido", "Processando_IA", "Na_Fila_Processamento") for i in devolvidos])
+            db.commit()
+            celery_app.send_task("processar_lote_task", args=[restantes])
+            mensagens.append(f"{len(restantes)} documento(s) reenfileirado(s) por tempo limite")
+
+        # Limpeza do formato antigo (arquivo solto em uploads/)
+        for file_path in arquivos_antigos:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+
+        return mensagens
+    finally:
+        db.close()
+
+def _contar_tentativa(chave: str) -> int:
+    pipe = redis_client.pipeline()
+    pipe.incr(chave)
+    pipe.expire(chave, 86400)
+    return pipe.execute()[0]
+
+def _ler_documento(item: dict):
+    """Devolve (bytes, nome do arquivo) do documento, venha do armazenamento de blobs ou do formato antigo."""
+    if item.get("blob_sha256"):
+        armazenamento = get_armazenamento()
+        if not armazenamento.existe(item["blob_sha256"]):
             raise FileNotFoundError("Arquivo temporário sumiu antes do processamento.")
+        return armazenamento.ler(item["blob_sha256"]), item["nome_arquivo"]
 
-        with open(file_path, "rb") as f:
-            file_bytes = f.read()
+    file_path = item["file_path"]
+    if not os.path.exists(file_path):
+        raise FileNotFoundError("Arquivo temporário sumiu antes do processamento.")
+    with open(file_path, "rb") as f:
+        return f.read(), os.path.basename(file_path)
 
-        # 3. CHAMA O NOVO SERVIÇO ENTERPRISE
-        # Extrai o nome do arquivo para saber se é PDF ou JPG
-        filename = os.path.basename(file_path)
-        
-        # A mágica acontece aqui:
+def _plano_erro(solicitacao, motivo: str) -> dict:
+    return {
+        "sol": {"id": solicitacao.id, "criado_em": solicitacao.criado_em,
+                "status_pedido": "Erro_OCR", "procedimento": motivo[:120]},
+        "pac": None,
+        "remover_paciente": None,
+        "concluido": False,
+    }
+
+def _executar_ocr(solicitacao, paciente_existe: bool, item: dict):
+    """Roda o OCR de um documento e devolve o plano de gravação + mensagem."""
+    try:
+        # O nome do arquivo diz se é PDF ou JPG
+        file_bytes, filename = _ler_documento(item)
+        # Tesseract/PIL/pdf2image só nos processos que fazem OCR (os das outras filas não carregam);
+        # no worker de OCR o import acontece uma vez, na primeira tarefa de cada processo
+        from app.services.ocr_service import OCRService
         resultado = OCRService.extrair_dados_sus(file_bytes, filename)
-        
-        # 4. Atualiza o Banco com o Resultado
+
         # Mapeia os dados retornados pelo serviço para o banco
+        # Libera para o Gestor
+        dados_sol = {"id": solicitacao.id, "criado_em": solicitacao.criado_em, "status_pedido": "Aguardando_Analise"}
         if resultado.get("prioridade"):
-            solicitacao.nivel_prioridade = resultado["prioridade"]
-        
+            dados_sol["nivel_prioridade"] = resultado["prioridade"]
         if resultado.get("procedimento"):
-            solicitacao.procedimento = resultado["procedimento"]
-            
-        solicitacao.status_pedido = "Aguardando_Analise" # Libera para o Gestor
+            dados_sol["procedimento"] = resultado["procedimento"]
 
         # Atualiza dados do Paciente se a IA achou algo melhor
-        paciente = db.query(Paciente).filter(Paciente.id == solicitacao.paciente_id).first()
-        if paciente:
+        # (o CPF é tratado depois, na resolução de identidade)
+        dados_pac = None
+        if paciente_existe:
+            dados_pac = {"id": solicitacao.paciente_id}
             if resultado.get("nome") and resultado["nome"] != "Validar no Dashboard":
-                paciente.nome = resultado["nome"]
-            if resultado.get("cpf"):
-                paciente.cpf = resultado["cpf"]
+                dados_pac["nome"] = resultado["nome"]
+                dados_pac["nome_busca"] = normalizar_busca(resultado["nome"]) # bulk update não passa pelo @validates
             if resultado.get("telefone"):
-                paciente.telefone = resultado["telefone"]
+                dados_pac["telefone"] = resultado["telefone"]
 
-        db.commit()
-        
-        # Limpeza: Remove o arquivo temporário para não encher o disco
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            
-        return f"Sucesso: {resultado['tipo_doc']} processado."
+        plano = {
+            "sol": dados_sol,
+            "pac": dados_pac,
+            "cpf": normalizar_cpf(resultado.get("cpf")),
+            "paciente_atual": solicitacao.paciente_id,
+            "remover_paciente": None,
+            "concluido": True,
+        }
+        return plano, f"Sucesso: {resultado['tipo_doc']} processado."
 
+    except SoftTimeLimitExceeded:
+        raise
     except Exception as e:
         print(f"Erro no Worker: {e}")
-        solicitacao.status_pedido = "Erro_OCR"
-        solicitacao.procedimento = f"Falha na leitura: {str(e)[:100]}"
+        return _plano_erro(solicitacao, f"Falha na leitura: {str(e)[:100]}"), f"Erro fatal: {str(e)}"
+
+def _resolver_identidades(db, planos: list, pacientes: dict):
+    """
+    Resolve o paciente de cada documento pelo CPF (normalizado, buscado pelo índice único):
+    - CPF já cadastrado: a solicitação passa para o paciente existente e o provisório (TEMP-) é apagado.
+    - CPF novo: o paciente provisório é "reciclado" e vira o definitivo.
+    Documentos do mesmo lote com o mesmo CPF novo caem no mesmo paciente.
+    Tudo entra na mesma transação da gravação do lote.
+    """
+    cpfs = {p["cpf"] for p in planos if p.get("cpf")}
+    if not cpfs:
+        return
+
+    existentes = {
+        p.cpf: p for p in db.query(Paciente.id, Paciente.cpf, Paciente.telefone).filter(Paciente.cpf.in_(cpfs))
+    }
+    ids_por_cpf = {cpf: p.id for cpf, p in existentes.items()}
+    provisorios = {p.id for p in pacientes.values() if p.cpf.startswith("TEMP-")}
+
+    for plano in planos:
+        cpf = plano.pop("cpf", None)
+        paciente_atual = plano.pop("paciente_atual", None)
+        if not cpf:
+            continue
+        definitivo = ids_por_cpf.get(cpf)
+
+        if definitivo is None:
+            # CPF novo: o provisório vira o cadastro definitivo (nunca troca o CPF de um paciente real)
+            if paciente_atual in provisorios:
+                plano["pac"] = dict(plano["pac"] or {"id": paciente_atual}, cpf=cpf)
+                ids_por_cpf[cpf] = paciente_atual
+            continue
+
+        if definitivo == paciente_atual:
+            continue
+
+        # Paciente já existe: move a solicitação e descarta o provisório
+        plano["sol"]["paciente_id"] = definitivo
+        if paciente_atual in provisorios:
+            plano["remover_paciente"] = paciente_atual
+        # Do OCR só aproveita o telefone, e apenas se o cadastro não tiver um
+        telefone = (plano["pac"] or {}).get("telefone")
+        existente = existentes.get(cpf)
+        if telefone and existente is not None and not existente.telefone:
+            plano["pac"] = {"id": definitivo, "telefone": telefone}
+        else:
+            plano["pac"] = None
+
+def _aplicar_planos(db, planos: list):
+    db.bulk_update_mappings(SolicitacaoTFD, [p["sol"] for p in planos])
+    # bulk_update_mappings não passa pelo flush: o histórico e a versão das tabelas (ETag) vão junto
+    registrar_eventos(db, [
+        (p["sol"]["id"], "status_pedido", "Processando_IA", p["sol"]["status_pedido"]) for p in planos
+    ])
+    db.bulk_update_mappings(Paciente, [p["pac"] for p in planos if p["pac"]])
+    marcar_tabelas(db, "solicitacoes_tfd", "pacientes")
+    remover = [p["remover_paciente"] for p in planos if p["remover_paciente"]]
+    if remover:
+        db.query(Paciente).filter(Paciente.id.in_(remover)).delete(synchronize_session=False)
+    concluidos = [p["sol"]["id"] for p in planos if p["concluido"]]
+    if concluidos:
+        db.query(ReferenciaUpload).filter(ReferenciaUpload.solicitacao_id.in_(concluidos)).delete(synchronize_session=False)
+
+def _gravar_individualmente(db, planos: list):
+    """Fallback do lote: commit por documento; quem falhar vira Erro_OCR sem afetar os outros."""
+    for plano in planos:
+        try:
+            _aplicar_planos(db, [plano])
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            print(f"Erro no Worker: {e}")
+            db.bulk_update_mappings(SolicitacaoTFD, [{
+                "id": plano["sol"]["id"],
+                "criado_em": plano["sol"]["criado_em"],
+                "status_pedido": "Erro_OCR",
+                "procedimento": f"Falha na gravação: {str(e.orig)[:100]}",
+            }])
+            marcar_tabelas(db, "solicitacoes_tfd")
+            registrar_eventos(db, [(plano["sol"]["id"], "status_pedido", "Processando_IA", "Erro_OCR")])
+            db.commit()
+
+@celery_app.task(name="coletar_uploads_orfaos_task", **RETRY_TRANSITORIO)
+def coletar_uploads_orfaos_task():
+    """
+    Coletor periódico (Celery Beat) do armazenamento de uploads:
+    1. Apaga referências expiradas (documentos que falharam e ninguém reprocessou).
+    2. Apaga blobs sem nenhuma referência, respeitando a carência de uploads em andamento.
+    3. Apaga os arquivos de exportação (CSV/XLSX) que passaram do prazo de download.
+    """
+    agora = datetime.now(timezone.utc)
+    limite_carencia = agora - timedelta(minutes=UPLOAD_GC_CARENCIA_MINUTOS)
+    armazenamento = get_armazenamento()
+
+    db = SessionLocal()
+    try:
+        expiradas = db.query(ReferenciaUpload).filter(ReferenciaUpload.expira_em < agora).delete(synchronize_session=False)
         db.commit()
-        return f"Erro fatal: {str(e)}"
+        referenciados = {sha for (sha,) in db.query(ReferenciaUpload.blob_sha256).distinct()}
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+    removidos = 0
+    for sha256, gravado_em in armazenamento.listar():
+        if sha256 not in referenciados and gravado_em < limite_carencia:
+            armazenamento.remover(sha256)
+            removidos += 1
+    temporarios = armazenamento.limpar_temporarios(limite_carencia)
+    exportacoes = limpar_exportacoes(agora - timedelta(hours=EXPORTACAO_RETENCAO_HORAS))
+
+    return (f"{expiradas} referência(s) expirada(s), {removidos} blob(s), {temporarios} temporário(s) "
+            f"e {exportacoes} exportação(ões) removidos.")
+
+@celery_app.task(name="reconciliar_backlog_ocr_task", **RETRY_TRANSITORIO)
+def reconciliar_backlog_ocr_task():
+    """
+    Recalcula pelo banco os contadores de documentos aguardando OCR (por UBS).
+    Antes, despacha o que sobrou no buffer de lote e reenfileira os documentos parados na fila
+    (envio ao broker que falhou, worker que morreu no meio do lote): sem isso eles ocupariam
+    as vagas da UBS para sempre.
+    """
+    despachar_lotes()
+    db = SessionLocal()
+    try:
+        contagem = _contar_backlog(db)
+        reenfileirados, com_erro = _reenfileirar_parados(db, sum(contagem.values()))
+        if com_erro:
+            contagem = _contar_backlog(db)
+    finally:
+        db.close()
+    reconciliar_backlog(contagem)
+    return (f"Backlog do OCR: {sum(contagem.values())} documento(s) em {len(contagem)} unidade(s); "
+            f"{reenfileirados} reenfileirado(s), {com_erro} sem arquivo (Erro_OCR).")
+
+def _contar_backlog(db) -> dict:
+    return dict(
+        db.query(SolicitacaoTFD.unidade_solicitante_id, func.count(SolicitacaoTFD.id))
+        .filter(SolicitacaoTFD.status_pedido.in_(STATUS_FILA_OCR))
+        .group_by(SolicitacaoTFD.unidade_solicitante_id)
+        .all()
+    )
+
+def _reenfileirar_parados(db, backlog: int):
+    """
+    Documentos que não andam, contados desde que entraram na fila (atualizado_em):
+    - Na_Fila_Processamento há mais que OCR_REENFILEIRAR_APOS_MINUTOS somados ao tempo previsto para
+      esvaziar o backlog atual (o envio ao broker falhou; espera legítima na fila não entra);
+    - Processando_IA há mais que o visibility timeout (o worker morreu com o lote reivindicado).
+    Com o arquivo ainda referenciado: volta para Na_Fila_Processamento (o relógio recomeça, então não é
+    reenviado de novo antes de outra janela) e para o worker. Sem o arquivo (referência expirada): Erro_OCR.
+    Se o reenvio cruzar com a mensagem original, só um worker consegue reivindicar o documento.
+    """
+    agora = datetime.now(timezone.utc)
+    esvaziar_backlog = backlog * tempo_medio_documento() / max(1, OCR_PROCESSOS)
+    parado = or_(
+        and_(
+            SolicitacaoTFD.status_pedido == "Na_Fila_Processamento",
+            SolicitacaoTFD.atualizado_em < agora - timedelta(minutes=OCR_REENFILEIRAR_APOS_MINUTOS, seconds=esvaziar_backlog),
+        ),
+        and_(
+            SolicitacaoTFD.status_pedido == "Processando_IA",
+            SolicitacaoTFD.atualizado_em < agora - timedelta(seconds=CELERY_VISIBILITY_TIMEOUT),
+        ),
+    )
+    parados = {}
+    for s in (
+        db.query(
+            SolicitacaoTFD.id, SolicitacaoTFD.criado_em, SolicitacaoTFD.status_pedido,
+            ReferenciaUpload.blob_sha256, ReferenciaUpload.nome_arquivo,
+        )
+        .outerjoin(ReferenciaUpload, ReferenciaUpload.solicitacao_id == SolicitacaoTFD.id)
+        .filter(parado)
+    ):
+        parados.setdefault(s.id, s)
+
+    com_arquivo = {s.id: s for s in parados.values() if s.blob_sha256 is not None}
+    sem_arquivo = [s for s in parados.values() if s.blob_sha256 is None]
+
+    if sem_arquivo:
+        db.bulk_update_mappings(SolicitacaoTFD, [{
+            "id": s.id, "criado_em": s.criado_em, "status_pedido": "Erro_OCR",
+            "procedimento": "Falha na leitura: documento não chegou ao OCR",
+        } for s in sem_arquivo])
+        marcar_tabelas(db, "solicitacoes_tfd")
+        registrar_eventos(db, [(s.id, "status_pedido", s.status_pedido, "Erro_OCR") for s in sem_arquivo])
+    itens = []
+    if com_arquivo:
+        # Mesmo filtro no UPDATE: quem um worker reivindicou depois da leitura acima fica de fora
+        devolvidos = db.execute(
+            update(SolicitacaoTFD)
+            .where(SolicitacaoTFD.id.in_(list(com_arquivo)), parado)
+            .values(status_pedido="Na_Fila_Processamento")
+            .returning(SolicitacaoTFD.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        registrar_eventos(db, [
+            (i, "status_pedido", com_arquivo[i].status_pedido, "Na_Fila_Processamento") for i in devolvidos
+        ])
+        itens = [{
+            "solicitacao_id": str(i), "blob_sha256": com_arquivo[i].blob_sha256,
+            "nome_arquivo": com_arquivo[i].nome_arquivo,
+        } for i in devolvidos]
+    db.commit()
+    for inicio in range(0, len(itens), OCR_LOTE_MAX_DOCUMENTOS):
+        celery_app.send_task("processar_lote_task", args=[itens[inicio:inicio + OCR_LOTE_MAX_DOCUMENTOS]])
+    return len(itens), len(sem_arquivo)
+
+@celery_app.task(name="reconciliar_cotas_task", **RETRY_TRANSITORIO)
+def reconciliar_cotas_task():
+    """
+    Reconciliação noturna (Celery Beat) dos contadores de cota mensal das UBS.
+    No dia 1 também fecha o mês anterior.
+    """
+    meses = [mes_atual()]
+    if meses[0] == hoje():
+        meses.append((meses[0] - timedelta(days=1)).replace(day=1))
+
+    db = SessionLocal()
+    try:
+        for mes in meses:
+            reconciliar_cotas(db, mes)
+    finally:
+        db.close()
+    return f"Cotas reconciliadas: {', '.join(m.strftime('%Y-%m') for m in meses)}."
+
+@celery_app.task(name="despachar_notificacoes_task", **RETRY_TRANSITORIO)
+def despachar_notificacoes_task():
+    """
+    Esvazia a outbox de notificações em lotes de NOTIFICACOES_LOTE:
+    envio assíncrono (pool de conexões + limite de taxa do provedor), resultado gravado em lote.
+    Lote cheio = ainda tem mais: encadeia o próximo.
+    """
+    db = SessionLocal()
+    try:
+        itens = reivindicar_lote(db, NOTIFICACOES_LOTE)
+        if not itens:
+            return "Nenhuma notificação pendente."
+        from app.utils.whatsapp import enviar_lote # httpx só no worker de notificações
+        resultados = enviar_lote(itens)
+        contagem = registrar_resultados(db, itens, resultados)
+    finally:
+        db.close()
+
+    if len(itens) == NOTIFICACOES_LOTE:
+        celery_app.send_task("despachar_notificacoes_task")
+    return f"{contagem['enviadas']} enviada(s), {contagem['reenviar']} para reenviar, {contagem['falhas']} falha(s)."
+
+@celery_app.task(name="despachar_eventos_task", **RETRY_TRANSITORIO)
+def despachar_eventos_task():
+    """
+    Move os eventos de status da outbox para o histórico (eventos_solicitacao) em lotes de EVENTOS_LOTE.
+    Lote cheio = ainda tem mais: encadeia o próximo.
+    """
+    db = SessionLocal()
+    try:
+        movidos = mover_lote(db, EVENTOS_LOTE)
+    finally:
+        db.close()
+
+    if movidos == EVENTOS_LOTE:
+        celery_app.send_task("despachar_eventos_task")
+    return f"{movidos} evento(s) gravado(s) no histórico."
+
+@celery_app.task(name="gerar_exportacao_task", **RETRY_TRANSITORIO)
+def gerar_exportacao_task(exportacao_id: str, tipo: str, formato: str, filtros: dict):
+    """Exportação agendada pelo painel (POST /relatorios/exportar/{tipo}/agendar): grava o arquivo para download."""
+    linhas = executar_exportacao(exportacao_id, tipo, formato, filtros)
+    return f"Exportação {exportacao_id}: {linhas} linha(s) de {tipo} em {formato}."
+
+@celery_app.task(name="atualizar_bi_task", **RETRY_TRANSITORIO)
+def atualizar_bi_task():
+    """Atualização incremental (Celery Beat) das tabelas de resumo do BI: só os dias que mudaram desde a última."""
+    db = SessionLocal()
+    try:
+        resultado = atualizar_bi(db)
+    finally:
+        db.close()
+    return (f"BI ({resultado['modo']}): {resultado['dias_encaminhamentos']} dia(s) de encaminhamentos, "
+            f"{resultado['dias_viagens']} dia(s) de viagens.")
+
+@celery_app.task(name="reconciliar_bi_task", **RETRY_TRANSITORIO)
+def reconciliar_bi_task():
+    """Reconciliação noturna do BI: recalcula os últimos BI_RECONCILIAR_DIAS dias (inclusive exclusões)."""
+    db = SessionLocal()
+    try:
+        resultado = atualizar_bi(db, reconciliar_dias=BI_RECONCILIAR_DIAS)
+    finally:
+        db.close()
+    return (f"BI ({resultado['modo']}): {resultado['dias_encaminhamentos']} dia(s) de encaminhamentos, "
+            f"{resultado['dias_viagens']} dia(s) de viagens.")
+
+@celery_app.task(name="manter_particoes_task", **RETRY_TRANSITORIO)
+def manter_particoes_task():
+    """
+    Manutenção diária de solicitacoes_tfd: cria as partições dos próximos meses e arquiva
+    (CSV gzip em ARQUIVO_DIR) os meses fechados há mais de ARQUIVO_RETENCAO_MESES.
+    """
+    criadas = garantir_particoes()
+    arquivados = arquivar_particoes()
+    for mes in arquivados:
+        log_estruturado("particao_arquivada", **mes)
+    return (f"Partições criadas: {', '.join(p['mes'] for p in criadas) or 'nenhuma'}; "
+            f"arquivadas: {', '.join(a['mes'] for a in arquivados) or 'nenhuma'}.")
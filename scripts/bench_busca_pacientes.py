@@ -0,0 +1,123 @@
+"""
+Benchmark da busca de pacientes da recepção (/api/v1/pacientes/busca).
+
+Semeia pacientes sintéticos (telefone "BENCH-BUSCA", removidos com --limpar), roda consultas
+típicas do autocomplete (sobrenome comum, trecho raro, dois trechos, prefixo de CPF, página 2)
+e mostra p50/p95 de cada uma. Meta: p95 < 50ms com 500 mil pacientes.
+
+Rodar num banco de desenvolvimento, depois de scripts/migrar_busca_pacientes.py. Uso:
+    python -m scripts.bench_busca_pacientes --semear 500000
+    python -m scripts.bench_busca_pacientes [--repeticoes 50]
+    python -m scripts.bench_busca_pacientes --limpar
+"""
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.api.endpoints.pacientes import buscar_pacientes
+from app.db.session import SessionLocal
+from app.db.base import Paciente
+from app.utils.texto import normalizar_busca
+
+MARCADOR = "BENCH-BUSCA"
+META_P95_MS = 50
+
+PRIMEIROS = ["José", "Maria", "João", "Ana", "Antônio", "Francisca", "Luís", "Conceição",
+             "Sebastião", "Josefa", "Raimundo", "Lúcia", "Cícero", "Severina", "Inês", "Gabriel"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Conceição", "Araújo", "Lima", "Ferreira",
+              "Cavalcanti", "Albuquerque", "Brandão", "Tenório", "Wanderley", "Galvão", "Nóbrega"]
+
+CONSULTAS = {
+    "sobrenome_comum": {"q": "silva"},
+    "trecho_com_acento": {"q": "CONCEIÇ"},
+    "dois_trechos": {"q": "maria galv"},
+    "trecho_raro": {"q": "wanderley nobre"},
+    "prefixo_cpf": {"q": "900.001"},
+}
+
+
+def semear(quantidade: int, bloco: int = 10000):
+    db = SessionLocal()
+    try:
+        for inicio in range(0, quantidade, bloco):
+            linhas = []
+            for i in range(inicio, min(inicio + bloco, quantidade)):
+                nome = f"{random.choice(PRIMEIROS)} {random.choice(SOBRENOMES)} {random.choice(SOBRENOMES)}"
+                linhas.append({
+                    "id": uuid.uuid4(),
+                    "cpf": f"9{i:010d}",
+                    "nome": nome,
+                    "nome_busca": normalizar_busca(nome), # insert em lote não passa pelo @validates
+                    "telefone": MARCADOR,
+                })
+            db.bulk_insert_mappings(Paciente, linhas)
+            db.commit()
+            print(f"  {min(inicio + bloco, quantidade)} pacientes semeados...")
+        db.execute(text("ANALYZE pacientes"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def limpar():
+    db = SessionLocal()
+    try:
+        removidos = db.query(Paciente).filter(Paciente.telefone == MARCADOR).delete(synchronize_session=False)
+        db.commit()
+        print(f"{removidos} pacientes sintéticos removidos.")
+    finally:
+        db.close()
+
+
+def medir(repeticoes: int) -> bool:
+    db = SessionLocal()
+    ok = True
+    try:
+        total = db.query(Paciente).count()
+        print(f"{total} pacientes na tabela\n")
+        print(f"{'consulta':<28}{'itens':>6}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+
+        for nome, params in CONSULTAS.items():
+            for pagina in (1, 2):
+                cursor = None
+                if pagina == 2:
+                    cursor = buscar_pacientes(limite=20, cursor=None, db=db, **params)["proximo_cursor"]
+                    if not cursor:
+                        continue
+                tempos = []
+                for _ in range(repeticoes):
+                    inicio = time.perf_counter()
+                    resposta = buscar_pacientes(limite=20, cursor=cursor, db=db, **params)
+                    tempos.append((time.perf_counter() - inicio) * 1000)
+                p95 = statistics.quantiles(tempos, n=20)[-1]
+                ok = ok and p95 < META_P95_MS
+                rotulo = nome if pagina == 1 else f"{nome} (pág. 2)"
+                print(f"{rotulo:<28}{len(resposta['itens']):>6}{statistics.median(tempos):>10.2f}{p95:>10.2f}")
+    finally:
+        db.close()
+
+    print(f"\nMeta p95 < {META_P95_MS}ms: {'OK' if ok else 'NÃO ATINGIDA'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--semear", type=int, default=0, help="Quantidade de pacientes sintéticos a criar antes de medir")
+    parser.add_argument("--limpar", action="store_true", help="Remove os pacientes sintéticos e sai")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.limpar:
+        limpar()
+        return
+    if args.semear:
+        semear(args.semear)
+    raise SystemExit(0 if medir(args.repeticoes) else 1)
+
+
+if __name__ == "__main__":
+    main()
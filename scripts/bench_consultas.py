@@ -0,0 +1,135 @@
+"""
+Benchmark das consultas quentes em vários tamanhos de base (tabela de escala).
+
+Para cada tamanho (fração dos totais pedidos) completa a base sintética com
+scripts/dados_sinteticos.py e cronometra as rotas chamando as funções dos endpoints de verdade:
+- tfd.listar_candidatos_viagem (fila de candidatos de uma viagem da próxima semana);
+- medico.get_dashboard_stats (contagens da maior UBS);
+- tfd.buscar_viagens (mural: por destino e por destino + dia);
+- frota.minhas_viagens_hoje (viagens de um motorista);
+- frota.ocupacao_viagens (visão geral das viagens do mês da viagem acima, numa consulta agrupada);
+- bi.encaminhamentos / bi.ocupacao (painel da Secretaria, 12 meses; resumos atualizados depois de cada carga).
+No final imprime a mediana de cada consulta em cada tamanho e o expoente de crescimento
+(tempo ~ solicitações^k): k ~ 0 não depende do tamanho (índice), k ~ 1 cresce junto com a base,
+k > 1.2 ESCALA MAL (o plano degradou).
+
+Uso (na raiz do projeto, num banco de desenvolvimento):
+    python -m scripts.bench_consultas [--pacientes 500000] [--solicitacoes 3000000] [--anos 3]
+                                      [--tamanhos 0.1 0.25 0.5 1] [--repeticoes 7]
+    python -m scripts.dados_sinteticos --limpar
+"""
+import argparse
+import asyncio
+import math
+import statistics
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+from starlette.requests import Request
+
+from app.api.endpoints import tfd, medico, frota, bi
+from app.db.session import SessionLocal
+from app.services.bi import atualizar_bi
+from scripts.dados_sinteticos import PADROES, semear, uuid_sintetico, nome_usuario, data_da_viagem, total_viagens
+
+
+def consultas(semente: int) -> dict:
+    """nome -> função(db) que devolve a corrotina do endpoint com parâmetros fixos."""
+    # Uma viagem de daqui a ~7 dias (índice 0 é a mais distante no futuro)
+    indice_viagem = (PADROES["dias_futuros"] - 7) * PADROES["viagens_por_dia"]
+    viagem = str(uuid_sintetico(semente, "viagem", indice_viagem))
+    dia = data_da_viagem(indice_viagem, PADROES).strftime("%Y-%m-%d")
+    maior_ubs = str(uuid_sintetico(semente, "unidade", 0)) # Peso maior no sorteio
+    motorista = SimpleNamespace(nome=nome_usuario("MOTORISTA", 0))
+    requisicao = Request({"type": "http", "headers": []}) # Sem If-None-Match: sempre consulta
+    periodo = bi.periodo_bi(None, None)
+    inicio_mes = data_da_viagem(indice_viagem, PADROES).date().replace(day=1)
+    fim_mes = (inicio_mes + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+
+    return {
+        "tfd.listar_candidatos_viagem": lambda db: tfd.listar_candidatos_viagem(viagem, db),
+        "medico.get_dashboard_stats": lambda db: medico.get_dashboard_stats(maior_ubs, db, None),
+        "tfd.buscar_viagens (destino)": lambda db: tfd.buscar_viagens(requisicao, "Recife", None, db),
+        "tfd.buscar_viagens (destino+dia)": lambda db: tfd.buscar_viagens(requisicao, "Recife", dia, db),
+        "frota.minhas_viagens_hoje": lambda db: frota.minhas_viagens_hoje(motorista, db),
+        "frota.ocupacao_viagens (mês)": lambda db: frota.ocupacao_viagens(requisicao, inicio_mes, fim_mes, None, db),
+        "bi.encaminhamentos (12 meses)": lambda db: bi.encaminhamentos("mes", None, periodo, db),
+        "bi.ocupacao (12 meses)": lambda db: bi.ocupacao(None, periodo, db),
+    }
+
+
+def cronometrar(loop, chamada, repeticoes: int):
+    """Mediana em ms (depois de uma chamada de aquecimento) e quantidade de itens devolvidos."""
+    db = SessionLocal()
+    try:
+        resultado = loop.run_until_complete(chamada(db))
+        tempos = []
+        for _ in range(repeticoes):
+            db.expire_all() # Sem reaproveitar objetos da chamada anterior
+            inicio = time.perf_counter()
+            loop.run_until_complete(chamada(db))
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        if isinstance(resultado, dict) and "itens" in resultado: # Rotas do BI
+            resultado = resultado["itens"]
+        itens = len(resultado) if isinstance(resultado, list) else 1
+        return statistics.median(tempos), itens
+    finally:
+        db.close()
+
+
+def classificar(expoente: float) -> str:
+    if expoente < 0.3:
+        return "constante"
+    if expoente <= 1.2:
+        return "linear"
+    return "ESCALA MAL"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pacientes", type=int, default=500_000)
+    parser.add_argument("--solicitacoes", type=int, default=3_000_000)
+    parser.add_argument("--anos", type=float, default=3)
+    parser.add_argument("--tamanhos", type=float, nargs="+", default=[0.1, 0.25, 0.5, 1.0],
+                        help="Frações dos totais (em ordem crescente)")
+    parser.add_argument("--repeticoes", type=int, default=7)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    chamadas = consultas(args.semente)
+    medicoes = {nome: [] for nome in chamadas} # nome -> [(ms, itens)] por tamanho
+    volumes = []
+    for fracao in sorted(args.tamanhos):
+        pacientes, solicitacoes = int(args.pacientes * fracao), int(args.solicitacoes * fracao)
+        anos = args.anos * fracao
+        print(f"\nTamanho {fracao:g}: {pacientes} pacientes, {solicitacoes} solicitações, "
+              f"{total_viagens(anos, PADROES)} viagens")
+        semear(pacientes, solicitacoes, anos, args.semente)
+        volumes.append(solicitacoes)
+        db = SessionLocal()
+        try:
+            inicio = time.perf_counter()
+            resultado = atualizar_bi(db)
+            print(f"  Resumos do BI ({resultado['modo']}): {time.perf_counter() - inicio:.1f} s")
+        finally:
+            db.close()
+        for nome, chamada in chamadas.items():
+            medicoes[nome].append(cronometrar(loop, chamada, args.repeticoes))
+
+    # Tabela de escala
+    largura = 34
+    cabecalho = "".join(f"{f'{v / 1000:,.0f}k sol.':>16}" for v in volumes)
+    print(f"\n{'consulta (mediana ms / itens)':<{largura}}{cabecalho}{'expoente':>10}  escala")
+    for nome, valores in medicoes.items():
+        colunas = "".join(f"{f'{ms:.1f} / {itens}':>16}" for ms, itens in valores)
+        if len(valores) > 1 and volumes[0] > 0 and valores[0][0] > 0:
+            expoente = math.log(valores[-1][0] / valores[0][0]) / math.log(volumes[-1] / volumes[0])
+            print(f"{nome:<{largura}}{colunas}{expoente:>10.2f}  {classificar(expoente)}")
+        else:
+            print(f"{nome:<{largura}}{colunas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark de inicialização: tempo de import e memória (RSS) por tipo de processo.
+
+Cada tipo sobe num processo Python novo com -X importtime (como o uvicorn/celery subiriam) e mede:
+- tempo total de import (parede) e a soma dos tempos próprios do -X importtime;
+- RSS depois dos imports (VmRSS do /proc; fora do Linux, o pico ru_maxrss);
+- quais bibliotecas pesadas foram carregadas (celery só no worker, PIL/pytesseract/pdf2image
+  só no worker de OCR, httpx só no worker de notificações);
+- os módulos de topo que mais pesaram (tempo acumulado do -X importtime).
+Mediana de --repeticoes execuções (a primeira aquece o cache de bytecode e do disco).
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_inicializacao [--repeticoes 5] [--top 10] [--tipos api worker_ocr]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# tipo de processo -> módulos que ele importa ao subir
+TIPOS = {
+    "api": ["app.main"],
+    "worker": ["app.worker"],
+    # O worker importa o serviço de OCR/WhatsApp só na primeira tarefa; aqui já entra na conta
+    "worker_ocr": ["app.worker", "app.services.ocr_service"],
+    "worker_notificacoes": ["app.worker", "app.utils.whatsapp"],
+}
+
+PESADOS = ["celery", "kombu", "PIL", "pytesseract", "pdf2image", "httpx", "ahocorasick"]
+
+# Roda dentro do processo medido: importa, mede e devolve um JSON na última linha do stdout
+_SONDA = """
+import json, sys, time
+inicio = time.perf_counter()
+for modulo in {modulos!r}:
+    __import__(modulo)
+duracao = time.perf_counter() - inicio
+rss_kb = None
+try:
+    with open("/proc/self/status") as f:
+        for linha in f:
+            if linha.startswith("VmRSS:"):
+                rss_kb = int(linha.split()[1])
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss_kb //= 1024
+pesados = [m for m in {pesados!r} if m in sys.modules]
+print(json.dumps({{"segundos": duracao, "rss_kb": rss_kb, "pesados": pesados, "modulos": len(sys.modules)}}))
+"""
+
+
+def _ler_importtime(stderr: str) -> tuple:
+    """(soma dos tempos próprios em µs, {módulo de topo: tempo acumulado em µs})."""
+    proprio_total, topo = 0, {}
+    for linha in stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|", 2)
+        proprio_total += int(proprio)
+        if not nome.startswith("  "): # Só o nível de cima (a indentação marca os imports aninhados)
+            nome = nome.strip()
+            topo[nome] = topo.get(nome, 0) + int(acumulado)
+    return proprio_total, topo
+
+
+def medir(modulos: list) -> dict:
+    sonda = _SONDA.format(modulos=modulos, pesados=PESADOS)
+    processo = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", sonda],
+        capture_output=True, text=True, cwd=os.getcwd(), env=os.environ.copy(),
+    )
+    if processo.returncode != 0:
+        raise RuntimeError(f"{modulos}: {processo.stderr.strip().splitlines()[-1:]}")
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    resultado["proprio_us"], resultado["topo"] = _ler_importtime(processo.stderr)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Módulos de topo listados por tipo")
+    parser.add_argument("--tipos", nargs="+", choices=list(TIPOS), default=list(TIPOS))
+    args = parser.parse_args()
+
+    resumo = []
+    for tipo in args.tipos:
+        medir(TIPOS[tipo]) # Aquecimento (bytecode em __pycache__, arquivos no cache do disco)
+        execucoes = [medir(TIPOS[tipo]) for _ in range(args.repeticoes)]
+        ultima = execucoes[-1]
+        resumo.append((
+            tipo,
+            statistics.median(e["segundos"] for e in execucoes) * 1000,
+            statistics.median(e["proprio_us"] for e in execucoes) / 1000,
+            statistics.median(e["rss_kb"] for e in execucoes) / 1024,
+            ultima["modulos"],
+            ultima["pesados"],
+        ))
+
+        print(f"\n{tipo} ({', '.join(TIPOS[tipo])}): módulos de topo mais lentos (acumulado, última execução)")
+        for nome, us in sorted(ultima["topo"].items(), key=lambda t: t[1], reverse=True)[:args.top]:
+            print(f"  {us / 1000:>8.1f} ms  {nome}")
+
+    print(f"\n{'processo':<22}{'import ms':>11}{'importtime ms':>15}{'RSS MB':>9}{'módulos':>9}  pesados carregados")
+    for tipo, ms, proprio_ms, rss_mb, modulos, pesados in resumo:
+        print(f"{tipo:<22}{ms:>11.1f}{proprio_ms:>15.1f}{rss_mb:>9.1f}{modulos:>9}  {', '.join(pesados) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Regressão + Benchmark do extrator de regras do OCR.
+
+Compara o extrator de passada única (app/services/ocr_regras.py) com a lógica antiga
+(vários `in text_upper`, `any(...)` e regex de CPF duplicadas), usando textos de OCR de exemplo.
+Falha (exit 1) se algum resultado divergir.
+
+Uso (na raiz do projeto):
+    python -m scripts.bench_ocr_regras [--repeticoes 2000]
+"""
+import argparse
+import logging
+import re
+import sys
+import timeit
+
+from app.services import ocr_regras
+from app.services.ocr_service import OCRService
+
+# ==========================================
+# Amostras de texto (como saem do Tesseract)
+# ==========================================
+AMOSTRAS = {
+    "comprovante_onco": """SECRETARIA ESTADUAL DE SAUDE
+COMPROVANTE DE AGENDAMENTO
+NOME: MARIA JOSE DA SILVA TELEFONE: (87) 99999-1111
+CPF: 123.456.789-09
+UNIDADE EXECUTANTE: HOSPITAL DO CANCER DE PERNAMBUCO - RECIFE
+DATA: 15/03/2025 HORA: 07:30
+ITEM AGENDAMENTO: CONSULTA EM ONCOLOGIA CLINICA
+""",
+    "comprovante_garanhuns": """Comprovante de Agendamento
+Nome: José Ferreira Lima
+Cpf 987.654.321-00
+Local: Hospital Regional Dom Moura - Garanhuns (antes: Recife)
+Data: 02/04/2025   Hora: 13:00
+Item Agendamento: Ultrassonografia de abdomen total
+""",
+    "comprovante_sem_campos": """COMPROVANTE DE AGENDAMENTO
+DOCUMENTO ILEGIVEL
+""",
+    "laudo_cid_c": """LAUDO PARA SOLICITAÇÃO/AUTORIZAÇÃO DE PROCEDIMENTO AMBULATORIAL
+Nome do cidadão
+ANTONIO CARLOS PEREIRA
+CPF 111.222.333-44
+Telefone (87) 3836-1234
+PROCEDIMENTO SOLICITADO
+0304010189 - RADIOTERAPIA DE PROSTATA
+CID10 C61 - Neoplasia maligna da próstata
+""",
+    "laudo_hemodialise": """PROCEDIMENTO AMBULATORIAL
+Nome do cidadão
+
+Severina Alves
+Telefone 87 99876-5432
+Procedimento solicitado:
+Sessão de hemodialise (máximo 3 por semana)
+CID10 N18.0
+Justificativa: paciente em HEMODIALISE contínua
+""",
+    "laudo_urgente": """Laudo para Solicitação de Procedimento Ambulatorial
+Nome do cidadão
+Cícero Romão Batista
+CPF: 555.666.777-88
+PROCEDIMENTO SOLICITADO
+Ressonância magnética de crânio
+CID10 G40 - Epilepsia
+Observação: caso URGENTE, risco de queda
+""",
+    "laudo_sem_cid": """LAUDO PARA SOLICITAÇÃO
+Nome do cidadão
+PROCEDIMENTO SOLICITADO""",
+    "laudo_cid_vazio": """LAUDO PARA SOLICITAÇÃO
+CID10
+Nome do cidadão
+Fulano de Tal
+""",
+    "generico_urgente": """Encaminhamento médico
+Paciente 444.555.666-77 com suspeita de CANCER de mama.
+Solicito avaliação.
+""",
+    "generico_vazio": "",
+    "generico_ruido": "|||  ~~ ,, 12.34 -- " * 40,
+}
+
+
+# ==========================================
+# Lógica antiga (referência para regressão/benchmark)
+# ==========================================
+def _legado(text: str) -> dict:
+    text_upper = text.upper()
+    if "COMPROVANTE DE AGENDAMENTO" in text_upper:
+        return _legado_comprovante(text, text_upper)
+    elif "LAUDO PARA SOLICITAÇÃO" in text_upper or "PROCEDIMENTO AMBULATORIAL" in text_upper:
+        return _legado_laudo(text, text_upper)
+    return _legado_generico(text, text_upper)
+
+
+def _legado_comprovante(text, text_upper):
+    dados = {"tipo_doc": "COMPROVANTE_AGENDAMENTO", "cpf": None, "nome": "Validar no Dashboard",
+             "data_exame": None, "hora_exame": None, "procedimento": None,
+             "destino_detectado": None, "prioridade": 1, "telefone": None}
+    cpf_match = re.search(r'\d{3}\.\d{3}\.\d{3}-\d{2}', text)
+    if cpf_match: dados["cpf"] = cpf_match.group(0)
+    nome_match = re.search(r'NOME:\s*(.*)', text_upper)
+    if nome_match: dados["nome"] = nome_match.group(1).split("TELEFONE")[0].strip()
+    data_match = re.search(r'DATA:\s*(\d{2}/\d{2}/\d{4})', text_upper)
+    if data_match: dados["data_exame"] = data_match.group(1)
+    hora_match = re.search(r'HORA:\s*(\d{2}:\d{2})', text_upper)
+    if hora_match: dados["hora_exame"] = hora_match.group(1)
+    if "GARANHUNS" in text_upper: dados["destino_detectado"] = "GARANHUNS"
+    elif "RECIFE" in text_upper: dados["destino_detectado"] = "RECIFE"
+    proc_match = re.search(r'ITEM AGENDAMENTO:\s*(.*)', text_upper)
+    if proc_match:
+        dados["procedimento"] = proc_match.group(1).strip()
+        if "ONCOLOGIA" in dados["procedimento"]: dados["prioridade"] = 5
+    return dados
+
+
+def _legado_laudo(text, text_upper):
+    dados = {"tipo_doc": "LAUDO_SOLICITACAO", "cpf": None, "nome": "Validar no Dashboard",
+             "data_exame": None, "procedimento": None, "prioridade": 1, "telefone": None, "cid": None}
+    cpf_match = re.search(r'\d{3}\.\d{3}\.\d{3}-\d{2}', text)
+    if cpf_match: dados["cpf"] = cpf_match.group(0)
+    linhas = text.split('\n')
+    for i, linha in enumerate(linhas):
+        if "Nome do cidadão" in linha:
+            if i + 1 < len(linhas):
+                proxima_linha = linhas[i+1].strip()
+                if proxima_linha:
+                    dados["nome"] = proxima_linha
+                elif i + 2 < len(linhas):
+                    dados["nome"] = linhas[i+2].strip()
+            break
+    tel_match = re.search(r'Telefone\s*([\(\)0-9\-\s]+)', text)
+    if tel_match: dados["telefone"] = tel_match.group(1).strip()
+    for i, linha in enumerate(linhas):
+        if "PROCEDIMENTO SOLICITADO" in linha.upper():
+            if i + 1 < len(linhas):
+                dados["procedimento"] = linhas[i+1].strip()
+            break
+    cid_match = re.search(r'CID10\s*([A-Z]\d{2,3}|.*)', text_upper)
+    if cid_match:
+        dados["cid"] = cid_match.group(1).split("-")[0].strip()
+    if dados["cid"] and dados["cid"].startswith("C"):
+        dados["prioridade"] = 5
+    elif any(t in text_upper for t in ["NEOPLASIA MALIGNA", "CANCER", "ONCOLOGIA", "HEMODIALISE"]):
+        dados["prioridade"] = 5
+    elif any(t in text_upper for t in ["URGENTE", "PRIORIDADE", "RISCO"]):
+        dados["prioridade"] = 3
+    return dados
+
+
+def _legado_generico(text, text_upper):
+    cpf_match = re.search(r'\d{3}\.\d{3}\.\d{3}-\d{2}', text)
+    dados = {"tipo_doc": "DESCONHECIDO", "cpf": cpf_match.group(0) if cpf_match else None,
+             "nome": "Extração Genérica - Verificar", "prioridade": 1, "texto_bruto_inicio": text[:200]}
+    if any(t in text_upper for t in ["URGENTE", "CANCER", "ONCOLOGIA"]):
+        dados["prioridade"] = 3
+    return dados
+
+
+def verificar_regressao() -> int:
+    falhas = 0
+    for nome, texto in AMOSTRAS.items():
+        esperado = _legado(texto)
+        obtido = OCRService.extrair_dados_texto(texto)
+        if esperado != obtido:
+            falhas += 1
+            print(f"[FALHA] {nome}\n  esperado: {esperado}\n  obtido:   {obtido}")
+        else:
+            print(f"[OK] {nome}: {obtido['tipo_doc']} prioridade={obtido['prioridade']}")
+    return falhas
+
+
+def medir(repeticoes: int):
+    print(f"\n{'amostra':<24}{'legado (µs)':>14}{'regras (µs)':>14}")
+    for nome, texto in AMOSTRAS.items():
+        t_legado = timeit.timeit(lambda: _legado(texto), number=repeticoes) / repeticoes * 1e6
+        t_novo = timeit.timeit(lambda: OCRService.extrair_dados_texto(texto), number=repeticoes) / repeticoes * 1e6
+        print(f"{nome:<24}{t_legado:>14.1f}{t_novo:>14.1f}")
+
+    # Documento longo (PDF de várias páginas)
+    texto = "\n".join(AMOSTRAS.values()) * 20
+    n = max(1, repeticoes // 50)
+    t_legado = timeit.timeit(lambda: _legado(texto), number=n) / n * 1e6
+    t_novo = timeit.timeit(lambda: OCRService.extrair_dados_texto(texto), number=n) / n * 1e6
+    print(f"{'multipagina (' + str(len(texto) // 1000) + 'k)':<24}{t_legado:>14.1f}{t_novo:>14.1f}")
+
+
+def medir_escala(repeticoes: int):
+    """
+    O ganho real: cada regra nova no modelo antigo é mais uma varredura do texto.
+    Aqui a tabela recebe N termos extras (ex: faixas de CID/sinônimos) e comparamos
+    N buscas `in text_upper` com uma passada do autômato.
+    """
+    texto = "\n".join(AMOSTRAS.values()) * 5
+    text_upper = texto.upper()
+    n = max(1, repeticoes // 50)
+    print(f"\n{'termos na tabela':<24}{'N x in (µs)':>14}{'autômato (µs)':>14}")
+    for total in (10, 100, 1000):
+        extras = tuple(f"TERMO CLINICO {i:04d}" for i in range(total))
+        palavras = dict(ocr_regras.PALAVRAS_CHAVE, EXTRAS=extras)
+        extrator = ocr_regras.ExtratorRegras(ocr_regras.TIPOS_DOCUMENTO, ocr_regras.DESTINOS, palavras, ocr_regras.CAMPOS)
+        termos = [t for ts in palavras.values() for t in ts]
+        t_legado = timeit.timeit(lambda: [t for t in termos if t in text_upper], number=n) / n * 1e6
+        t_novo = timeit.timeit(lambda: extrator.extrair(texto, text_upper), number=n) / n * 1e6
+        print(f"{total:<24}{t_legado:>14.1f}{t_novo:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    falhas = verificar_regressao()
+    medir(args.repeticoes)
+    medir_escala(args.repeticoes)
+    sys.exit(1 if falhas else 0)
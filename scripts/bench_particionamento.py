@@ -0,0 +1,122 @@
+"""
+Benchmark das consultas quentes antes e depois do particionamento mensal de solicitacoes_tfd.
+
+1. Completa a base sintética (scripts/dados_sinteticos.py).
+2. Mede com a tabela como está (se ainda não for particionada).
+3. Particiona (scripts/particionar_solicitacoes.py; a tabela anterior fica como solicitacoes_tfd_antiga) e mede.
+4. Com --arquivar-meses N, arquiva os meses com mais de N meses em --arquivo-dir e mede de novo.
+
+Consultas: as rotas do bench_consultas (candidatos, painel do médico, mural, motorista, BI) e as de
+período, que o particionamento corta para um mês: encaminhamentos do mês (exportação), reconciliação
+das cotas do mês e contagem do mês por UBS. Mediana em ms de --repeticoes execuções.
+
+Uso (na raiz do projeto, num banco Postgres de desenvolvimento):
+    python -m scripts.bench_particionamento [--pacientes 500000] [--solicitacoes 3000000] [--anos 3]
+                                            [--arquivar-meses 12] [--arquivo-dir /tmp/arquivo]
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+from datetime import timedelta
+
+from sqlalchemy import func, text
+
+from app.db.session import engine
+from app.db.base import SolicitacaoTFD
+from app.services.cotas import reconciliar_cotas
+from app.services.exportacao import TIPOS
+from app.services.particoes import TABELA, particionada, meses_anexados, arquivar_particoes
+from app.utils.datas import mes_atual, proximo_mes, inicio_do_dia
+from scripts.bench_consultas import consultas, cronometrar
+from scripts.dados_sinteticos import semear
+from scripts.particionar_solicitacoes import particionar
+
+
+def consultas_de_periodo() -> dict:
+    """Consultas com filtro em criado_em (as que a poda de partições alcança)."""
+    mes = mes_atual()
+    filtros = {"inicio": mes.isoformat(), "fim": (proximo_mes(mes) - timedelta(days=1)).isoformat()}
+
+    async def exportacao_do_mes(db):
+        return list(TIPOS["encaminhamentos"]["linhas"](db, filtros))
+
+    async def reconciliacao_de_cotas(db):
+        return reconciliar_cotas(db, mes)
+
+    async def contagem_do_mes(db):
+        # Limites na meia-noite local: o mesmo corte das partições (um mês = uma partição)
+        return db.query(SolicitacaoTFD.unidade_solicitante_id, func.count()).filter(
+            SolicitacaoTFD.criado_em >= inicio_do_dia(mes), SolicitacaoTFD.criado_em < inicio_do_dia(proximo_mes(mes))
+        ).group_by(SolicitacaoTFD.unidade_solicitante_id).all()
+
+    return {
+        "exportacao.encaminhamentos (mês)": exportacao_do_mes,
+        "cotas.reconciliar (mês)": reconciliacao_de_cotas,
+        "contagem do mês por UBS": contagem_do_mes,
+    }
+
+
+def situacao() -> str:
+    with engine.connect() as conexao:
+        linhas = conexao.execute(text(f"SELECT count(*) FROM {TABELA}")).scalar()
+        if not particionada(conexao):
+            return f"{linhas:,} linhas, sem partições"
+        return f"{linhas:,} linhas em {len(meses_anexados(conexao))} partições mensais"
+
+
+def medir(loop, chamadas: dict, repeticoes: int) -> dict:
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conexao:
+        conexao.execute(text(f"ANALYZE {TABELA}"))
+    return {nome: cronometrar(loop, chamada, repeticoes) for nome, chamada in chamadas.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pacientes", type=int, default=500_000)
+    parser.add_argument("--solicitacoes", type=int, default=3_000_000)
+    parser.add_argument("--anos", type=float, default=3)
+    parser.add_argument("--repeticoes", type=int, default=7)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--arquivar-meses", type=int, default=None, help="Retenção para a fase de arquivamento")
+    parser.add_argument("--arquivo-dir", default=None, help="Destino dos .csv.gz (padrão: pasta temporária)")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        sys.exit("Particionamento só existe no Postgres.")
+
+    semear(args.pacientes, args.solicitacoes, args.anos, args.semente)
+    loop = asyncio.new_event_loop()
+    chamadas = {**consultas(args.semente), **consultas_de_periodo()}
+    fases = [] # (nome, {consulta: (ms, itens)})
+
+    with engine.connect() as conexao:
+        ja_particionada = particionada(conexao)
+    if ja_particionada:
+        print("Tabela já particionada: sem a medição de antes.")
+    else:
+        print(f"\nAntes: {situacao()}")
+        fases.append(("sem partições", medir(loop, chamadas, args.repeticoes)))
+        copiadas = particionar()
+        print(f"Particionada: {copiadas:,} linhas copiadas (a anterior ficou como {TABELA}_antiga)")
+
+    print(f"\nParticionada: {situacao()}")
+    fases.append(("particionada", medir(loop, chamadas, args.repeticoes)))
+
+    if args.arquivar_meses is not None:
+        destino = args.arquivo_dir or tempfile.mkdtemp(prefix="arquivo_tfd_")
+        arquivados = arquivar_particoes(args.arquivar_meses, destino)
+        print(f"\nArquivados {len(arquivados)} meses ({sum(a['linhas'] for a in arquivados):,} linhas) em {destino}")
+        print(f"Depois do arquivamento: {situacao()}")
+        fases.append((f"arquivada ({args.arquivar_meses} m)", medir(loop, chamadas, args.repeticoes)))
+
+    # Tabela: uma coluna por fase
+    largura = 38
+    print(f"\n{'consulta (mediana ms / itens)':<{largura}}" + "".join(f"{nome:>22}" for nome, _ in fases))
+    for consulta in chamadas:
+        colunas = "".join(f"{f'{medicoes[consulta][0]:.1f} / {medicoes[consulta][1]}':>22}" for _, medicoes in fases)
+        print(f"{consulta:<{largura}}{colunas}")
+
+
+if __name__ == "__main__":
+    main()
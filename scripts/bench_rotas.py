@@ -0,0 +1,84 @@
+"""
+Regressão + Benchmark da ordem das paradas (app/services/rotas.py).
+
+UBS sorteadas num raio de --raio-km em volta de um ponto, saída na garagem e chegada em Recife:
+1. Confere a programação dinâmica (exata) contra a força bruta (todas as permutações) até 8 paradas.
+   Falha (exit 1) se algum custo divergir.
+2. Mede tempo da exata e da heurística (vizinho mais próximo + 2-opt) e quanto a heurística fica
+   acima do ótimo, por número de paradas. Acima do limite da exata, só a heurística.
+
+Uso (na raiz do projeto, não precisa de banco nem Redis):
+    python -m scripts.bench_rotas [--instancias 30] [--raio-km 8] [--semente 42]
+"""
+import argparse
+import itertools
+import random
+import statistics
+import sys
+import time
+
+from app.services.rotas import _custo, _exata, _heuristica
+from app.utils.geo import distancia_km
+
+CENTRO = (-8.36, -36.56) # Agreste de Pernambuco
+RECIFE = (-8.0476, -34.8770)
+
+
+def sortear_matriz(gerador: random.Random, n: int, raio_km: float) -> list:
+    """Matriz (n+2) x (n+2): paradas sorteadas, n = garagem (centro), n+1 = Recife."""
+    grau = raio_km / 111
+    pontos = [(CENTRO[0] + gerador.uniform(-grau, grau), CENTRO[1] + gerador.uniform(-grau, grau)) for _ in range(n)]
+    pontos += [CENTRO, RECIFE]
+    return [[distancia_km(a, b) for b in pontos] for a in pontos]
+
+
+def forca_bruta(matriz: list, n: int) -> float:
+    return min(_custo(matriz, [n, *ordem, n + 1]) for ordem in itertools.permutations(range(n)))
+
+
+def medir(funcao, matriz, n) -> tuple:
+    inicio = time.perf_counter()
+    ordem = funcao(matriz, n)
+    return (time.perf_counter() - inicio) * 1000, _custo(matriz, [n, *ordem, n + 1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instancias", type=int, default=30)
+    parser.add_argument("--raio-km", type=float, default=8)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+    gerador = random.Random(args.semente)
+
+    # 1. Regressão
+    divergencias = 0
+    for n in range(2, 9):
+        for _ in range(args.instancias // 3 or 1):
+            matriz = sortear_matriz(gerador, n, args.raio_km)
+            _, custo = medir(_exata, matriz, n)
+            if abs(custo - forca_bruta(matriz, n)) > 1e-6:
+                divergencias += 1
+    print(f"Exata x força bruta (2 a 8 paradas): {'OK' if not divergencias else f'{divergencias} divergência(s)'}")
+
+    # 2. Tempo e qualidade
+    print(f"\n{'paradas':>7} {'exata ms':>10} {'heurística ms':>14} {'heurística acima do ótimo':>27}")
+    for n in (4, 6, 8, 10, 12, 20, 40, 80):
+        tempos_exata, tempos_heuristica, excessos = [], [], []
+        for _ in range(args.instancias if n <= 10 else max(args.instancias // 5, 1)):
+            matriz = sortear_matriz(gerador, n, args.raio_km)
+            ms_h, custo_h = medir(_heuristica, matriz, n)
+            tempos_heuristica.append(ms_h)
+            if n <= 12:
+                ms_e, custo_e = medir(_exata, matriz, n)
+                tempos_exata.append(ms_e)
+                excessos.append((custo_h / custo_e - 1) * 100)
+        exata = f"{statistics.median(tempos_exata):.2f}" if tempos_exata else "-"
+        excesso = f"{statistics.mean(excessos):.2f}% (máx {max(excessos):.2f}%)" if excessos else "-"
+        print(f"{n:>7} {exata:>10} {statistics.median(tempos_heuristica):>14.2f} {excesso:>27}")
+
+    if divergencias:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Benchmark antes/depois da serialização das listagens grandes.
+
+Para cada rota compara, com os mesmos dados:
+- antes: consulta carregando objetos ORM, dicts montados a partir deles, validação do response_model
+  + jsonable_encoder do FastAPI e json da biblioteca padrão (o caminho de antes das rotas);
+- depois: consulta só com as colunas usadas (tuplas), dicts montados pela rota e orjson direto
+  (resposta_confiavel, sem passar pelo response_model).
+Mostra a mediana de cada etapa (carga + montagem, serialização) em ms e o ganho total.
+
+Os dados são semeados com o prefixo "BS-" e apagados no final.
+
+Uso (na raiz do projeto, num banco de desenvolvimento):
+    python -m scripts.bench_serializacao [--linhas 500] [--repeticoes 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+from unittest import mock
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from sqlalchemy import desc
+from sqlalchemy.orm import selectinload
+from starlette.requests import Request
+
+from app.main import app
+from app.api.endpoints import tfd, medico, frota, usuarios
+from app.core.respostas import RespostaJSON
+from app.db.session import SessionLocal
+from app.db.base import Usuario, UnidadeSaude, Paciente, SolicitacaoTFD, CronogramaViagem, medico_unidade
+from app.services.cache_unidades import carregar_unidades, nome_unidade
+
+PREFIXO = "BS-"
+
+
+def preparar(linhas: int) -> dict:
+    """Uma UBS, `linhas` viagens no mural, uma viagem com `linhas` candidatos e `linhas` aprovados,
+    e `linhas` usuários vinculados à UBS (a listagem de usuários pega no máximo 200 por página)."""
+    db = SessionLocal()
+    try:
+        unidade = UnidadeSaude(nome=f"{PREFIXO}UBS", bairro="Centro")
+        viagem = CronogramaViagem(destino=f"{PREFIXO}Recife", data_partida=datetime.now() + timedelta(days=1),
+                                  placa="BS-0000", motorista=f"{PREFIXO}Motorista", capacidade_total=40)
+        db.add_all([unidade, viagem])
+        db.flush()
+        for i in range(linhas):
+            db.add(CronogramaViagem(destino=f"{PREFIXO}Recife", data_partida=datetime.now() + timedelta(days=2, minutes=i),
+                                    placa=f"BS-{i:04d}", motorista=f"{PREFIXO}Motorista", capacidade_total=40))
+            db.add(Usuario(nome=f"{PREFIXO}Médico {i:05d}", cpf=f"{PREFIXO}{i:08d}", login=f"{PREFIXO}{i:08d}",
+                           senha_hash="-", perfil="MEDICO", crm=f"{i:06d}", unidades=[unidade]))
+            for status in ("Aguardando_Analise", "Aprovado_Onibus"):
+                paciente = Paciente(nome=f"{PREFIXO}Paciente {status[:4]} {i:05d}", cpf=f"{PREFIXO}{status[:4]}{i:08d}",
+                                    unidade_origem_id=unidade.id)
+                db.add(paciente)
+                db.flush()
+                db.add(SolicitacaoTFD(
+                    paciente_id=paciente.id, viagem_id=viagem.id, unidade_solicitante_id=unidade.id,
+                    data_desejada=viagem.data_partida, procedimento="Consulta", nivel_prioridade=1 + i % 5,
+                    com_acompanhante=i % 3 == 0, status_pedido=status,
+                ))
+        db.commit()
+        return {"unidade": unidade.id, "viagem": str(viagem.id)}
+    finally:
+        db.close()
+
+
+def limpar():
+    db = SessionLocal()
+    try:
+        ids_pacientes = db.query(Paciente.id).filter(Paciente.cpf.like(f"{PREFIXO}%")).scalar_subquery()
+        db.query(SolicitacaoTFD).filter(SolicitacaoTFD.paciente_id.in_(ids_pacientes)).delete(synchronize_session=False)
+        db.query(Paciente).filter(Paciente.cpf.like(f"{PREFIXO}%")).delete(synchronize_session=False)
+        db.query(CronogramaViagem).filter(CronogramaViagem.destino.like(f"{PREFIXO}%")).delete(synchronize_session=False)
+        ids_usuarios = db.query(Usuario.id).filter(Usuario.cpf.like(f"{PREFIXO}%")).scalar_subquery()
+        db.execute(medico_unidade.delete().where(medico_unidade.c.usuario_id.in_(ids_usuarios)))
+        db.query(Usuario).filter(Usuario.cpf.like(f"{PREFIXO}%")).delete(synchronize_session=False)
+        db.query(UnidadeSaude).filter(UnidadeSaude.nome.like(f"{PREFIXO}%")).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+# --- Antes: como as rotas montavam a lista (objetos ORM) ---
+
+def _mural_antes(db, ctx):
+    viagens = db.query(CronogramaViagem).filter(
+        CronogramaViagem.data_partida >= datetime.now(), CronogramaViagem.destino.ilike(f"%{PREFIXO}Recife%")
+    ).order_by(CronogramaViagem.data_partida).all()
+    return [{
+        "id_viagem": str(v.id), "origem": "Águas Belas", "destino": v.destino, "data_hora": v.data_partida,
+        "motorista": v.motorista, "veiculo": v.placa, "vagas_disponiveis": v.capacidade_total - v.vagas_ocupadas,
+        "status_lotacao": "Lotado" if v.capacidade_total - v.vagas_ocupadas <= 0 else "Disponível",
+    } for v in viagens]
+
+
+def _candidatos_antes(db, ctx):
+    candidatos = db.query(SolicitacaoTFD, Paciente).join(Paciente).filter(
+        SolicitacaoTFD.viagem_id == ctx["viagem"], SolicitacaoTFD.status_pedido == "Aguardando_Analise"
+    ).order_by(desc(SolicitacaoTFD.nivel_prioridade), SolicitacaoTFD.criado_em).all()
+    return [{
+        "id_solicitacao": str(sol.id), "paciente": pac.nome, "cpf": pac.cpf, "prioridade": sol.nivel_prioridade,
+        "procedimento": sol.procedimento, "vagas_solicitadas": 2 if sol.com_acompanhante else 1,
+        "acompanhante": "Sim" if sol.com_acompanhante else "Não",
+    } for sol, pac in candidatos]
+
+
+def _encaminhamentos_antes(db, ctx):
+    solicitacoes = db.query(SolicitacaoTFD, Paciente).outerjoin(Paciente).filter(
+        SolicitacaoTFD.unidade_solicitante_id == ctx["unidade"]
+    ).order_by(SolicitacaoTFD.criado_em.desc()).all()
+    return [{
+        "id": str(sol.id), "paciente_nome": pac.nome if pac else "Desconhecido", "cpf": pac.cpf if pac else "---",
+        "procedimento": sol.procedimento, "prioridade": sol.nivel_prioridade, "status": sol.status_pedido,
+        "data_solicitacao": sol.criado_em, "unidade_solicitante": nome_unidade(sol.unidade_solicitante_id),
+    } for sol, pac in solicitacoes]
+
+
+def _passageiros_antes(db, ctx):
+    solicitacoes = db.query(SolicitacaoTFD, Paciente).join(Paciente).filter(
+        SolicitacaoTFD.viagem_id == ctx["viagem"], SolicitacaoTFD.status_pedido == "Aprovado_Onibus"
+    ).all()
+    return [{
+        "id_solicitacao": str(sol.id), "nome_paciente": pac.nome, "rg_cpf": pac.cpf,
+        "acompanhante": sol.com_acompanhante, "status_embarque": sol.status_embarque,
+        "local_origem": nome_unidade(sol.unidade_solicitante_id),
+    } for sol, pac in solicitacoes]
+
+
+def _usuarios_antes(db, ctx):
+    lista = db.query(Usuario).options(selectinload(Usuario.unidades)).filter(
+        Usuario.unidades.any(UnidadeSaude.id == ctx["unidade"])
+    ).order_by(Usuario.nome, Usuario.id).limit(201).all()
+    return {"itens": [usuarios.formatar_retorno(u) for u in lista[:200]], "proximo_cursor": None}
+
+
+# Sem If-None-Match: a rota sempre consulta e monta a lista
+REQUISICAO = Request({"type": "http", "headers": []})
+
+# nome -> (função da rota, módulo, argumentos da rota, montagem antes)
+ROTAS = {
+    "tfd.buscar_viagens": (tfd.buscar_viagens, tfd, lambda ctx: dict(request=REQUISICAO, destino=f"{PREFIXO}Recife", data=None), _mural_antes),
+    "tfd.listar_candidatos_viagem": (tfd.listar_candidatos_viagem, tfd, lambda ctx: dict(id_viagem=ctx["viagem"]), _candidatos_antes),
+    "medico.listar_encaminhamentos_ubs": (medico.listar_encaminhamentos_ubs, medico,
+                                          lambda ctx: dict(request=REQUISICAO, unidade_id=str(ctx["unidade"]), usuario=None), _encaminhamentos_antes),
+    "frota.lista_passageiros": (frota.lista_passageiros, frota, lambda ctx: dict(request=REQUISICAO, viagem_id=ctx["viagem"]), _passageiros_antes),
+    "usuarios.listar_usuarios": (usuarios.listar_usuarios, usuarios,
+                                 lambda ctx: dict(limit=200, cursor=None, perfil=None, unidade_id=ctx["unidade"]), _usuarios_antes),
+}
+
+
+def _campo_resposta(funcao):
+    """response_field da rota (o response_model), ou None se a rota não declara schema."""
+    for rota in app.routes:
+        if getattr(rota, "endpoint", None) is funcao:
+            return rota.response_field
+    return None
+
+
+def _mediana_ms(funcao, repeticoes: int) -> float:
+    funcao() # Aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def medir(loop, nome: str, ctx: dict, repeticoes: int) -> tuple:
+    funcao, modulo, argumentos, montar_antes = ROTAS[nome]
+    campo = _campo_resposta(funcao)
+    db = SessionLocal()
+    try:
+        def montar_depois():
+            db.expire_all()
+            # Sem o resposta_confiavel a rota devolve o conteúdo cru: mede só consulta + montagem
+            with mock.patch.object(modulo, "resposta_confiavel", lambda conteudo, **_: conteudo):
+                return loop.run_until_complete(funcao(db=db, **argumentos(ctx)))
+
+        def montar_antigo():
+            db.expire_all()
+            return montar_antes(db, ctx)
+
+        conteudo = montar_depois()
+        itens = len(conteudo["itens"]) if isinstance(conteudo, dict) else len(conteudo)
+
+        def serializar_antes():
+            validado = loop.run_until_complete(serialize_response(field=campo, response_content=conteudo))
+            return JSONResponse(jsonable_encoder(validado)).body
+
+        carga_antes = _mediana_ms(montar_antigo, repeticoes)
+        carga_depois = _mediana_ms(montar_depois, repeticoes)
+        ser_antes = _mediana_ms(serializar_antes, repeticoes)
+        ser_depois = _mediana_ms(lambda: RespostaJSON(conteudo).body, repeticoes)
+        return itens, carga_antes, carga_depois, ser_antes, ser_depois
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--linhas", type=int, default=500, help="Itens de cada listagem")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    limpar() # Sobra de uma execução interrompida
+    ctx = preparar(args.linhas)
+    carregar_unidades() # A UBS nova entra no cache antes de medir
+    loop = asyncio.new_event_loop()
+    try:
+        resultados = {nome: medir(loop, nome, ctx, args.repeticoes) for nome in ROTAS}
+    finally:
+        limpar()
+
+    print(f"\n{'rota':<34}{'itens':>6}{'carga antes':>13}{'depois':>9}{'json antes':>12}{'depois':>9}"
+          f"{'total antes':>13}{'depois':>9}{'ganho':>8}")
+    for nome, (itens, carga_antes, carga_depois, ser_antes, ser_depois) in resultados.items():
+        antes, depois = carga_antes + ser_antes, carga_depois + ser_depois
+        print(f"{nome:<34}{itens:>6}{carga_antes:>13.2f}{carga_depois:>9.2f}{ser_antes:>12.2f}{ser_depois:>9.2f}"
+              f"{antes:>13.2f}{depois:>9.2f}{antes / depois:>7.1f}x")
+    print("\n(ms, mediana; carga = consulta + montagem dos dicts, json = validação/encoder + serialização)")
+
+
+if __name__ == "__main__":
+    main()
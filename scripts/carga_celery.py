@@ -0,0 +1,74 @@
+"""
+Teste de carga local do worker de OCR (Celery).
+
+Enfileira uma rajada de tarefas sintéticas (CPU) e mede:
+- Throughput (tarefas/s) e tempo total da rajada.
+- Justiça entre processos: tarefas por processo e índice de Jain (1.0 = distribuição perfeita).
+
+A tarefa sintética fica neste script (os workers de produção não a registram) e vai para uma fila
+própria, "ocr_carga". Suba um worker com o mesmo perfil do OCR do docker-compose consumindo essa fila:
+    docker compose run --rm worker celery -A app.core.celery_app worker -Q ocr_carga \
+        --include scripts.carga_celery --concurrency 2 --prefetch-multiplier=1 -O fair --hostname=carga@%h
+
+Uso (com o docker-compose no ar):
+    docker compose exec backend python -m scripts.carga_celery --tarefas 200 --duracao-ms 500
+"""
+import argparse
+import os
+import time
+from collections import Counter
+
+from app.core.celery_app import celery_app
+
+FILA_CARGA = "ocr_carga"
+
+
+@celery_app.task(name="carga_sintetica_ocr_task")
+def carga_sintetica_ocr_task(duracao_ms: int):
+    """Ocupa a CPU como um OCR faria e devolve qual processo executou."""
+    inicio = time.perf_counter()
+    fim = inicio + duracao_ms / 1000
+    while time.perf_counter() < fim:
+        sum(i * i for i in range(1000))
+    return {"processo": f"{carga_sintetica_ocr_task.request.hostname}:{os.getpid()}", "inicio": time.time() - (time.perf_counter() - inicio), "fim": time.time()}
+
+
+def indice_jain(valores: list) -> float:
+    if not valores:
+        return 0.0
+    return sum(valores) ** 2 / (len(valores) * sum(v * v for v in valores))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tarefas", type=int, default=100)
+    parser.add_argument("--duracao-ms", type=int, default=500, help="CPU gasta por tarefa sintética")
+    parser.add_argument("--timeout", type=int, default=600)
+    args = parser.parse_args()
+
+    inicio = time.time()
+    resultados = [
+        celery_app.send_task("carga_sintetica_ocr_task", args=[args.duracao_ms], queue=FILA_CARGA)
+        for _ in range(args.tarefas)
+    ]
+    print(f"{args.tarefas} tarefas enfileiradas em {time.time() - inicio:.2f}s")
+
+    execucoes = [r.get(timeout=args.timeout) for r in resultados]
+    total = time.time() - inicio
+
+    por_processo = Counter(e["processo"] for e in execucoes)
+    espera = sorted(e["inicio"] - inicio for e in execucoes)
+
+    print(f"\nTempo total: {total:.2f}s | Throughput: {args.tarefas / total:.2f} tarefas/s")
+    ideal = args.tarefas * args.duracao_ms / 1000 / max(1, len(por_processo))
+    print(f"Tempo ideal com {len(por_processo)} processo(s): {ideal:.2f}s (eficiência {ideal / total:.0%})")
+    print(f"Espera até iniciar: p50={espera[len(espera) // 2]:.2f}s  máx={espera[-1]:.2f}s")
+
+    print(f"\n{'processo':<40}{'tarefas':>10}")
+    for processo, qtd in sorted(por_processo.items()):
+        print(f"{processo:<40}{qtd:>10}")
+    print(f"\nÍndice de justiça (Jain): {indice_jain(list(por_processo.values())):.3f}")
+
+
+if __name__ == "__main__":
+    main()
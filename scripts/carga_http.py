@@ -0,0 +1,379 @@
+"""
+Teste de carga HTTP dos fluxos de TFD e frota (contra o docker-compose no ar).
+
+Reproduz o tráfego de um dia comum, todos os cenários ao mesmo tempo:
+- login_matinal: rajadas de login (todo mundo chegando às 7h);
+- mural: pacientes olhando o mural de viagens;
+- candidatura: pacientes se candidatando a vagas;
+- aprovacao: gestores listando candidatos e aprovando vagas;
+- motorista: motoristas atualizando a prancheta e fazendo check-in;
+- ocr_upload: rajadas de upload de documentos (recepção escaneando uma pilha).
+No final imprime, por cenário/operação: requisições, vazão, taxa de erro e latência p50/p95/p99.
+Respostas de regra de negócio (cota esgotada, ônibus lotado, 429 do OCR) não contam como erro.
+
+Baseline: --salvar-baseline grava o resultado em JSON; --comparar lê um baseline e falha (exit 1)
+se alguma operação piorou (p95 acima da tolerância ou mais erros).
+
+Uso:
+    # 1. Dados de carga (usuários/pacientes/viagens com prefixo "CARGA-"), dentro do container:
+    docker compose exec backend python -m scripts.carga_http --preparar
+    # 2. Carga (de qualquer máquina que alcance a API):
+    python -m scripts.carga_http --url http://localhost:8000 --duracao 60 --salvar-baseline carga_baseline.json
+    python -m scripts.carga_http --url http://localhost:8000 --duracao 60 --comparar carga_baseline.json
+    # 3. Limpeza:
+    docker compose exec backend python -m scripts.carga_http --limpar
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+PREFIXO = "CARGA-"
+SENHA = "carga123"
+DESTINO = f"{PREFIXO}Recife"
+
+# Usuários virtuais e pausa entre ações (segundos, com variação de ±50%).
+# Cenários de rajada disparam todos os usuários juntos a cada `pausa`.
+CENARIOS = {
+    "login_matinal": {"usuarios": 30, "pausa": 10, "rajada": True},
+    "mural": {"usuarios": 20, "pausa": 1},
+    "candidatura": {"usuarios": 10, "pausa": 2},
+    "aprovacao": {"usuarios": 3, "pausa": 2},
+    "motorista": {"usuarios": 5, "pausa": 5},
+    "ocr_upload": {"usuarios": 15, "pausa": 15, "rajada": True},
+}
+
+
+# ==========================================
+# Dados de carga (direto no banco)
+# ==========================================
+def preparar(pacientes: int, viagens: int, usuarios: int):
+    from app.core.security import criar_hash_senha
+    from app.db.session import SessionLocal
+    from app.db.base import Usuario, UnidadeSaude, Paciente, CronogramaViagem
+    from app.utils.texto import normalizar_busca
+
+    senha_hash = criar_hash_senha(SENHA) # Um hash só: o bcrypt de verdade fica para o login
+    db = SessionLocal()
+    try:
+        unidade = UnidadeSaude(nome=f"{PREFIXO}UBS Centro", bairro="Centro", cota_mensal=1_000_000)
+        db.add(unidade)
+        db.flush()
+        for perfil in ("GESTOR", "MOTORISTA", "MEDICO"):
+            for i in range(usuarios):
+                login = f"{PREFIXO}{perfil.lower()}.{i}"
+                db.add(Usuario(
+                    nome=f"{PREFIXO}{perfil.title()} {i}", cpf=login, login=login, senha_hash=senha_hash,
+                    perfil=perfil, primeiro_acesso=False, unidades=[unidade] if perfil == "MEDICO" else [],
+                ))
+        db.bulk_insert_mappings(Paciente, [
+            {"nome": f"{PREFIXO}Paciente {i:06d}", "nome_busca": normalizar_busca(f"{PREFIXO}Paciente {i:06d}"),
+             "cpf": f"{PREFIXO}P{i:06d}", "telefone": "", "unidade_origem_id": unidade.id}
+            for i in range(pacientes)
+        ])
+        amanha = datetime.now().replace(hour=5, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        db.bulk_insert_mappings(CronogramaViagem, [
+            {"destino": DESTINO, "data_partida": amanha + timedelta(days=i // usuarios), "placa": f"CRG{i:04d}",
+             "motorista": f"{PREFIXO}Motorista {i % usuarios}", "capacidade_total": 40}
+            for i in range(viagens)
+        ])
+        db.commit()
+        print(f"Dados de carga criados: 1 UBS, {usuarios * 3} usuários (senha '{SENHA}'), "
+              f"{pacientes} pacientes, {viagens} viagens.")
+    finally:
+        db.close()
+
+
+def limpar():
+    from app.db.session import SessionLocal
+    from app.db.base import (
+        Usuario, UnidadeSaude, Paciente, CronogramaViagem, SolicitacaoTFD, ReferenciaUpload,
+        ConsumoCota, medico_unidade
+    )
+
+    db = SessionLocal()
+    try:
+        unidades = db.query(UnidadeSaude.id).filter(UnidadeSaude.nome.like(f"{PREFIXO}%")).scalar_subquery()
+        viagens = db.query(CronogramaViagem.id).filter(CronogramaViagem.destino == DESTINO).scalar_subquery()
+        solicitacoes = db.query(SolicitacaoTFD.id, SolicitacaoTFD.paciente_id).filter(
+            SolicitacaoTFD.unidade_solicitante_id.in_(unidades) | SolicitacaoTFD.viagem_id.in_(viagens)
+        ).all()
+        ids_solicitacoes = [s.id for s in solicitacoes]
+        # Pacientes provisórios (TEMP-) criados pelos uploads de OCR da carga
+        ids_temporarios = [s.paciente_id for s in solicitacoes]
+
+        db.query(ReferenciaUpload).filter(ReferenciaUpload.solicitacao_id.in_(ids_solicitacoes)).delete(synchronize_session=False)
+        db.query(SolicitacaoTFD).filter(SolicitacaoTFD.id.in_(ids_solicitacoes)).delete(synchronize_session=False)
+        db.query(Paciente).filter(
+            Paciente.cpf.like(f"{PREFIXO}%") | (Paciente.id.in_(ids_temporarios) & Paciente.cpf.like("TEMP-%"))
+        ).delete(synchronize_session=False)
+        db.query(CronogramaViagem).filter(CronogramaViagem.destino == DESTINO).delete(synchronize_session=False)
+        db.query(ConsumoCota).filter(ConsumoCota.unidade_id.in_(unidades)).delete(synchronize_session=False)
+        ids_usuarios = db.query(Usuario.id).filter(Usuario.cpf.like(f"{PREFIXO}%")).scalar_subquery()
+        db.execute(medico_unidade.delete().where(medico_unidade.c.usuario_id.in_(ids_usuarios)))
+        db.query(Usuario).filter(Usuario.cpf.like(f"{PREFIXO}%")).delete(synchronize_session=False)
+        db.query(UnidadeSaude).filter(UnidadeSaude.nome.like(f"{PREFIXO}%")).delete(synchronize_session=False)
+        db.commit()
+        print(f"Dados de carga removidos ({len(ids_solicitacoes)} solicitações).")
+    finally:
+        db.close()
+
+
+# ==========================================
+# Medição
+# ==========================================
+class Resultados:
+    def __init__(self):
+        self.latencias = defaultdict(list) # "cenario:operacao" -> [segundos]
+        self.erros = defaultdict(int)
+        self.status = defaultdict(lambda: defaultdict(int))
+
+    async def medir(self, operacao: str, requisicao, aceitos=(200,)):
+        """Executa a requisição, registra latência/status e devolve a resposta (ou None se falhou)."""
+        inicio = time.perf_counter()
+        try:
+            resposta = await requisicao
+        except httpx.HTTPError as e:
+            self.latencias[operacao].append(time.perf_counter() - inicio)
+            self.erros[operacao] += 1
+            self.status[operacao][type(e).__name__] += 1
+            return None
+        self.latencias[operacao].append(time.perf_counter() - inicio)
+        self.status[operacao][resposta.status_code] += 1
+        if resposta.status_code not in aceitos:
+            self.erros[operacao] += 1
+            return None
+        return resposta
+
+    def resumo(self, duracao: float) -> dict:
+        resumo = {}
+        for operacao, valores in sorted(self.latencias.items()):
+            valores = sorted(valores)
+            resumo[operacao] = {
+                "requisicoes": len(valores),
+                "por_segundo": round(len(valores) / duracao, 2),
+                "taxa_erros": round(self.erros[operacao] / len(valores), 4),
+                "p50_ms": round(_percentil(valores, 50) * 1000, 1),
+                "p95_ms": round(_percentil(valores, 95) * 1000, 1),
+                "p99_ms": round(_percentil(valores, 99) * 1000, 1),
+                "status": {str(k): v for k, v in self.status[operacao].items()},
+            }
+        return resumo
+
+
+def _percentil(valores: list, p: float) -> float:
+    """Percentil por posição (valores já ordenados)."""
+    if not valores:
+        return 0.0
+    return valores[min(len(valores) - 1, int(len(valores) * p / 100))]
+
+
+# ==========================================
+# Cenários (uma ação de um usuário virtual)
+# ==========================================
+async def login_matinal(c: httpx.AsyncClient, ctx: dict, r: Resultados):
+    perfil = random.choice(("gestor", "motorista", "medico"))
+    await r.medir("login_matinal:login", c.post("/api/v1/auth/login", json={
+        "login": f"{PREFIXO}{perfil}.{random.randrange(ctx['usuarios'])}", "senha": SENHA
+    }))
+
+
+async def mural(c: httpx.AsyncClient, ctx: dict, r: Resultados):
+    await r.medir("mural:buscar", c.get("/api/v1/tfd/mural-viagens", params={"destino": DESTINO}))
+
+
+async def candidatura(c: httpx.AsyncClient, ctx: dict, r: Resultados):
+    await r.medir("candidatura:candidatar", c.post("/api/v1/tfd/candidatar-vaga", json={
+        "cpf_paciente": f"{PREFIXO}P{random.randrange(ctx['pacientes']):06d}",
+        "id_viagem": random.choice(ctx["viagens"]),
+        "prioridade_ocr": random.randint(1, 5),
+        "com_acompanhante": random.random() < 0.3,
+        "procedimento": "Consulta especializada",
+    }), aceitos=(200, 403)) # 403: cota da UBS esgotada
+
+
+async def aprovacao(c: httpx.AsyncClient, ctx: dict, r: Resultados):
+    viagem = random.choice(ctx["viagens"])
+    resposta = await r.medir("aprovacao:listar", c.get(f"/api/v1/tfd/gestao/candidatos/{viagem}", headers=ctx["gestor"]))
+    if resposta is None or not resposta.json():
+        return
+    candidato = resposta.json()[0]["id_solicitacao"] # O de maior prioridade
+    await r.medir("aprovacao:aprovar", c.post(f"/api/v1/tfd/gestao/aprovar/{candidato}", headers=ctx["gestor"]),
+                  aceitos=(200, 400, 404)) # 400: ônibus lotado
+
+
+async def motorista(c: httpx.AsyncClient, ctx: dict, r: Resultados):
+    resposta = await r.medir("motorista:trajetos", c.get("/api/v1/frota/motorista/meus-trajetos", headers=ctx["motorista"]))
+    if resposta is None or not resposta.json():
+        return
+    viagem = resposta.json()[0]["id"]
+    resposta = await r.medir("motorista:prancheta", c.get(f"/api/v1/frota/motorista/embarque/{viagem}", headers=ctx["motorista"]))
+    if resposta is None or not resposta.json():
+        return
+    passageiro = random.choice(resposta.json())["id_solicitacao"]
+    await r.medir("motorista:checkin", c.put(
+        f"/api/v1/frota/motorista/confirmar-presenca/{passageiro}", params={"status": "EMBARCOU"}, headers=ctx["motorista"]
+    ))
+
+
+async def ocr_upload(c: httpx.AsyncClient, ctx: dict, r: Resultados):
+    await r.medir("ocr_upload:enviar", c.post(
+        "/api/v1/ocr/processar-sus",
+        files={"file": (f"laudo_{random.randrange(10**9)}.png", ctx["imagem"], "image/png")},
+        data={"medico_id": ctx["medico_id"], "unidade_id": ctx["unidade_id"]},
+    ), aceitos=(200, 429)) # 429: controle de admissão do OCR segurando a fila
+
+
+FUNCOES = {
+    "login_matinal": login_matinal, "mural": mural, "candidatura": candidatura,
+    "aprovacao": aprovacao, "motorista": motorista, "ocr_upload": ocr_upload,
+}
+
+
+def _imagem_laudo() -> bytes:
+    """PNG pequeno com texto de laudo (o worker de OCR processa de verdade)."""
+    from PIL import Image, ImageDraw
+    imagem = Image.new("L", (800, 300), 255)
+    desenho = ImageDraw.Draw(imagem)
+    for linha, texto in enumerate(("LAUDO PARA SOLICITACAO", "PACIENTE: CARGA DE TESTE", "CNS: 700000000000000")):
+        desenho.text((20, 20 + 40 * linha), texto, fill=0)
+    buffer = io.BytesIO()
+    imagem.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def _logar(c: httpx.AsyncClient, login: str) -> dict:
+    resposta = await c.post("/api/v1/auth/login", json={"login": login, "senha": SENHA})
+    resposta.raise_for_status()
+    return {"Authorization": f"Bearer {resposta.json()['access_token']}"}
+
+
+async def _contexto(c: httpx.AsyncClient, args) -> dict:
+    """Tokens, viagens e UBS descobertos pela própria API (a carga não toca no banco)."""
+    ctx = {"usuarios": args.usuarios, "pacientes": args.pacientes, "imagem": _imagem_laudo()}
+    ctx["gestor"] = await _logar(c, f"{PREFIXO}gestor.0")
+    ctx["motorista"] = await _logar(c, f"{PREFIXO}motorista.0")
+    medico = (await c.get("/api/v1/auth/me", headers=await _logar(c, f"{PREFIXO}medico.0"))).json()
+    ctx["medico_id"], ctx["unidade_id"] = medico["id"], medico["unidades"][0]["id"]
+    ctx["viagens"] = [v["id_viagem"] for v in (await c.get("/api/v1/tfd/mural-viagens", params={"destino": DESTINO})).json()]
+    if not ctx["viagens"]:
+        raise SystemExit("Nenhuma viagem de carga encontrada. Rode antes: python -m scripts.carga_http --preparar")
+    return ctx
+
+
+async def _usuario_virtual(funcao, c, ctx, r, pausa: float, fim: float):
+    await asyncio.sleep(random.uniform(0, pausa)) # Chegadas espalhadas
+    while time.monotonic() < fim:
+        await funcao(c, ctx, r)
+        await asyncio.sleep(pausa * random.uniform(0.5, 1.5))
+
+
+async def _rajadas(funcao, c, ctx, r, usuarios: int, pausa: float, fim: float):
+    while time.monotonic() < fim:
+        proxima = time.monotonic() + pausa
+        await asyncio.gather(*[funcao(c, ctx, r) for _ in range(usuarios)])
+        await asyncio.sleep(max(0, proxima - time.monotonic()))
+
+
+async def executar(args) -> dict:
+    limites = httpx.Limits(max_connections=args.conexoes, max_keepalive_connections=args.conexoes)
+    async with httpx.AsyncClient(base_url=args.url, limits=limites, timeout=args.timeout) as c:
+        ctx = await _contexto(c, args)
+        r = Resultados()
+        inicio = time.monotonic()
+        fim = inicio + args.duracao
+        tarefas = []
+        for nome in args.cenarios:
+            config = CENARIOS[nome]
+            usuarios = max(1, round(config["usuarios"] * args.escala))
+            if config.get("rajada"):
+                tarefas.append(_rajadas(FUNCOES[nome], c, ctx, r, usuarios, config["pausa"], fim))
+            else:
+                tarefas.extend(_usuario_virtual(FUNCOES[nome], c, ctx, r, config["pausa"], fim) for _ in range(usuarios))
+        await asyncio.gather(*tarefas)
+        return r.resumo(time.monotonic() - inicio)
+
+
+# ==========================================
+# Relatório e baseline
+# ==========================================
+def imprimir(resumo: dict):
+    print(f"\n{'cenário:operação':<26}{'reqs':>7}{'req/s':>8}{'erros':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  status")
+    for operacao, m in resumo.items():
+        status = " ".join(f"{k}={v}" for k, v in sorted(m["status"].items()))
+        print(f"{operacao:<26}{m['requisicoes']:>7}{m['por_segundo']:>8}{m['taxa_erros']:>8.1%}"
+              f"{m['p50_ms']:>9}{m['p95_ms']:>9}{m['p99_ms']:>9}  {status}")
+
+
+def comparar(resumo: dict, baseline: dict, tolerancia: float) -> list:
+    """Operações que pioraram: p95 acima de baseline * (1 + tolerância) ou mais de 1 p.p. de erros."""
+    regressoes = []
+    for operacao, base in baseline["operacoes"].items():
+        atual = resumo.get(operacao)
+        if atual is None:
+            continue
+        # Abaixo de 5 ms de diferença é ruído, mesmo que a proporção seja grande
+        if atual["p95_ms"] > base["p95_ms"] * (1 + tolerancia) and atual["p95_ms"] - base["p95_ms"] > 5:
+            regressoes.append(f"{operacao}: p95 {base['p95_ms']} ms -> {atual['p95_ms']} ms")
+        if atual["taxa_erros"] > base["taxa_erros"] + 0.01:
+            regressoes.append(f"{operacao}: erros {base['taxa_erros']:.1%} -> {atual['taxa_erros']:.1%}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--duracao", type=float, default=60, help="Segundos de carga")
+    parser.add_argument("--cenarios", nargs="+", choices=list(CENARIOS), default=list(CENARIOS))
+    parser.add_argument("--escala", type=float, default=1.0, help="Multiplica os usuários virtuais de cada cenário")
+    parser.add_argument("--conexoes", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--semente", type=int, default=42, help="Semente do sorteio (carga reproduzível)")
+    parser.add_argument("--salvar-baseline", metavar="ARQUIVO")
+    parser.add_argument("--comparar", metavar="ARQUIVO", help="Baseline para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Piora aceita no p95 (0.2 = 20%%)")
+    # Dados de carga (a carga usa os mesmos --pacientes/--usuarios do --preparar para sortear CPFs e logins)
+    parser.add_argument("--preparar", action="store_true", help="Cria os dados de carga no banco e sai")
+    parser.add_argument("--limpar", action="store_true", help="Remove os dados de carga do banco e sai")
+    parser.add_argument("--pacientes", type=int, default=2000)
+    parser.add_argument("--viagens", type=int, default=20)
+    parser.add_argument("--usuarios", type=int, default=10, help="Usuários de cada perfil (gestor, motorista, médico)")
+    args = parser.parse_args()
+
+    if args.preparar:
+        return preparar(args.pacientes, args.viagens, args.usuarios)
+    if args.limpar:
+        return limpar()
+
+    random.seed(args.semente)
+    print(f"Carga de {args.duracao:.0f}s em {args.url} | cenários: {', '.join(args.cenarios)} | escala {args.escala}")
+    resumo = asyncio.run(executar(args))
+    imprimir(resumo)
+
+    if args.salvar_baseline:
+        with open(args.salvar_baseline, "w") as f:
+            json.dump({
+                "gerado_em": datetime.now().isoformat(timespec="seconds"), "url": args.url,
+                "duracao": args.duracao, "escala": args.escala, "operacoes": resumo,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"\nBaseline salvo em {args.salvar_baseline}")
+
+    if args.comparar:
+        with open(args.comparar) as f:
+            regressoes = comparar(resumo, json.load(f), args.tolerancia)
+        for regressao in regressoes:
+            print(f"REGRESSÃO: {regressao}")
+        if not regressoes:
+            print(f"\nSem regressões em relação a {args.comparar}.")
+        sys.exit(1 if regressoes else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Prova de concorrência do teto diário da ajuda de custo.
+
+1. Teto: dispara N reservas simultâneas (threads, cada uma com sua sessão/conexão) contra o teto de
+   um dia de teste e confere que:
+   - o total reservado nunca passa do teto;
+   - o total reservado é exatamente a soma das reservas que deram certo.
+   Usa um dia fictício (31/12/1999), removido no final.
+2. Aprovação dupla: chama N vezes ao mesmo tempo o handler de POST /tfd/gestao/aprovar-ajuda-custo/{id}
+   para a MESMA solicitação e confere que só uma passa (as outras recebem 409), que o teto do dia
+   subiu uma vez só e que o livro-razão tem uma única RESERVA. Depois estorna pelo handler de
+   POST /tfd/gestao/estornar-ajuda-custo/{id} e confere que o saldo voltou. A solicitação de teste
+   é apagada no final; os lançamentos ficam (o livro-razão é somente inserção), no dia 30/12/1999.
+Falha (exit 1) se alguma conferência não valer.
+
+Uso (na raiz do projeto, com o Postgres de desenvolvimento no DATABASE_URL):
+    python -m scripts.concorrencia_ajuda_custo [--aprovacoes 50] [--valor 20]
+"""
+import argparse
+import asyncio
+import sys
+import threading
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+from fastapi import HTTPException
+
+from app.api.endpoints.tfd import AprovacaoAjudaCusto, aprovar_ajuda_custo, estornar_ajuda_custo_aprovada
+from app.db.session import SessionLocal
+from app.db.base import SaldoAjudaCusto, LancamentoAjudaCusto, SolicitacaoTFD, Paciente
+from app.services.ajuda_custo import reservar_saldo, teto_diario
+
+DIA_TESTE = date(1999, 12, 31)
+DIA_TESTE_APROVACAO = date(1999, 12, 30)
+GESTOR = SimpleNamespace(id=None) # O handler só usa o id (lançamento sem usuário)
+
+
+def _aprovar(valor: Decimal, largada: threading.Barrier, aprovadas: list, erros: list):
+    db = SessionLocal()
+    try:
+        largada.wait() # Todas as threads chegam no UPDATE ao mesmo tempo
+        if reservar_saldo(db, DIA_TESTE, valor) is not None:
+            aprovadas.append(valor)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        erros.append(e)
+    finally:
+        db.close()
+
+
+def _chamar_handler(handler, resultados: list, largada: threading.Barrier = None, **kwargs):
+    db = SessionLocal()
+    try:
+        if largada:
+            largada.wait() # Todas as threads chegam no UPDATE condicional ao mesmo tempo
+        asyncio.run(handler(db=db, usuario=GESTOR, **kwargs))
+        resultados.append(200)
+    except HTTPException as e:
+        db.rollback()
+        resultados.append(e.status_code)
+    except Exception as e:
+        db.rollback()
+        resultados.append(e)
+    finally:
+        db.close()
+
+
+def _reservado(db, dia: date) -> Decimal:
+    return db.query(SaldoAjudaCusto.reservado).filter(SaldoAjudaCusto.dia == dia).scalar() or Decimal("0")
+
+
+def aprovacao_dupla(aprovacoes: int, valor: Decimal) -> list:
+    """Fase 2: aprovações simultâneas da mesma solicitação pelo handler da rota. Devolve as falhas."""
+    db = SessionLocal()
+    paciente = Paciente(nome="Teste de concorrência", cpf=f"TEMP-{uuid.uuid4().hex[:8]}", telefone="")
+    db.add(paciente)
+    db.flush()
+    solicitacao = SolicitacaoTFD(
+        paciente_id=paciente.id, procedimento="Teste de concorrência",
+        data_desejada=datetime.combine(DIA_TESTE_APROVACAO, datetime.min.time()),
+    )
+    db.add(solicitacao)
+    db.commit()
+    id_solicitacao, antes = str(solicitacao.id), _reservado(db, DIA_TESTE_APROVACAO)
+
+    resultados = []
+    largada = threading.Barrier(aprovacoes)
+    threads = [
+        threading.Thread(target=_chamar_handler, args=(aprovar_ajuda_custo, resultados, largada), kwargs={
+            "id_solicitacao": id_solicitacao, "dados": AprovacaoAjudaCusto(valor=float(valor)),
+        })
+        for _ in range(aprovacoes)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    depois = _reservado(db, DIA_TESTE_APROVACAO)
+    reservas = db.query(LancamentoAjudaCusto).filter(
+        LancamentoAjudaCusto.solicitacao_id == solicitacao.id, LancamentoAjudaCusto.tipo == "RESERVA"
+    ).count()
+    estorno = []
+    _chamar_handler(estornar_ajuda_custo_aprovada, estorno, id_solicitacao=id_solicitacao)
+    db.expire_all()
+    apos_estorno = _reservado(db, DIA_TESTE_APROVACAO)
+
+    db.query(SolicitacaoTFD).filter(SolicitacaoTFD.id == solicitacao.id).delete()
+    db.query(Paciente).filter(Paciente.id == paciente.id).delete()
+    db.commit()
+    db.close()
+
+    aprovadas = resultados.count(200)
+    print(f"\nAprovação dupla: {aprovacoes} chamadas | aprovadas: {aprovadas} | 409: {resultados.count(409)} "
+          f"| reservado no dia: R$ {antes} -> R$ {depois} | RESERVAs no livro-razão: {reservas}")
+    print(f"Estorno: {estorno[0]} | reservado no dia: R$ {apos_estorno}")
+
+    falhas = []
+    if aprovadas != 1:
+        falhas.append(f"{aprovadas} aprovações da mesma solicitação (esperado: 1)")
+    if len(resultados) - aprovadas != resultados.count(409):
+        falhas.append(f"respostas inesperadas: {[r for r in resultados if r not in (200, 409)][:5]}")
+    if depois - antes != valor or reservas != 1:
+        falhas.append(f"teto do dia subiu R$ {depois - antes} com {reservas} RESERVA(s) (esperado: R$ {valor} e 1)")
+    if estorno != [200] or apos_estorno != antes:
+        falhas.append(f"estorno não devolveu o saldo (R$ {apos_estorno}, esperado R$ {antes})")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--aprovacoes", type=int, default=50)
+    parser.add_argument("--valor", type=Decimal, default=Decimal("20.00"))
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    db.query(SaldoAjudaCusto).filter(SaldoAjudaCusto.dia == DIA_TESTE).delete()
+    db.commit()
+
+    aprovadas, erros = [], []
+    largada = threading.Barrier(args.aprovacoes)
+    threads = [
+        threading.Thread(target=_aprovar, args=(args.valor, largada, aprovadas, erros))
+        for _ in range(args.aprovacoes)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    saldo = db.query(SaldoAjudaCusto).filter(SaldoAjudaCusto.dia == DIA_TESTE).one()
+    limite, reservado = saldo.limite, saldo.reservado
+    db.delete(saldo)
+    db.commit()
+    db.close()
+
+    soma = sum(aprovadas, Decimal("0"))
+    print(f"Teto do dia: R$ {teto_diario(DIA_TESTE)} | pedidos: {args.aprovacoes} x R$ {args.valor}")
+    print(f"Aprovadas: {len(aprovadas)} | erros: {len(erros)} | reservado: R$ {reservado} | soma das aprovadas: R$ {soma}")
+    for e in erros[:5]:
+        print(f"  erro: {e}")
+
+    falhas = []
+    if reservado > limite:
+        falhas.append(f"teto ultrapassado ({reservado} > {limite})")
+    if reservado != soma:
+        falhas.append(f"reservado ({reservado}) diferente da soma das aprovadas ({soma})")
+    if erros:
+        falhas.append(f"{len(erros)} aprovação(ões) com erro")
+    falhas += aprovacao_dupla(args.aprovacoes, args.valor)
+    for falha in falhas:
+        print(f"FALHOU: {falha}")
+    if not falhas:
+        print("OK: o teto não foi ultrapassado e a solicitação foi aprovada uma vez só.")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
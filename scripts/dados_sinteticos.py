@@ -0,0 +1,256 @@
+"""
+Gerador de dados sintéticos em escala de município (para benchmarks das consultas).
+
+Cria, de forma reproduzível (mesmos argumentos e --semente = mesmos dados, com os mesmos ids):
+UBS, médicos/gestores/motoristas, pacientes, anos de cronograma de viagens e milhões de
+solicitações de TFD. No Postgres grava com COPY (centenas de milhares de linhas por segundo);
+em outros bancos, com INSERT em lote.
+
+É incremental: rodar de novo com números maiores só acrescenta o que falta (o benchmark de
+consultas usa isso para medir em vários tamanhos). Tudo é marcado (pacientes com telefone "SINT", UBS/usuários
+"SINT-", placas "SNT") e sai com --limpar. Use um banco de desenvolvimento.
+
+Uso (na raiz do projeto, com o banco no DATABASE_URL):
+    python -m scripts.dados_sinteticos --pacientes 500000 --solicitacoes 3000000 --anos 3
+    python -m scripts.dados_sinteticos --limpar
+"""
+import argparse
+import csv
+import hashlib
+import io
+import random
+import time
+import uuid
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import text
+
+from app.db.session import engine
+from app.db.base import UnidadeSaude, Usuario, Paciente, CronogramaViagem, SolicitacaoTFD, medico_unidade
+from app.services.particoes import garantir_particoes
+from app.utils.texto import normalizar_busca
+from scripts.bench_busca_pacientes import PRIMEIROS, SOBRENOMES
+
+MARCADOR = "SINT"
+BLOCO = 20000
+
+BAIRROS = ["Centro", "Vila Nova", "Alto do Cruzeiro", "São José", "Cohab", "Boa Vista", "Cajueiro",
+           "Santa Luzia", "Zona Rural - Sítio Riacho", "Zona Rural - Serra", "Planalto", "Novo Horizonte"]
+# Destinos de TFD com peso (a maioria vai para a capital)
+DESTINOS = [("Recife", 50), ("Caruaru", 20), ("Garanhuns", 15), ("Arcoverde", 10), ("Petrolina", 5)]
+PROCEDIMENTOS = ["Consulta Oncologia", "Hemodiálise", "Consulta Cardiologia", "Ressonância Magnética",
+                 "Quimioterapia", "Consulta Ortopedia", "Tomografia", "Consulta Neurologia"]
+
+PADROES = {"unidades": 30, "medicos": 150, "gestores": 5, "motoristas": 20, "viagens_por_dia": 4, "dias_futuros": 60}
+
+
+# ==========================================
+# Valores determinísticos por índice
+# ==========================================
+def _hash(semente: int, tabela: str, i: int) -> bytes:
+    return hashlib.md5(f"{semente}:{tabela}:{i}".encode()).digest()
+
+
+def uuid_sintetico(semente: int, tabela: str, i: int) -> uuid.UUID:
+    """Id da linha `i` da tabela: o mesmo em qualquer execução com a mesma semente."""
+    return uuid.UUID(bytes=_hash(semente, tabela, i), version=4)
+
+
+def _pesos_unidades(quantidade: int) -> list:
+    # Poucas UBS grandes e muitas pequenas (peso 1/posição)
+    return list(accumulate(1 / (k + 1) for k in range(quantidade)))
+
+
+def unidade_do_paciente(semente: int, i: int, acumulado: list) -> int:
+    """Índice da UBS de origem do paciente `i` (fixo, para as solicitações saírem da mesma UBS)."""
+    u = int.from_bytes(_hash(semente, "paciente-ubs", i)[:8], "big") / 2 ** 64
+    return bisect(acumulado, u * acumulado[-1])
+
+
+def data_da_viagem(i: int, config: dict) -> datetime:
+    """Viagem 0 é a mais distante no futuro; os índices seguintes voltam no tempo (qualquer fatia tem viagens futuras)."""
+    hoje = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    dia = hoje + timedelta(days=config["dias_futuros"] - i // config["viagens_por_dia"])
+    return dia + timedelta(hours=3 + 2 * (i % config["viagens_por_dia"])) # Saídas de madrugada
+
+
+def total_viagens(anos: float, config: dict) -> int:
+    return int((anos * 365 + config["dias_futuros"]) * config["viagens_por_dia"])
+
+
+# ==========================================
+# Gravação (COPY no Postgres, INSERT em lote nos outros)
+# ==========================================
+def _gravar(tabela, colunas: list, linhas: list):
+    if engine.dialect.name == "postgresql":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(linhas) # None vira campo vazio = NULL no COPY CSV
+        buffer.seek(0)
+        conexao = engine.raw_connection()
+        try:
+            with conexao.cursor() as cursor:
+                cursor.copy_expert(f"COPY {tabela.name} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            conexao.commit()
+        finally:
+            conexao.close()
+    else:
+        with engine.begin() as conexao:
+            conexao.execute(tabela.insert(), [dict(zip(colunas, linha)) for linha in linhas])
+
+
+def _em_blocos(tabela, colunas: list, inicio: int, fim: int, gerar_linha, rotulo: str):
+    """Gera e grava as linhas [inicio, fim) em blocos; cada bloco tem seu próprio sorteio (reproduzível)."""
+    t0 = time.perf_counter()
+    for bloco in range(inicio, fim, BLOCO):
+        rng = random.Random(f"{rotulo}:{bloco}")
+        _gravar(tabela, colunas, [gerar_linha(i, rng) for i in range(bloco, min(bloco + BLOCO, fim))])
+    if fim > inicio:
+        duracao = time.perf_counter() - t0
+        print(f"  {rotulo}: +{fim - inicio} linhas em {duracao:.1f}s ({(fim - inicio) / duracao:,.0f}/s)")
+
+
+def _contar(sql: str) -> int:
+    with engine.connect() as conexao:
+        return conexao.execute(text(sql), {"m": MARCADOR, "p": f"{MARCADOR}-%"}).scalar() or 0
+
+
+# ==========================================
+# Tabelas
+# ==========================================
+def _semear_cadastros(semente: int, config: dict):
+    """UBS e usuários (uma vez só: são poucos)."""
+    if _contar("SELECT count(*) FROM unidades_saude WHERE nome LIKE :p"):
+        return
+    unidades = [
+        (uuid_sintetico(semente, "unidade", i), f"{MARCADOR}-UBS {BAIRROS[i % len(BAIRROS)]} {i:02d}",
+         BAIRROS[i % len(BAIRROS)], 5000)
+        for i in range(config["unidades"])
+    ]
+    _gravar(UnidadeSaude.__table__, ["id", "nome", "bairro", "cota_mensal"], unidades)
+
+    usuarios, vinculos = [], []
+    rng = random.Random(f"{semente}:usuarios")
+    for perfil, chave in (("MEDICO", "medicos"), ("GESTOR", "gestores"), ("MOTORISTA", "motoristas")):
+        for i in range(config[chave]):
+            id_usuario = uuid_sintetico(semente, perfil, i)
+            login = f"{MARCADOR}-{perfil.lower()}-{i:04d}"
+            usuarios.append((id_usuario, nome_usuario(perfil, i), login, login, False, "-", perfil))
+            if perfil == "MEDICO":
+                for u in rng.sample(range(config["unidades"]), k=min(2, config["unidades"])):
+                    vinculos.append((id_usuario, unidades[u][0]))
+    _gravar(Usuario.__table__, ["id", "nome", "cpf", "login", "primeiro_acesso", "senha_hash", "perfil"], usuarios)
+    _gravar(medico_unidade, ["usuario_id", "unidade_id"], vinculos)
+
+
+def nome_usuario(perfil: str, i: int) -> str:
+    return f"{MARCADOR}-{perfil.title()} {i:04d}"
+
+
+def semear(pacientes: int, solicitacoes: int, anos: float, semente: int = 42, **config):
+    """Completa a base sintética até os totais pedidos (só acrescenta o que falta)."""
+    config = {**PADROES, **config}
+    _semear_cadastros(semente, config)
+    acumulado = _pesos_unidades(config["unidades"])
+    ids_unidades = [uuid_sintetico(semente, "unidade", i) for i in range(config["unidades"])]
+    ids_medicos = [uuid_sintetico(semente, "MEDICO", i) for i in range(config["medicos"])]
+    destinos, pesos_destinos = zip(*DESTINOS)
+
+    # 1. Pacientes
+    def paciente(i, rng):
+        nome = f"{rng.choice(PRIMEIROS)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+        return (uuid_sintetico(semente, "paciente", i), f"8{i:010d}", nome, normalizar_busca(nome), MARCADOR,
+                ids_unidades[unidade_do_paciente(semente, i, acumulado)])
+
+    ja_tem = _contar("SELECT count(*) FROM pacientes WHERE telefone = :m")
+    _em_blocos(Paciente.__table__, ["id", "cpf", "nome", "nome_busca", "telefone", "unidade_origem_id"],
+               ja_tem, pacientes, paciente, f"{semente}:pacientes")
+
+    # 2. Viagens (anos de cronograma até `dias_futuros` à frente)
+    n_viagens = total_viagens(anos, config)
+
+    def viagem(i, rng):
+        capacidade = rng.choice((40, 40, 40, 15)) # Ônibus e algumas vans
+        return (uuid_sintetico(semente, "viagem", i), rng.choices(destinos, pesos_destinos)[0],
+                data_da_viagem(i, config), f"SNT{i:05d}",
+                nome_usuario("MOTORISTA", rng.randrange(config["motoristas"])), capacidade,
+                rng.randint(0, capacidade))
+
+    ja_tem = _contar("SELECT count(*) FROM cronograma_viagens WHERE placa LIKE 'SNT%'")
+    _em_blocos(CronogramaViagem.__table__,
+               ["id", "destino", "data_partida", "placa", "motorista", "capacidade_total", "vagas_ocupadas"],
+               ja_tem, n_viagens, viagem, f"{semente}:viagens")
+
+    # 3. Solicitações (70% de ônibus; o resto é ajuda de custo / sem viagem)
+    agora = datetime.now()
+
+    def solicitacao(i, rng):
+        p = rng.randrange(pacientes)
+        if rng.random() < 0.7:
+            v = rng.randrange(n_viagens)
+            viagem_id, data = uuid_sintetico(semente, "viagem", v), data_da_viagem(v, config)
+            if data > agora:
+                status = "Aguardando_Analise" if rng.random() < 0.7 else "Aprovado_Onibus"
+            else:
+                status = "Aprovado_Onibus" if rng.random() < 0.9 else "Aguardando_Analise" # Nunca analisada
+            transporte = "Onibus"
+        else:
+            viagem_id, data = None, agora + timedelta(days=config["dias_futuros"] - rng.random() * anos * 365)
+            status = rng.choices(("Aprovado_Ajuda_Custo", "Aguardando_Analise", "Erro_OCR"), (70, 25, 5))[0]
+            transporte = "Ajuda_Custo"
+        embarque = rng.choices(("EMBARCOU", "AUSENTE"), (92, 8))[0] if status == "Aprovado_Onibus" and data < agora else "PENDENTE"
+        return (uuid_sintetico(semente, "solicitacao", i), uuid_sintetico(semente, "paciente", p), viagem_id,
+                rng.choice(ids_medicos), ids_unidades[unidade_do_paciente(semente, p, acumulado)],
+                rng.choice(PROCEDIMENTOS), data, rng.random() < 0.3, rng.choices((1, 2, 3, 4, 5), (40, 25, 15, 12, 8))[0],
+                status, embarque, transporte, status.startswith("Aprovado"), data - timedelta(days=rng.randint(5, 60)))
+
+    # Tabela particionada: os meses do histórico sintético precisam de partição (senão tudo cai na padrão)
+    garantir_particoes(desde=(agora - timedelta(days=anos * 365 + 2 * config["dias_futuros"])).date())
+    ja_tem = _contar(
+        "SELECT count(*) FROM solicitacoes_tfd s JOIN pacientes p ON p.id = s.paciente_id WHERE p.telefone = :m"
+    )
+    _em_blocos(SolicitacaoTFD.__table__,
+               ["id", "paciente_id", "viagem_id", "medico_solicitante_id", "unidade_solicitante_id", "procedimento",
+                "data_desejada", "com_acompanhante", "nivel_prioridade", "status_pedido", "status_embarque",
+                "tipo_transporte", "status_aprovacao", "criado_em"],
+               ja_tem, solicitacoes, solicitacao, f"{semente}:solicitacoes")
+
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conexao:
+            conexao.execute(text("ANALYZE unidades_saude, usuarios, pacientes, cronograma_viagens, solicitacoes_tfd"))
+
+
+def limpar():
+    with engine.begin() as conexao:
+        for sql in (
+            "DELETE FROM solicitacoes_tfd WHERE paciente_id IN (SELECT id FROM pacientes WHERE telefone = :m)",
+            "DELETE FROM pacientes WHERE telefone = :m",
+            "DELETE FROM cronograma_viagens WHERE placa LIKE 'SNT%'",
+            "DELETE FROM medico_unidades WHERE usuario_id IN (SELECT id FROM usuarios WHERE cpf LIKE :p)",
+            "DELETE FROM usuarios WHERE cpf LIKE :p",
+            "DELETE FROM unidades_saude WHERE nome LIKE :p",
+        ):
+            resultado = conexao.execute(text(sql), {"m": MARCADOR, "p": f"{MARCADOR}-%"})
+            print(f"  {resultado.rowcount:>9} | {sql.split(' WHERE')[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pacientes", type=int, default=500_000)
+    parser.add_argument("--solicitacoes", type=int, default=3_000_000)
+    parser.add_argument("--anos", type=float, default=3, help="Anos de cronograma de viagens para trás")
+    parser.add_argument("--unidades", type=int, default=PADROES["unidades"])
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--limpar", action="store_true")
+    args = parser.parse_args()
+
+    if args.limpar:
+        return limpar()
+    inicio = time.perf_counter()
+    semear(args.pacientes, args.solicitacoes, args.anos, args.semente, unidades=args.unidades)
+    print(f"Base sintética pronta em {time.perf_counter() - inicio:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
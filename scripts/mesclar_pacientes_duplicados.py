@@ -0,0 +1,89 @@
+"""
+Job único: limpa a tabela `pacientes` depois da troca para resolução de identidade por CPF.
+
+1. Agrupa pacientes pelo CPF normalizado (só dígitos); o cadastro mais antigo de cada grupo é o definitivo.
+2. Aproveita o telefone dos duplicados quando o definitivo não tem.
+3. Move as solicitações dos duplicados para o definitivo e apaga os duplicados.
+4. Grava o CPF do definitivo só com dígitos (forma usada pelo worker e pelas buscas).
+5. Apaga pacientes provisórios (TEMP-...) que não têm nenhuma solicitação.
+
+Tudo em uma transação. Uso (na raiz do projeto):
+    python -m scripts.mesclar_pacientes_duplicados [--dry-run]
+"""
+import argparse
+
+from sqlalchemy import text
+
+from app.db.session import SessionLocal
+
+PASSOS = [
+    ("Mapa de duplicados", """
+        CREATE TEMP TABLE mapa_pacientes ON COMMIT DROP AS
+        SELECT id AS duplicado,
+               first_value(id) OVER (PARTITION BY digitos ORDER BY criado_em NULLS LAST, id) AS definitivo,
+               digitos
+        FROM (
+            SELECT id, criado_em, regexp_replace(cpf, '[^0-9]', '', 'g') AS digitos
+            FROM pacientes
+            WHERE cpf NOT LIKE 'TEMP-%'
+        ) t
+        WHERE length(digitos) = 11
+    """),
+    ("Telefones aproveitados", """
+        UPDATE pacientes p SET telefone = d.telefone
+        FROM (
+            SELECT m.definitivo, max(pd.telefone) AS telefone
+            FROM mapa_pacientes m JOIN pacientes pd ON pd.id = m.duplicado
+            WHERE m.duplicado <> m.definitivo AND coalesce(pd.telefone, '') <> ''
+            GROUP BY m.definitivo
+        ) d
+        WHERE p.id = d.definitivo AND coalesce(p.telefone, '') = ''
+    """),
+    ("Solicitações movidas", """
+        UPDATE solicitacoes_tfd s SET paciente_id = m.definitivo
+        FROM mapa_pacientes m
+        WHERE s.paciente_id = m.duplicado AND m.duplicado <> m.definitivo
+    """),
+    ("Duplicados apagados", """
+        DELETE FROM pacientes p USING mapa_pacientes m
+        WHERE p.id = m.duplicado AND m.duplicado <> m.definitivo
+    """),
+    ("CPFs normalizados", """
+        UPDATE pacientes p SET cpf = m.digitos
+        FROM mapa_pacientes m
+        WHERE p.id = m.definitivo AND m.duplicado = m.definitivo AND p.cpf <> m.digitos
+    """),
+    ("Provisórios órfãos apagados", """
+        DELETE FROM pacientes p
+        WHERE p.cpf LIKE 'TEMP-%'
+          AND NOT EXISTS (SELECT 1 FROM solicitacoes_tfd s WHERE s.paciente_id = p.id)
+    """),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Mostra o que seria feito e desfaz tudo no final")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        for descricao, sql in PASSOS:
+            resultado = db.execute(text(sql))
+            print(f"{descricao}: {resultado.rowcount}")
+
+        if args.dry_run:
+            db.rollback()
+            print("\n--dry-run: nada foi gravado.")
+        else:
+            db.commit()
+            print("\nLimpeza concluída.")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Prepara um banco já existente para o BI da Secretaria (/api/v1/bi).
+O create_all só cria tabelas novas, então aqui:
+
+1. Cria a coluna atualizado_em em cronograma_viagens e solicitacoes_tfd (marca d'água do job).
+2. Cria as tabelas de resumo (bi_*) e os índices de atualizado_em com CONCURRENTLY.
+3. Monta os resumos do zero (mesma carga completa da primeira execução do atualizar_bi_task).
+
+Pode rodar mais de uma vez. Uso (na raiz do projeto):
+    python -m scripts.migrar_bi [--sem-carga]
+"""
+import argparse
+
+from sqlalchemy import text
+
+from app.db.session import SessionLocal, engine
+from app.db.init_db import criar_tabelas
+from app.db.base import BiMarca
+from app.services.bi import MARCA, atualizar_bi
+
+ESTRUTURA = [
+    # Linhas antigas ficam com o momento da migração: a carga completa (passo 3) já as cobre
+    "ALTER TABLE cronograma_viagens ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMPTZ DEFAULT now()",
+    "ALTER TABLE solicitacoes_tfd ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMPTZ DEFAULT now()",
+]
+
+INDICES = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_cronograma_viagens_atualizado_em ON cronograma_viagens (atualizado_em)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_solicitacoes_tfd_atualizado_em ON solicitacoes_tfd (atualizado_em)",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sem-carga", action="store_true", help="Só a estrutura; o job faz a carga na primeira execução")
+    args = parser.parse_args()
+
+    # 1. Colunas
+    with engine.begin() as conn:
+        for sql in ESTRUTURA:
+            conn.execute(text(sql))
+    print("Colunas atualizado_em prontas.")
+
+    # 2. Tabelas de resumo e índices (CONCURRENTLY não roda dentro de transação)
+    criar_tabelas()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for sql in INDICES:
+            conn.execute(text(sql))
+        conn.execute(text("ANALYZE cronograma_viagens"))
+        conn.execute(text("ANALYZE solicitacoes_tfd"))
+    print("Tabelas bi_* e índices criados.")
+
+    # 3. Carga completa: sem marca, o atualizar_bi recalcula tudo
+    if args.sem_carga:
+        return
+    db = SessionLocal()
+    try:
+        db.query(BiMarca).filter(BiMarca.nome == MARCA).delete()
+        db.commit()
+        resultado = atualizar_bi(db)
+    finally:
+        db.close()
+    print(f"Resumos montados (modo {resultado['modo']}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Prepara um banco já existente para a busca de pacientes (/api/v1/pacientes/busca).
+O create_all só cria tabelas novas, então aqui:
+
+1. Cria a extensão pg_trgm e a coluna pacientes.nome_busca.
+2. Preenche nome_busca em blocos (mesma normalização do app: sem acento e minúsculo).
+3. Cria os índices com CONCURRENTLY (a recepção continua usando a tabela).
+
+Pode rodar mais de uma vez. Uso (na raiz do projeto):
+    python -m scripts.migrar_busca_pacientes [--bloco 5000]
+"""
+import argparse
+
+from sqlalchemy import text
+
+from app.db.session import SessionLocal, engine
+from app.db.base import Paciente
+from app.core.versoes import marcar_tabelas
+from app.utils.texto import normalizar_busca
+
+ESTRUTURA = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE pacientes ADD COLUMN IF NOT EXISTS nome_busca VARCHAR",
+]
+
+INDICES = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pacientes_nome_busca_trgm "
+    "ON pacientes USING gin (nome_busca gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pacientes_nome_busca_id ON pacientes (nome_busca, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_pacientes_cpf_prefixo ON pacientes (cpf text_pattern_ops)",
+]
+
+
+def preencher_nome_busca(bloco: int) -> int:
+    """Percorre a tabela por id (cursor) e grava nome_busca; um commit por bloco."""
+    total = 0
+    ultimo_id = None
+    db = SessionLocal()
+    try:
+        while True:
+            query = db.query(Paciente.id, Paciente.nome).filter(Paciente.nome_busca.is_(None))
+            if ultimo_id is not None:
+                query = query.filter(Paciente.id > ultimo_id)
+            linhas = query.order_by(Paciente.id).limit(bloco).all()
+            if not linhas:
+                break
+            db.bulk_update_mappings(Paciente, [
+                {"id": p.id, "nome_busca": normalizar_busca(p.nome)} for p in linhas
+            ])
+            marcar_tabelas(db, "pacientes")
+            db.commit()
+            total += len(linhas)
+            ultimo_id = linhas[-1].id
+            print(f"  {total} pacientes preenchidos...")
+        return total
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bloco", type=int, default=5000, help="Pacientes por commit no preenchimento")
+    args = parser.parse_args()
+
+    # 1. Estrutura
+    with engine.begin() as conn:
+        for sql in ESTRUTURA:
+            conn.execute(text(sql))
+    print("Coluna nome_busca pronta.")
+
+    # 2. Dados
+    print(f"Preenchimento concluído: {preencher_nome_busca(args.bloco)} pacientes.")
+
+    # 3. Índices (CONCURRENTLY não roda dentro de transação)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for sql in INDICES:
+            conn.execute(text(sql))
+        conn.execute(text("ANALYZE pacientes"))
+    print("Índices criados.")
+
+
+if __name__ == "__main__":
+    main()
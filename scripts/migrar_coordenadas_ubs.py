@@ -0,0 +1,82 @@
+"""
+Prepara um banco já existente para o roteiro de embarque (ordem das paradas nas UBS).
+O create_all não altera tabela existente, então aqui:
+
+1. Cria as colunas latitude/longitude em unidades_saude.
+2. Com --csv, carrega as coordenadas de uma planilha (colunas: nome ou id, latitude, longitude;
+   separador vírgula ou ponto e vírgula). UBS da planilha que não existir no banco é listada e ignorada.
+3. Avisa o cache de UBS de todos os processos (API e workers) para recarregar.
+
+Pode rodar mais de uma vez. Uso (na raiz do projeto):
+    python -m scripts.migrar_coordenadas_ubs [--csv coordenadas_ubs.csv]
+"""
+import argparse
+import csv
+
+from sqlalchemy import text
+
+from app.db.session import SessionLocal, engine
+from app.db.base import UnidadeSaude
+from app.services.cache_unidades import invalidar_unidades
+from app.utils.geo import ler_ponto
+from app.utils.texto import normalizar_busca
+
+ESTRUTURA = [
+    "ALTER TABLE unidades_saude ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION",
+    "ALTER TABLE unidades_saude ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION",
+]
+
+
+def carregar_csv(caminho: str) -> tuple:
+    """Grava as coordenadas da planilha numa transação. Devolve (atualizadas, linhas não reconhecidas)."""
+    with open(caminho, encoding="utf-8-sig", newline="") as arquivo:
+        dialeto = csv.Sniffer().sniff(arquivo.read(2048), delimiters=",;")
+        arquivo.seek(0)
+        linhas = list(csv.DictReader(arquivo, dialect=dialeto))
+
+    db = SessionLocal()
+    try:
+        todas = db.query(UnidadeSaude).all()
+        por_id = {str(u.id): u for u in todas}
+        por_nome = {normalizar_busca(u.nome): u for u in todas}
+        atualizadas, ignoradas = 0, []
+        for linha in linhas:
+            unidade = por_id.get((linha.get("id") or "").strip()) or por_nome.get(normalizar_busca(linha.get("nome") or ""))
+            # Vírgula decimal (planilha em português) vira ponto
+            ponto = ler_ponto(f"{linha.get('latitude', '').replace(',', '.')},{linha.get('longitude', '').replace(',', '.')}")
+            if unidade is None or ponto is None:
+                ignoradas.append(linha)
+                continue
+            unidade.latitude, unidade.longitude = ponto
+            atualizadas += 1
+        db.commit()
+    finally:
+        db.close()
+    return atualizadas, ignoradas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="Planilha com as coordenadas das UBS")
+    args = parser.parse_args()
+
+    # 1. Colunas
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            for sql in ESTRUTURA:
+                conn.execute(text(sql))
+    print("Colunas latitude/longitude prontas.")
+
+    # 2. Planilha
+    if args.csv:
+        atualizadas, ignoradas = carregar_csv(args.csv)
+        print(f"{atualizadas} UBS com coordenadas.")
+        for linha in ignoradas:
+            print(f"  Ignorada (UBS não encontrada ou coordenada inválida): {dict(linha)}")
+
+    # 3. Cache de UBS (o commit do ORM já avisa; aqui cobre o ALTER sem planilha)
+    invalidar_unidades()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Cria, num banco já existente, os índices parciais por status de solicitacoes_tfd
+(fila de candidatos e passageiros de cada viagem: /frota/viagens/ocupacao, candidatos, prancheta).
+O create_all não cria índice em tabela que já existe, então aqui, sem bloquear gravações:
+
+- Tabela particionada: o índice nasce na tabela-mãe com ON ONLY (instantâneo, fica inválido),
+  cada partição ganha o seu com CONCURRENTLY e é anexada; com todas anexadas ele passa a valer.
+  Partições criadas depois (manter_particoes_task) recebem o índice no próprio ATTACH.
+- Tabela comum: CREATE INDEX CONCURRENTLY direto.
+
+Pode rodar mais de uma vez (continua de onde parou). Uso (na raiz do projeto, Postgres):
+    python -m scripts.migrar_indices_status
+"""
+import argparse
+import sys
+
+from sqlalchemy import text
+
+from app.db.session import engine
+from app.services.particoes import TABELA, particionada
+
+# nome -> definição (mesmas do modelo SolicitacaoTFD)
+INDICES = {
+    "ix_solicitacoes_tfd_candidatos":
+        "(viagem_id, nivel_prioridade DESC, criado_em) WHERE status_pedido = 'Aguardando_Analise'",
+    "ix_solicitacoes_tfd_passageiros":
+        "(viagem_id) INCLUDE (com_acompanhante, status_embarque, unidade_solicitante_id) "
+        "WHERE status_pedido = 'Aprovado_Onibus'",
+}
+
+
+def _particoes(conn) -> list:
+    return conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:t) ORDER BY c.relname"
+    ), {"t": TABELA}).scalars().all()
+
+
+def _tem_indice(conn, indice: str, particao: str) -> bool:
+    """A partição já tem um índice anexado ao da tabela-mãe (desta execução, de uma anterior ou do ATTACH)."""
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_inherits i JOIN pg_index x ON x.indexrelid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:i) AND x.indrelid = to_regclass(:p))"
+    ), {"i": indice, "p": particao}).scalar()
+
+
+def criar_indices():
+    # CONCURRENTLY não roda dentro de transação
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if not particionada(conn):
+            for nome, definicao in INDICES.items():
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nome} ON {TABELA} {definicao}"))
+                print(f"{nome}: criado.")
+            return
+
+        particoes = _particoes(conn)
+        for nome, definicao in INDICES.items():
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nome} ON ONLY {TABELA} {definicao}"))
+            for particao in particoes:
+                if _tem_indice(conn, nome, particao):
+                    continue
+                # Nome de índice tem no máximo 63 caracteres. IF NOT EXISTS: execução anterior parou antes do ATTACH
+                da_particao = f"{particao}_{nome.removeprefix(f'ix_{TABELA}_')}"[:63]
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {da_particao} ON {particao} {definicao}"))
+                conn.execute(text(f"ALTER INDEX {nome} ATTACH PARTITION {da_particao}"))
+            print(f"{nome}: {len(particoes)} partição(ões).")
+        conn.execute(text(f"ANALYZE {TABELA}"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+    if engine.dialect.name != "postgresql":
+        sys.exit("Índices parciais: só no Postgres (em outros bancos o create_all já cria).")
+    criar_indices()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Converte a solicitacoes_tfd de um banco já existente em tabela particionada por mês (criado_em),
+preservando todas as linhas. O create_all não altera tabela existente, então aqui, numa transação só:
+
+1. LOCK da tabela em modo EXCLUSIVE: gravações esperam até o fim, leituras continuam.
+2. Remove as FKs que apontam para ela (referencias_upload, lancamentos_ajuda_custo): tabela
+   particionada só tem chave única com criado_em, e meses arquivados deixam de existir no banco.
+3. Renomeia a tabela atual (e seus índices) para solicitacoes_tfd_antiga.
+4. Cria a nova pelo modelo (mesmas colunas e índices, chave (id, criado_em)), a partição padrão e
+   as mensais do primeiro mês com dados até PARTICOES_MESES_A_FRENTE à frente.
+5. Copia as linhas (cada uma cai na partição do seu mês) e confere a contagem: diferença desfaz tudo.
+
+Rode numa janela de manutenção (as gravações ficam bloqueadas durante a cópia). A tabela antiga
+fica no banco para conferência/volta; apague com --remover-antiga quando estiver tudo certo.
+Rodar de novo numa tabela já particionada não faz nada. Uso (na raiz do projeto, Postgres):
+    python -m scripts.particionar_solicitacoes [--remover-antiga]
+    python -m scripts.particionar_solicitacoes --restaurar uploads/arquivo/solicitacoes_tfd_202301.csv.gz
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.db.session import engine
+from app.db.base import SolicitacaoTFD
+from app.core.config import PARTICOES_MESES_A_FRENTE, FUSO_HORARIO
+from app.services.particoes import (
+    TABELA, particionada, criar_particao, mes_corrente, somar_meses, restaurar_mes
+)
+from app.utils.datas import proximo_mes
+
+ANTIGA = f"{TABELA}_antiga"
+
+
+def particionar() -> int:
+    """Faz a conversão (passos 1 a 5) e devolve quantas linhas foram copiadas (0 se já era particionada)."""
+    with engine.begin() as conexao:
+        if particionada(conexao):
+            return 0
+        conexao.execute(text("SET LOCAL lock_timeout = '30s'"))
+
+        # 1. Bloqueia gravações
+        conexao.execute(text(f"LOCK TABLE {TABELA} IN EXCLUSIVE MODE"))
+
+        # 2. FKs de outras tabelas para solicitacoes_tfd
+        fks = conexao.execute(text(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE contype = 'f' AND confrelid = to_regclass(:t)"
+        ), {"t": TABELA}).all()
+        for tabela, constraint in fks:
+            conexao.execute(text(f'ALTER TABLE {tabela} DROP CONSTRAINT "{constraint}"'))
+
+        # 3. Tabela atual sai do caminho (os nomes de índice são únicos no schema)
+        conexao.execute(text(f"ALTER TABLE {TABELA} RENAME TO {ANTIGA}"))
+        indices = conexao.execute(text(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :t"
+        ), {"t": ANTIGA}).scalars().all()
+        for indice in indices:
+            conexao.execute(text(f'ALTER INDEX "{indice}" RENAME TO "{indice[:56]}_antiga"'))
+
+        # 4. Tabela nova (o after_create do modelo cria a partição padrão) + partições mensais
+        SolicitacaoTFD.__table__.create(conexao)
+        conexao.execute(text(f"SET LOCAL TIME ZONE '{FUSO_HORARIO}'"))
+        primeiro = conexao.execute(text(f"SELECT date_trunc('month', min(criado_em))::date FROM {ANTIGA}")).scalar()
+        mes, ultimo = primeiro or mes_corrente(), somar_meses(mes_corrente(), PARTICOES_MESES_A_FRENTE)
+        while mes <= ultimo:
+            criar_particao(conexao, mes)
+            mes = proximo_mes(mes)
+
+        # 5. Cópia: só as colunas que a tabela antiga tem (as outras ficam com o padrão)
+        existentes = set(conexao.execute(text(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = :t"
+        ), {"t": ANTIGA}).scalars())
+        colunas = [c.name for c in SolicitacaoTFD.__table__.columns if c.name in existentes]
+        origem = [
+            "coalesce(criado_em, now())" if c == "criado_em" else c # Chave da partição não pode ser nula
+            for c in colunas
+        ]
+        copiadas = conexao.execute(text(
+            f"INSERT INTO {TABELA} ({', '.join(colunas)}) SELECT {', '.join(origem)} FROM {ANTIGA}"
+        )).rowcount
+        antigas = conexao.execute(text(f"SELECT count(*) FROM {ANTIGA}")).scalar()
+        if copiadas != antigas:
+            raise RuntimeError(f"Cópia incompleta: {copiadas} de {antigas} linhas. Nada foi alterado.")
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conexao:
+        conexao.execute(text(f"ANALYZE {TABELA}"))
+    return copiadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--remover-antiga", action="store_true", help=f"Apaga {ANTIGA} (depois de conferir)")
+    parser.add_argument("--restaurar", metavar="ARQUIVO", help="Carrega de volta um mês arquivado (.csv.gz)")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        sys.exit("Particionamento só existe no Postgres.")
+
+    if args.restaurar:
+        print(f"{restaurar_mes(args.restaurar)} linha(s) restaurada(s) de {args.restaurar}.")
+        return
+
+    inicio = time.perf_counter()
+    copiadas = particionar()
+    if copiadas:
+        print(f"{TABELA} particionada: {copiadas} linha(s) copiada(s) em {time.perf_counter() - inicio:.1f}s. "
+              f"A tabela anterior ficou como {ANTIGA}.")
+    else:
+        print(f"{TABELA} já é particionada.")
+
+    if args.remover_antiga:
+        with engine.begin() as conexao:
+            conexao.execute(text(f"DROP TABLE IF EXISTS {ANTIGA}"))
+        print(f"{ANTIGA} removida.")
+
+
+if __name__ == "__main__":
+    main()
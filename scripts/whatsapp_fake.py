@@ -0,0 +1,122 @@
+"""
+Provedor de WhatsApp falso, para testar o envio de notificações sem internet.
+
+Imita a API usada por app/utils/whatsapp.py (POST /v1/messages + Idempotency-Key), com:
+- latência configurável;
+- fração de falhas 500 (para exercitar os reenvios);
+- limite de mensagens/segundo (responde 429 + Retry-After acima dele);
+- deduplicação pela Idempotency-Key (reenvio devolve o mesmo id, sem mensagem nova).
+GET /stats mostra o que chegou.
+
+Uso (na raiz do projeto):
+    python -m scripts.whatsapp_fake [--porta 9000] [--latencia-ms 150] [--falhas 0.1] [--limite 20]
+    # Medir vazão/reenvios do cliente contra o provedor falso (sobe o servidor na mesma hora):
+    python -m scripts.whatsapp_fake --bench 500 [--lote 100]
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+import uuid
+from collections import deque
+
+import uvicorn
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="WhatsApp Fake")
+config = {"latencia_ms": 150, "falhas": 0.1, "limite": 20.0}
+estado = {"recebidas": 0, "entregues": 0, "duplicadas": 0, "erros_500": 0, "recusadas_429": 0}
+entregues_por_chave = {}
+janela = deque() # Horário das últimas requisições aceitas (limite por segundo)
+
+
+@app.post("/v1/messages")
+async def enviar_mensagem(request: Request, idempotency_key: str = Header(None)):
+    estado["recebidas"] += 1
+    await asyncio.sleep(config["latencia_ms"] / 1000 * random.uniform(0.5, 1.5))
+
+    agora = time.monotonic()
+    while janela and agora - janela[0] > 1:
+        janela.popleft()
+    if len(janela) >= config["limite"]:
+        estado["recusadas_429"] += 1
+        return JSONResponse({"erro": "limite de taxa"}, status_code=429, headers={"Retry-After": "1"})
+    janela.append(agora)
+
+    if idempotency_key in entregues_por_chave:
+        estado["duplicadas"] += 1
+        return {"id": entregues_por_chave[idempotency_key], "duplicada": True}
+    if random.random() < config["falhas"]:
+        estado["erros_500"] += 1
+        return JSONResponse({"erro": "falha simulada"}, status_code=500)
+
+    corpo = await request.json()
+    if not corpo.get("to") or not corpo.get("text"):
+        return JSONResponse({"erro": "to/text obrigatórios"}, status_code=400)
+    id_mensagem = uuid.uuid4().hex
+    if idempotency_key:
+        entregues_por_chave[idempotency_key] = id_mensagem
+    estado["entregues"] += 1
+    return {"id": id_mensagem}
+
+
+@app.get("/stats")
+async def stats():
+    return estado
+
+
+def _bench(total: int, lote: int, porta: int):
+    """Envia `total` mensagens em lotes, reenviando falhas temporárias, como o worker faria."""
+    import os
+    os.environ["WHATSAPP_API_URL"] = f"http://127.0.0.1:{porta}"
+    from app.utils import whatsapp
+
+    pendentes = [
+        {"telefone": f"8799{i:07d}", "mensagem": f"Mensagem {i}", "chave": f"bench:{i}"}
+        for i in range(total)
+    ]
+    inicio = time.perf_counter()
+    rodadas = 0
+    while pendentes and rodadas < 20:
+        rodadas += 1
+        proximos = []
+        for i in range(0, len(pendentes), lote):
+            bloco = pendentes[i:i + lote]
+            for item, resultado in zip(bloco, whatsapp.enviar_lote(bloco)):
+                if not resultado["ok"] and resultado["reenviar"]:
+                    proximos.append(item)
+        pendentes = proximos
+    duracao = time.perf_counter() - inicio
+
+    print(f"{total} mensagens em {duracao:.1f}s ({total / duracao:.1f} msg/s) | rodadas de reenvio: {rodadas - 1}")
+    print(f"Provedor: {estado}")
+    print(f"Sem entregar depois de {rodadas} rodadas: {len(pendentes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=9000)
+    parser.add_argument("--latencia-ms", type=int, default=150)
+    parser.add_argument("--falhas", type=float, default=0.1, help="Fração de respostas 500 (0 a 1)")
+    parser.add_argument("--limite", type=float, default=20, help="Mensagens por segundo antes de responder 429")
+    parser.add_argument("--bench", type=int, default=0, help="Envia N mensagens pelo cliente do app e mede")
+    parser.add_argument("--lote", type=int, default=100)
+    args = parser.parse_args()
+    config.update(latencia_ms=args.latencia_ms, falhas=args.falhas, limite=args.limite)
+
+    if not args.bench:
+        uvicorn.run(app, host="0.0.0.0", port=args.porta, log_level="warning")
+        return
+
+    servidor = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.porta, log_level="warning"))
+    threading.Thread(target=servidor.run, daemon=True).start()
+    while not servidor.started:
+        time.sleep(0.05)
+    _bench(args.bench, args.lote, args.porta)
+    servidor.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Orçamento de consultas SQL por rota (regressão de N+1).
+
+Semeia dados sintéticos em dois volumes, chama cada rota declarada em ROTAS com um usuário
+SUPER_ADMIN de verdade (a autenticação entra na conta) e conta os comandos SQL de cada requisição.
+Falha se a rota fizer mais consultas que o orçamento ou se a contagem no volume grande for maior
+que no pequeno (N+1). Rota nova que lista coisas entra em ROTAS.
+
+    TEST_DATABASE_URL=postgresql://... python -m pytest tests/test_orcamento_consultas.py
+"""
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+if not os.getenv("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL não configurada (servidor Postgres dos testes)", allow_module_level=True)
+
+from sqlalchemy import event  # noqa: E402
+
+from app.db.session import SessionLocal  # noqa: E402
+from app.db.base import Usuario, UnidadeSaude, Paciente, SolicitacaoTFD, CronogramaViagem  # noqa: E402
+from app.core.security import criar_token_acesso  # noqa: E402
+from app.services.cache_unidades import carregar_unidades  # noqa: E402
+
+VOLUME_PEQUENO = 5
+VOLUME_GRANDE = 200
+
+# (rota, url, parâmetros, orçamento). Orçamento = consultas da requisição inteira,
+# contando a do usuário logado. {unidade} e {viagem} vêm dos dados semeados.
+ROTAS = [
+    ("GET /auth/me", "/api/v1/auth/me", {}, 1),
+    ("GET /usuarios/", "/api/v1/usuarios/", {"limit": 200, "perfil": "medico"}, 3),
+    ("GET /medico/encaminhamentos", "/api/v1/medico/encaminhamentos", {"unidade_id": "{unidade}"}, 2),
+    ("GET /medico/dashboard/stats", "/api/v1/medico/dashboard/stats", {"unidade_id": "{unidade}"}, 5),
+    ("GET /frota/viagens", "/api/v1/frota/viagens", {}, 2),
+    ("GET /frota/viagens/ocupacao", "/api/v1/frota/viagens/ocupacao", {"inicio": "{hoje}", "fim": "{daqui_30_dias}"}, 2),
+    ("GET /frota/motorista/meus-trajetos", "/api/v1/frota/motorista/meus-trajetos", {}, 2),
+    ("GET /frota/motorista/embarque/{viagem_id}", "/api/v1/frota/motorista/embarque/{viagem}", {}, 2),
+    ("GET /tfd/mural-viagens", "/api/v1/tfd/mural-viagens", {"destino": "Recife"}, 1),
+    ("GET /tfd/gestao/candidatos/{id_viagem}", "/api/v1/tfd/gestao/candidatos/{viagem}", {}, 1),
+    ("GET /tfd/solicitacoes/{id}/linha-do-tempo", "/api/v1/tfd/solicitacoes/{solicitacao}/linha-do-tempo", {}, 1),
+    ("GET /pacientes/busca", "/api/v1/pacientes/busca", {"q": "paciente", "limite": 50}, 1),
+    ("GET /unidades/cotas", "/api/v1/unidades/cotas", {}, 2),
+]
+
+
+@contextmanager
+def contar_consultas(engine):
+    comandos = []
+
+    def _registrar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+
+    event.listen(engine, "before_cursor_execute", _registrar)
+    try:
+        yield comandos
+    finally:
+        event.remove(engine, "before_cursor_execute", _registrar)
+
+
+def preparar() -> dict:
+    """UBS, viagem e o usuário que faz as chamadas (também é o motorista das viagens)."""
+    db = SessionLocal()
+    try:
+        unidades = [UnidadeSaude(nome=f"UBS {i}", bairro="Centro") for i in range(3)]
+        admin = Usuario(nome="Admin", cpf="admin", login="admin",
+                        senha_hash="-", perfil="SUPER_ADMIN", unidades=unidades[:2])
+        viagem = CronogramaViagem(destino="Recife", data_partida=datetime.now() + timedelta(days=1),
+                                  placa="OQ-0000", motorista=admin.nome, capacidade_total=400)
+        db.add_all(unidades + [admin, viagem])
+        db.commit()
+        hoje = datetime.now().date()
+        return {"unidades": [u.id for u in unidades], "unidade": str(unidades[0].id),
+                "viagem": str(viagem.id), "motorista": admin.nome, "semeados": 0,
+                "hoje": hoje.isoformat(), "daqui_30_dias": (hoje + timedelta(days=30)).isoformat()}
+    finally:
+        db.close()
+
+
+def semear(ctx: dict, ate: int):
+    """Completa até `ate` médicos, pacientes, solicitações e viagens extras."""
+    db = SessionLocal()
+    try:
+        unidades = db.query(UnidadeSaude).filter(UnidadeSaude.id.in_(ctx["unidades"])).order_by(UnidadeSaude.nome).all()
+        for i in range(ctx["semeados"], ate):
+            db.add(Usuario(
+                nome=f"Médico {i:05d}", cpf=f"{i:08d}", login=f"{i:08d}",
+                senha_hash="-", perfil="MEDICO", unidades=unidades[:1 + i % 3]
+            ))
+            paciente = Paciente(nome=f"Paciente {i:05d}", cpf=f"P{i:08d}", unidade_origem_id=unidades[0].id)
+            db.add(paciente)
+            db.flush()
+            solicitacao = SolicitacaoTFD(
+                paciente_id=paciente.id, viagem_id=ctx["viagem"], unidade_solicitante_id=unidades[0].id,
+                data_desejada=datetime.now() + timedelta(days=1), procedimento="Consulta",
+                status_pedido="Aprovado_Onibus" if i % 2 else "Aguardando_Analise",
+            )
+            db.add(solicitacao)
+            if i == 0:
+                db.flush()
+                ctx["solicitacao"] = str(solicitacao.id)
+            if i % 10 == 0:
+                db.add(CronogramaViagem(destino="Recife", data_partida=datetime.now() + timedelta(days=2 + i),
+                                        placa=f"OQ-{i:04d}", motorista=ctx["motorista"], capacidade_total=40))
+        db.commit()
+        ctx["semeados"] = ate
+    finally:
+        db.close()
+
+
+def medir(engine, cliente, ctx: dict, cabecalhos: dict) -> dict:
+    """{rota: consultas} de uma passada por todas as rotas."""
+    # UBS recém-criadas: recarrega o cache agora, senão a recarga cai na conta da primeira rota que usar
+    carregar_unidades()
+    medicoes = {}
+    for rota, url, parametros, _ in ROTAS:
+        parametros = {k: v.format(**ctx) if isinstance(v, str) else v for k, v in parametros.items()}
+        with contar_consultas(engine) as comandos:
+            resposta = cliente.get(url.format(**ctx), params=parametros, headers=cabecalhos)
+        assert resposta.status_code == 200, f"{rota}: HTTP {resposta.status_code} {resposta.text[:200]}"
+        medicoes[rota] = len(comandos)
+    return medicoes
+
+
+@pytest.fixture(scope="module")
+def medicoes(banco, cliente):
+    """Consultas de cada rota com o volume pequeno e com o grande."""
+    ctx = preparar()
+    cabecalhos = {"Authorization": f"Bearer {criar_token_acesso({'sub': 'admin'})}"}
+    semear(ctx, VOLUME_PEQUENO)
+    pequeno = medir(banco, cliente, ctx, cabecalhos)
+    semear(ctx, VOLUME_GRANDE)
+    grande = medir(banco, cliente, ctx, cabecalhos)
+    return pequeno, grande
+
+
+@pytest.mark.parametrize("rota, orcamento", [(r[0], r[3]) for r in ROTAS], ids=[r[0] for r in ROTAS])
+def test_orcamento_de_consultas(medicoes, rota, orcamento):
+    pequeno, grande = medicoes
+    assert max(pequeno[rota], grande[rota]) <= orcamento, (
+        f"{rota}: {pequeno[rota]} / {grande[rota]} consultas, orçamento {orcamento}"
+    )
+    assert grande[rota] <= pequeno[rota], (
+        f"{rota}: cresce com os dados (N+1): {pequeno[rota]} -> {grande[rota]} consultas"
+    )
@@ -0,0 +1,67 @@
+"""
+O ETag das listas muda quando o OCR conclui um documento.
+
+O worker grava o lote com bulk_update_mappings, que não passa pelo flush nem pelo execute do ORM:
+sem marcar as tabelas, GET /medico/encaminhamentos respondia 304 com o status "Processando_IA".
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+if not os.getenv("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL não configurada (servidor Postgres dos testes)", allow_module_level=True)
+
+from app.db.session import SessionLocal  # noqa: E402
+from app.db.base import Usuario, UnidadeSaude, Paciente, SolicitacaoTFD  # noqa: E402
+from app.core.security import criar_token_acesso  # noqa: E402
+from app.services.ocr_service import OCRService  # noqa: E402
+import app.worker as worker  # noqa: E402
+
+
+@pytest.fixture
+def documento_na_fila(banco, tmp_path):
+    """UBS, gestor e uma solicitação aguardando o OCR (arquivo no formato antigo, em disco)."""
+    db = SessionLocal()
+    try:
+        unidade = UnidadeSaude(nome="UBS Versões", bairro="Centro")
+        gestor = Usuario(nome="Gestor Versões", cpf="versoes", login="versoes",
+                         senha_hash="-", perfil="SUPER_ADMIN", unidades=[unidade])
+        paciente = Paciente(nome="Paciente Versões", cpf="TEMP-versoes", unidade_origem_id=None)
+        db.add_all([unidade, gestor, paciente])
+        db.flush()
+        solicitacao = SolicitacaoTFD(
+            paciente_id=paciente.id, unidade_solicitante_id=unidade.id, procedimento="Aguardando leitura",
+            data_desejada=datetime.now() + timedelta(days=7), status_pedido="Na_Fila_Processamento",
+        )
+        db.add(solicitacao)
+        db.commit()
+        arquivo = tmp_path / "guia.jpg"
+        arquivo.write_bytes(b"imagem")
+        return {"unidade": str(unidade.id), "solicitacao": str(solicitacao.id), "arquivo": str(arquivo)}
+    finally:
+        db.close()
+
+
+def test_ocr_concluido_muda_o_etag_dos_encaminhamentos(cliente, documento_na_fila, monkeypatch):
+    url = "/api/v1/medico/encaminhamentos"
+    parametros = {"unidade_id": documento_na_fila["unidade"]}
+    cabecalhos = {"Authorization": f"Bearer {criar_token_acesso({'sub': 'versoes'})}"}
+    durante = []
+
+    def extrair_dados_sus(file_bytes, filename):
+        # O app consulta a lista enquanto o documento está no OCR e guarda o ETag
+        durante.append(cliente.get(url, params=parametros, headers=cabecalhos))
+        return {"tipo_doc": "GUIA", "procedimento": "Ressonância", "prioridade": 2}
+
+    monkeypatch.setattr(OCRService, "extrair_dados_sus", staticmethod(extrair_dados_sus))
+    mensagens = worker._processar_lote([
+        {"solicitacao_id": documento_na_fila["solicitacao"], "file_path": documento_na_fila["arquivo"]}
+    ])
+    assert mensagens == ["Sucesso: GUIA processado."]
+    assert [e["status"] for e in durante[0].json()] == ["Processando_IA"]
+
+    depois = cliente.get(url, params=parametros, headers={**cabecalhos, "If-None-Match": durante[0].headers["ETag"]})
+    assert depois.status_code == 200
+    assert depois.headers["ETag"] != durante[0].headers["ETag"]
+    assert [(e["status"], e["procedimento"]) for e in depois.json()] == [("Aguardando_Analise", "Ressonância")]